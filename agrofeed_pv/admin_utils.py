@@ -0,0 +1,140 @@
+"""
+Admin para las tablas grandes (ventas, movimientos, existencias).
+
+- PaginadorEstimado: con muchas filas toma el total de la estimación de
+  PostgreSQL (pg_class.reltuples sin filtros, EXPLAIN con filtros) en
+  lugar de un COUNT(*) que recorre la tabla.
+- AdminVolumen: ModelAdmin base con ese paginador, sin el segundo conteo
+  del total sin filtros y con un date_hierarchy cuyos enlaces de años y
+  meses salen del MIN/MAX de la fecha (dos lecturas del índice) en lugar
+  de un SELECT DISTINCT sobre toda la tabla. Los días se siguen
+  consultando: para entonces el filtro ya está acotado a un mes.
+
+Las subclases declaran list_select_related con las relaciones que usa
+list_display (los __str__ de ProductoSucursal y compañía encadenan llaves
+foráneas) y autocomplete_fields para no cargar selects con miles de
+opciones en el formulario.
+"""
+import json
+from datetime import date, datetime
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .particiones import inicio_mes, sumar_meses
+
+# Abajo de esto se cuenta exacto: es barato y la estimación es burda
+UMBRAL_ESTIMACION = 10000
+
+
+# =========== CONTEO ===========
+def estimar_filas(queryset):
+    """Filas estimadas por el planificador, o None fuera de PostgreSQL"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # Sin filtros: estadísticas de la tabla; en las particionadas
+            # la tabla padre no tiene filas y se suman sus particiones
+            tabla = queryset.model._meta.db_table
+            cursor.execute("""
+                SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint FROM pg_class c
+                WHERE c.oid = %s::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+            """, [tabla, tabla])
+            return cursor.fetchone()[0]
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator que usa la estimación de filas cuando la tabla es grande"""
+
+    @cached_property
+    def count(self):
+        estimado = estimar_filas(self.object_list)
+        if estimado is not None and estimado >= UMBRAL_ESTIMACION:
+            return estimado
+        return super().count
+
+
+# =========== DATE HIERARCHY ===========
+def _periodos(queryset, campo, tipo, con_hora):
+    """Años o meses entre la primera y la última fecha del queryset"""
+    rango = queryset.aggregate(primera=Min(campo), ultima=Max(campo))
+    primera, ultima = rango['primera'], rango['ultima']
+    if primera is None:
+        return []
+    if con_hora:
+        primera, ultima = timezone.localtime(primera), timezone.localtime(ultima)
+
+    if tipo == 'year':
+        periodos = [date(anio, 1, 1) for anio in range(primera.year, ultima.year + 1)]
+    else:
+        periodos = []
+        mes = inicio_mes(primera)
+        while mes <= inicio_mes(ultima):
+            periodos.append(mes)
+            mes = sumar_meses(mes, 1)
+
+    if con_hora:
+        return [timezone.make_aware(datetime(p.year, p.month, p.day)) for p in periodos]
+    return periodos
+
+
+class FechasAcotadasMixin:
+    """QuerySet cuyos dates()/datetimes() de años y meses no recorren la tabla"""
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind in ('year', 'month'):
+            return _periodos(self, field_name, kind, con_hora=False)
+        return super().dates(field_name, kind, order)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind in ('year', 'month') and tzinfo is None:
+            return _periodos(self, field_name, kind, con_hora=True)
+        return super().datetimes(field_name, kind, order, tzinfo)
+
+
+_clases_acotadas = {}
+
+
+def con_fechas_acotadas(queryset):
+    """Copia de `queryset` con FechasAcotadasMixin (conserva su clase original)"""
+    clase = type(queryset)
+    if clase not in _clases_acotadas:
+        _clases_acotadas[clase] = type(f'{clase.__name__}FechasAcotadas', (FechasAcotadasMixin, clase), {})
+    copia = queryset._chain()
+    copia.__class__ = _clases_acotadas[clase]
+    return copia
+
+
+class ChangeListVolumen(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.date_hierarchy:
+            queryset = con_fechas_acotadas(queryset)
+        return queryset
+
+
+# =========== ADMIN ===========
+class AdminVolumen(admin.ModelAdmin):
+    """Base para los modelos con millones de filas"""
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_per_page = 20
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListVolumen
@@ -3,6 +3,13 @@ ASGI config for agrofeed_pv project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las búsquedas de la caja (autocompletado de productos y clientes, info de
+producto) son vistas async: servidas con un servidor ASGI, p. ej.
+``uvicorn agrofeed_pv.asgi:application --workers 2``, cada tecla ya no
+ocupa un worker completo y pocos procesos atienden muchas cajas. El resto de las vistas
+son síncronas y Django las corre en un hilo por petición. Todos los
+middlewares del proyecto soportan los dos modos.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,103 @@
+"""
+Clases de carga de trabajo por vista.
+
+Cada vista pertenece a una clase (cobro, interactiva, reporte, exportación)
+marcada con `@clase_carga(...)`; las vistas sin marca son interactivas.
+`CargaTrabajoMiddleware` aplica por clase, según settings.CARGAS_TRABAJO:
+
+- `timeout_ms`: statement_timeout de PostgreSQL para las consultas de la petición
+- `concurrencia`: peticiones simultáneas por proceso (None = sin límite).
+  Cada petición ocupa una conexión, así que también es el presupuesto de
+  conexiones de la clase.
+- `espera`: segundos que una petición espera lugar antes de responder 503
+
+El cobro no tiene límite de concurrencia: un reporte pesado nunca puede
+dejar a las cajas sin conexión.
+"""
+import threading
+
+from django.conf import settings
+
+COBRO = 'cobro'
+INTERACTIVA = 'interactiva'
+REPORTE = 'reporte'
+EXPORTACION = 'exportacion'
+
+CLASES = (COBRO, INTERACTIVA, REPORTE, EXPORTACION)
+
+CARGAS_PREDETERMINADAS = {
+    COBRO: {'timeout_ms': 5000, 'concurrencia': None, 'espera': 0},
+    INTERACTIVA: {'timeout_ms': 10000, 'concurrencia': 20, 'espera': 2},
+    REPORTE: {'timeout_ms': 30000, 'concurrencia': 2, 'espera': 5},
+    EXPORTACION: {'timeout_ms': 120000, 'concurrencia': 1, 'espera': 5},
+}
+
+_semaforos = {}
+_candado = threading.Lock()
+
+
+def clase_carga(clase):
+    """Marca la clase de carga de la vista (usar como decorador más interno)"""
+    if clase not in CLASES:
+        raise ValueError(f'Clase de carga desconocida: {clase}')
+
+    def decorador(view_func):
+        view_func.clase_carga = clase
+        return view_func
+    return decorador
+
+
+def configuracion(clase):
+    config = dict(CARGAS_PREDETERMINADAS[clase])
+    config.update(getattr(settings, 'CARGAS_TRABAJO', {}).get(clase, {}))
+    return config
+
+
+def semaforo(clase):
+    """Semáforo de concurrencia de la clase en este proceso (None si no tiene límite)"""
+    with _candado:
+        if clase not in _semaforos:
+            limite = configuracion(clase)['concurrencia']
+            _semaforos[clase] = threading.BoundedSemaphore(limite) if limite else None
+        return _semaforos[clase]
+
+
+class LimiteTiempo:
+    """
+    Wrapper de ejecución que fija statement_timeout en cada conexión antes
+    de su primera consulta de la petición y lo restablece al terminar.
+    """
+
+    def __init__(self):
+        self.milisegundos = None
+        self.aplicado = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        conexion = context['connection']
+        if (
+            self.milisegundos
+            and conexion.vendor == 'postgresql'
+            and conexion.alias not in self.aplicado
+        ):
+            self.aplicado[conexion.alias] = conexion
+            context['cursor'].execute(
+                "SELECT set_config('statement_timeout', %s, false)", [str(self.milisegundos)]
+            )
+        return execute(sql, params, many, context)
+
+    def restaurar(self):
+        for conexion in self.aplicado.values():
+            try:
+                with conexion.cursor() as cursor:
+                    cursor.execute('RESET statement_timeout')
+            except Exception:
+                # Conexión rota o en transacción fallida: mejor descartarla
+                conexion.close()
+        self.aplicado = {}
+
+
+def es_cancelacion_por_tiempo(exception):
+    """¿La excepción es una consulta cancelada por statement_timeout?"""
+    causa = getattr(exception, '__cause__', None)
+    codigo = getattr(causa, 'sqlstate', None) or getattr(causa, 'pgcode', None)
+    return codigo == '57014'
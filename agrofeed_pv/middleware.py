@@ -0,0 +1,179 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import HttpResponse, JsonResponse
+
+from .cargas import INTERACTIVA, LimiteTiempo, configuracion, es_cancelacion_por_tiempo, semaforo
+from .routers import _usar_primario
+
+SESION_ULTIMA_ESCRITURA = 'ultima_escritura'
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class LecturaPropiaMiddleware:
+    """
+    Pega la sesión al primario durante REPORTES_LECTURA_PROPIA_SEGUNDOS
+    después de cada petición que escribe (POST, etc.), para que los reportes
+    muestren lo que el usuario acaba de registrar aunque la réplica vaya atrasada.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ventana = getattr(settings, 'REPORTES_LECTURA_PROPIA_SEGUNDOS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        sesion = getattr(request, 'session', None)
+        ultima = sesion.get(SESION_ULTIMA_ESCRITURA, 0) if sesion is not None else 0
+        token = _usar_primario.set(time.time() - ultima < self.ventana)
+        try:
+            response = self.get_response(request)
+        finally:
+            _usar_primario.reset(token)
+
+        if sesion is not None and self._escribio(request, response):
+            sesion[SESION_ULTIMA_ESCRITURA] = time.time()
+
+        return response
+
+    async def __acall__(self, request):
+        sesion = getattr(request, 'session', None)
+        ultima = await sesion.aget(SESION_ULTIMA_ESCRITURA, 0) if sesion is not None else 0
+        token = _usar_primario.set(time.time() - ultima < self.ventana)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _usar_primario.reset(token)
+
+        if sesion is not None and self._escribio(request, response):
+            await sesion.aset(SESION_ULTIMA_ESCRITURA, time.time())
+
+        return response
+
+    def _escribio(self, request, response):
+        return request.method not in METODOS_LECTURA and response.status_code < 400
+
+
+class CargaTrabajoMiddleware:
+    """
+    Aísla las clases de carga (ver agrofeed_pv/cargas.py): limita la
+    concurrencia de cada clase y fija el statement_timeout de sus consultas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        self._preparar(request)
+        try:
+            with self._limitar(request):
+                response = self.get_response(request)
+        except BaseException:
+            self._liberar(request)
+            raise
+
+        # Las respuestas en streaming siguen consultando: conservan su lugar hasta terminar
+        if response.streaming:
+            response.streaming_content = self._liberar_al_terminar(request, response.streaming_content)
+        else:
+            self._liberar(request)
+        return response
+
+    async def __acall__(self, request):
+        # Las consultas del ORM async corren en el hilo de la petición
+        # (sync_to_async), que tiene sus propias conexiones: el límite de
+        # tiempo se instala y se retira en ese hilo
+        self._preparar(request)
+        try:
+            pila = await sync_to_async(self._limitar)(request)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(pila.close)()
+        except BaseException:
+            await sync_to_async(self._liberar)(request)
+            raise
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._aliberar_al_terminar(request, response.streaming_content)
+            else:
+                response.streaming_content = self._liberar_al_terminar(request, response.streaming_content)
+        else:
+            await sync_to_async(self._liberar)(request)
+        return response
+
+    def _preparar(self, request):
+        request.clase_carga = None
+        request._limite_tiempo = LimiteTiempo()
+        request._semaforo_carga = None
+
+    def _limitar(self, request):
+        pila = ExitStack()
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(request._limite_tiempo))
+        return pila
+
+    def _liberar(self, request):
+        request._limite_tiempo.restaurar()
+        if request._semaforo_carga is not None:
+            request._semaforo_carga.release()
+            request._semaforo_carga = None
+
+    def _liberar_al_terminar(self, request, contenido):
+        try:
+            yield from contenido
+        finally:
+            self._liberar(request)
+
+    async def _aliberar_al_terminar(self, request, contenido):
+        try:
+            async for parte in contenido:
+                yield parte
+        finally:
+            await sync_to_async(self._liberar)(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        clase = getattr(view_func, 'clase_carga', INTERACTIVA)
+        config = configuracion(clase)
+
+        limite = semaforo(clase)
+        if limite is not None:
+            if not limite.acquire(timeout=config['espera']):
+                return self._ocupado(request, 'El sistema está ocupado, intenta de nuevo en unos segundos')
+            request._semaforo_carga = limite
+
+        request.clase_carga = clase
+        request._limite_tiempo.milisegundos = config['timeout_ms']
+        return None
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, OperationalError) and es_cancelacion_por_tiempo(exception):
+            return self._ocupado(
+                request, 'La consulta tardó demasiado. Acota el rango de fechas o los filtros'
+            )
+        return None
+
+    def _ocupado(self, request, mensaje):
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.content_type == 'application/json':
+            response = JsonResponse({'success': False, 'error': mensaje}, status=503)
+        else:
+            response = HttpResponse(mensaje, status=503)
+        response['Retry-After'] = '5'
+        return response
@@ -0,0 +1,296 @@
+"""
+Particionamiento mensual (PostgreSQL) de las tablas que sólo crecen.
+
+- catalogos_movimientoinventario, por `fecha`
+- ventas_detalleventa, por `fecha_creacion`
+
+Venta no se particiona: DetalleVenta y los cortes de caja tienen llaves
+foráneas hacia ella y PostgreSQL exige que la llave primaria (y los únicos
+como folio) incluyan la columna de partición. En su lugar lleva un índice
+BRIN sobre `fecha`.
+
+Las migraciones convierten las tablas existentes y el comando
+`mantener_particiones` crea los meses futuros y desprende los antiguos.
+En otros motores (SQLite en desarrollo) todo esto no hace nada.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+# {tabla: columna de partición}
+TABLAS_PARTICIONADAS = {
+    'catalogos_movimientoinventario': 'fecha',
+    'ventas_detalleventa': 'fecha_creacion',
+}
+
+# Holgura para las columnas de partición que no son la fecha del filtro
+# (p. ej. DetalleVenta.fecha_creacion frente a Venta.fecha)
+MARGEN_PODA = timedelta(days=1)
+
+
+# =========== FILTROS ===========
+def rango_fechas(fecha_inicio=None, fecha_fin=None):
+    """
+    Convierte fechas (date o 'AAAA-MM-DD') en datetimes locales [inicio, fin).
+
+    A diferencia de `fecha__date`, un rango sobre la columna permite la poda
+    de particiones y el uso de índices. Las fechas inválidas se ignoran (None).
+    """
+    def a_fecha(valor):
+        if isinstance(valor, str):
+            try:
+                return parse_date(valor)
+            except ValueError:
+                return None
+        return valor
+
+    inicio = a_fecha(fecha_inicio)
+    fin = a_fecha(fecha_fin)
+    return (
+        timezone.make_aware(datetime.combine(inicio, time.min)) if inicio else None,
+        timezone.make_aware(datetime.combine(fin + timedelta(days=1), time.min)) if fin else None,
+    )
+
+
+def filtro_poda(campo, inicio=None):
+    """
+    Filtro extra sobre la columna de partición `campo` para que PostgreSQL
+    pode particiones cuando el filtro real es sobre otra fecha equivalente.
+
+    Sólo hay límite inferior: un detalle nunca es anterior a su venta, pero
+    puede crearse mucho después (más que MARGEN_PODA) y un límite superior
+    lo dejaría fuera de los reportes aunque el archivo sí lo cuente.
+    """
+    filtro = {}
+    if inicio:
+        filtro[f'{campo}__gte'] = inicio - MARGEN_PODA
+    return filtro
+
+
+# =========== HELPERS ===========
+def soporta_particiones(connection):
+    return connection.vendor == 'postgresql'
+
+
+def inicio_mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def sumar_meses(fecha, meses):
+    mes = fecha.month - 1 + meses
+    return date(fecha.year + mes // 12, mes % 12 + 1, 1)
+
+
+def nombre_particion(tabla, mes):
+    return f'{tabla}_p{mes:%Y%m}'
+
+
+def _limite(mes):
+    """Límite de partición: medianoche local del día 1 del mes"""
+    return timezone.make_aware(datetime.combine(mes, time.min)).isoformat()
+
+
+def es_particionada(cursor, tabla):
+    cursor.execute("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace
+    """, [tabla])
+    return cursor.fetchone() is not None
+
+
+def listar_particiones(cursor, tabla):
+    """Particiones mensuales de `tabla`: lista de (nombre, mes) ordenada por mes"""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND p.relnamespace = current_schema()::regnamespace
+    """, [tabla])
+
+    particiones = []
+    prefijo = f'{tabla}_p'
+    for (nombre,) in cursor.fetchall():
+        sufijo = nombre[len(prefijo):]
+        if nombre.startswith(prefijo) and len(sufijo) == 6 and sufijo.isdigit():
+            particiones.append((nombre, date(int(sufijo[:4]), int(sufijo[4:]), 1)))
+    return sorted(particiones, key=lambda particion: particion[1])
+
+
+# =========== MANTENIMIENTO ===========
+def crear_particiones(cursor, tabla, desde, hasta):
+    """
+    Crea las particiones mensuales faltantes de `desde` a `hasta` (inclusive).
+    Si la partición DEFAULT tiene filas del mes, se mueven a la nueva.
+    Regresa los nombres creados.
+    """
+    columna = TABLAS_PARTICIONADAS[tabla]
+    existentes = {mes for _, mes in listar_particiones(cursor, tabla)}
+    default = f'{tabla}_default'
+    creadas = []
+
+    mes = inicio_mes(desde)
+    while mes <= inicio_mes(hasta):
+        if mes not in existentes:
+            nombre = nombre_particion(tabla, mes)
+            limite_inicio, limite_fin = _limite(mes), _limite(sumar_meses(mes, 1))
+
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE "{columna}" >= %s AND "{columna}" < %s)',
+                [limite_inicio, limite_fin]
+            )
+            en_default = cursor.fetchone()[0]
+            if en_default:
+                cursor.execute(f'ALTER TABLE "{tabla}" DETACH PARTITION "{default}"')
+
+            cursor.execute(
+                f'CREATE TABLE "{nombre}" PARTITION OF "{tabla}" '
+                f"FOR VALUES FROM ('{limite_inicio}') TO ('{limite_fin}')"
+            )
+
+            if en_default:
+                filtro = f'"{columna}" >= %s AND "{columna}" < %s'
+                cursor.execute(
+                    f'INSERT INTO "{tabla}" SELECT * FROM "{default}" WHERE {filtro}',
+                    [limite_inicio, limite_fin]
+                )
+                cursor.execute(f'DELETE FROM "{default}" WHERE {filtro}', [limite_inicio, limite_fin])
+                cursor.execute(f'ALTER TABLE "{tabla}" ATTACH PARTITION "{default}" DEFAULT')
+
+            creadas.append(nombre)
+        mes = sumar_meses(mes, 1)
+
+    return creadas
+
+
+def desprender_particiones(cursor, tabla, antes_de):
+    """
+    Desprende las particiones de meses anteriores a `antes_de`. Las tablas
+    quedan intactas (fuera de las consultas) para archivarlas o borrarlas.
+    Regresa los nombres desprendidos.
+    """
+    limite = inicio_mes(antes_de)
+    desprendidas = []
+    for nombre, mes in listar_particiones(cursor, tabla):
+        if mes < limite:
+            cursor.execute(f'ALTER TABLE "{tabla}" DETACH PARTITION "{nombre}"')
+            desprendidas.append(nombre)
+    return desprendidas
+
+
+# =========== CONVERSIÓN (migraciones) ===========
+def _indices_y_llaves(cursor, tabla):
+    """Índices (sin los de restricciones) y llaves foráneas salientes de la tabla"""
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relname = %s AND t.relnamespace = current_schema()::regnamespace
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid)
+    """, [tabla])
+    indices = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+    """, [tabla])
+    llaves = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT conname FROM pg_constraint
+        WHERE confrelid = %s::regclass AND contype = 'f'
+    """, [tabla])
+    entrantes = [fila[0] for fila in cursor.fetchall()]
+    if entrantes:
+        raise RuntimeError(
+            f'{tabla} no se puede particionar: tiene llaves foráneas entrantes ({", ".join(entrantes)})'
+        )
+
+    return indices, llaves
+
+
+def _restaurar(cursor, tabla, indices, llaves):
+    for _, definicion in indices:
+        cursor.execute(definicion)
+    for nombre, definicion in llaves:
+        cursor.execute(f'ALTER TABLE "{tabla}" ADD CONSTRAINT "{nombre}" {definicion}')
+
+
+def particionar_tabla(schema_editor, tabla, meses_adelante=3):
+    """
+    Convierte `tabla` en tabla particionada por mes, copiando sus datos.
+    La llave primaria pasa a ser (id, columna de partición).
+    """
+    connection = schema_editor.connection
+    if not soporta_particiones(connection):
+        return
+
+    columna = TABLAS_PARTICIONADAS[tabla]
+    anterior = f'{tabla}_sin_particion'
+    secuencia = f'{tabla}_id_seq'
+
+    with connection.cursor() as cursor:
+        if es_particionada(cursor, tabla):
+            return
+
+        indices, llaves = _indices_y_llaves(cursor, tabla)
+        cursor.execute(f'SELECT MIN("{columna}"), MAX(id) FROM "{tabla}"')
+        primera_fecha, ultimo_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{tabla}" RENAME TO "{anterior}"')
+        cursor.execute(
+            f'CREATE TABLE "{tabla}" (LIKE "{anterior}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("{columna}")'
+        )
+        cursor.execute(f'CREATE TABLE "{tabla}_default" PARTITION OF "{tabla}" DEFAULT')
+
+        hoy = timezone.localdate()
+        desde = timezone.localtime(primera_fecha).date() if primera_fecha else hoy
+        crear_particiones(cursor, tabla, desde, sumar_meses(hoy, meses_adelante))
+
+        cursor.execute(f'INSERT INTO "{tabla}" SELECT * FROM "{anterior}"')
+        cursor.execute(f'DROP TABLE "{anterior}"')
+
+        # La secuencia de identidad se borró con la tabla anterior
+        cursor.execute(f'CREATE SEQUENCE "{secuencia}" OWNED BY "{tabla}".id')
+        if ultimo_id:
+            cursor.execute('SELECT setval(%s, %s)', [secuencia, ultimo_id])
+        cursor.execute(f'ALTER TABLE "{tabla}" ALTER COLUMN id SET DEFAULT nextval(\'"{secuencia}"\')')
+        cursor.execute(f'ALTER TABLE "{tabla}" ADD CONSTRAINT "{tabla}_pkey" PRIMARY KEY (id, "{columna}")')
+
+        _restaurar(cursor, tabla, indices, llaves)
+        cursor.execute(
+            f'CREATE INDEX "{tabla}_{columna}_brin" ON "{tabla}" USING brin ("{columna}")'
+        )
+
+
+def desparticionar_tabla(schema_editor, tabla):
+    """Operación inversa: regresa `tabla` a una tabla normal con llave (id)"""
+    connection = schema_editor.connection
+    if not soporta_particiones(connection):
+        return
+
+    columna = TABLAS_PARTICIONADAS[tabla]
+    anterior = f'{tabla}_particionada'
+    secuencia = f'{tabla}_id_seq'
+
+    with connection.cursor() as cursor:
+        if not es_particionada(cursor, tabla):
+            return
+
+        cursor.execute(f'DROP INDEX IF EXISTS "{tabla}_{columna}_brin"')
+        indices, llaves = _indices_y_llaves(cursor, tabla)
+
+        cursor.execute(f'ALTER TABLE "{tabla}" RENAME TO "{anterior}"')
+        cursor.execute(f'ALTER SEQUENCE "{secuencia}" OWNED BY NONE')
+        cursor.execute(
+            f'CREATE TABLE "{tabla}" (LIKE "{anterior}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(f'INSERT INTO "{tabla}" SELECT * FROM "{anterior}"')
+        cursor.execute(f'DROP TABLE "{anterior}"')
+
+        cursor.execute(f'ALTER SEQUENCE "{secuencia}" OWNED BY "{tabla}".id')
+        cursor.execute(f'ALTER TABLE "{tabla}" ADD CONSTRAINT "{tabla}_pkey" PRIMARY KEY (id)')
+        _restaurar(cursor, tabla, indices, llaves)
@@ -0,0 +1,67 @@
+"""
+Ruteo de lecturas pesadas a la base de reportes.
+
+Los reportes y listados marcados con `@usa_base_reportes` leen de la
+conexión `reporting` (réplica de lectura o un pool aparte) para no competir
+con las ventas en el primario. Todo lo demás, y toda escritura, va a
+`default`.
+
+- Sin alias `reporting` en DATABASES todo se lee del primario.
+- Lectura propia: después de una escritura (p. ej. cobrar una venta) la
+  sesión queda "pegada" al primario unos segundos
+  (REPORTES_LECTURA_PROPIA_SEGUNDOS) para que el usuario vea su venta
+  aunque la réplica lleve retraso. Ver `LecturaPropiaMiddleware`.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+ALIAS_REPORTES = 'reporting'
+
+_lectura_reportes = ContextVar('lectura_reportes', default=False)
+_usar_primario = ContextVar('usar_primario', default=False)
+
+
+def base_reportes_configurada():
+    return ALIAS_REPORTES in settings.DATABASES
+
+
+def alias_lectura():
+    """Alias al que van las lecturas en el contexto actual"""
+    if _lectura_reportes.get() and not _usar_primario.get() and base_reportes_configurada():
+        return ALIAS_REPORTES
+    return 'default'
+
+
+def usa_base_reportes(view_func):
+    """Las lecturas GET de la vista van a la base de reportes (si existe)"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        token = _lectura_reportes.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _lectura_reportes.reset(token)
+    return _wrapped_view
+
+
+class ReportesRouter:
+    """Lecturas de vistas de reporte a `reporting`; escrituras siempre a `default`"""
+
+    def db_for_read(self, model, **hints):
+        alias = alias_lectura()
+        return alias if alias != 'default' else None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos conexiones ven los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        return db != ALIAS_REPORTES
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'ventas',
     'caja',
     'dashboard',
+    'archivo',
 ]
 
 MIDDLEWARE = [
@@ -57,6 +59,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'cajero.middleware.CajeroRedirectMiddleware',
+    'agrofeed_pv.middleware.LecturaPropiaMiddleware',
+    'agrofeed_pv.middleware.CargaTrabajoMiddleware',
 ]
 
 ROOT_URLCONF = 'agrofeed_pv.urls'
@@ -94,6 +98,35 @@ DATABASES = {
     }
 }
 
+# Base de datos de reportes: réplica de lectura o pool aparte del primario.
+# Se activa con AGROFEED_DB_REPORTES_HOST (o _NAME); sin ella los reportes
+# leen del primario. Ver agrofeed_pv/routers.py
+if os.environ.get('AGROFEED_DB_REPORTES_HOST') or os.environ.get('AGROFEED_DB_REPORTES_NAME'):
+    DATABASES['reporting'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('AGROFEED_DB_REPORTES_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('AGROFEED_DB_REPORTES_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('AGROFEED_DB_REPORTES_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('AGROFEED_DB_REPORTES_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('AGROFEED_DB_REPORTES_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['agrofeed_pv.routers.ReportesRouter']
+
+# Segundos que una sesión lee del primario después de escribir
+REPORTES_LECTURA_PROPIA_SEGUNDOS = 10
+
+# Clases de carga de trabajo (ver agrofeed_pv/cargas.py). Por proceso:
+# timeout_ms = statement_timeout, concurrencia = peticiones simultáneas
+# (None = sin límite), espera = segundos antes de responder 503
+CARGAS_TRABAJO = {
+    'cobro': {'timeout_ms': 5000, 'concurrencia': None, 'espera': 0},
+    'interactiva': {'timeout_ms': 10000, 'concurrencia': 20, 'espera': 2},
+    'reporte': {'timeout_ms': 30000, 'concurrencia': 2, 'espera': 5},
+    'exportacion': {'timeout_ms': 120000, 'concurrencia': 1, 'espera': 5},
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -142,6 +175,5 @@ LOGOUT_REDIRECT_URL = 'login'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-import os
 if not os.path.exists(MEDIA_ROOT):
     os.makedirs(MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import time
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .middleware import SESION_ULTIMA_ESCRITURA, LecturaPropiaMiddleware
+from .routers import ALIAS_REPORTES, ReportesRouter, alias_lectura, usa_base_reportes
+
+
+def _vista_que_lee(request):
+    """Reporta a qué alias irían las lecturas dentro de la vista"""
+    return HttpResponse(alias_lectura())
+
+
+vista_reporte = usa_base_reportes(_vista_que_lee)
+
+
+# =========== RUTEO DE LECTURAS ===========
+@mock.patch('agrofeed_pv.routers.base_reportes_configurada', return_value=True)
+class ReportesRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReportesRouter()
+
+    def test_fuera_de_una_vista_de_reporte_lee_del_primario(self, configurada):
+        self.assertIsNone(self.router.db_for_read(None))
+
+    def test_get_de_vista_de_reporte_lee_de_reportes(self, configurada):
+        respuesta = vista_reporte(self.factory.get('/'))
+        self.assertEqual(respuesta.content.decode(), ALIAS_REPORTES)
+
+        # El contexto se restaura al salir de la vista
+        self.assertEqual(alias_lectura(), 'default')
+
+    def test_db_for_read_dentro_de_la_vista(self, configurada):
+        alias = []
+
+        @usa_base_reportes
+        def vista(request):
+            alias.append(self.router.db_for_read(None))
+            return HttpResponse()
+
+        vista(self.factory.get('/'))
+        self.assertEqual(alias, [ALIAS_REPORTES])
+
+    def test_post_de_vista_de_reporte_lee_del_primario(self, configurada):
+        respuesta = vista_reporte(self.factory.post('/'))
+        self.assertEqual(respuesta.content.decode(), 'default')
+
+    def test_sin_base_de_reportes_lee_del_primario(self, configurada):
+        configurada.return_value = False
+        respuesta = vista_reporte(self.factory.get('/'))
+        self.assertEqual(respuesta.content.decode(), 'default')
+
+    def test_escrituras_y_migraciones(self, configurada):
+        vista_reporte(self.factory.get('/'))
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertFalse(self.router.allow_migrate(ALIAS_REPORTES, 'ventas'))
+        self.assertTrue(self.router.allow_migrate('default', 'ventas'))
+
+
+# =========== LECTURA PROPIA ===========
+@override_settings(REPORTES_LECTURA_PROPIA_SEGUNDOS=10)
+@mock.patch('agrofeed_pv.routers.base_reportes_configurada', return_value=True)
+class LecturaPropiaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.sesion = {}
+
+    def peticion(self, metodo, vista=vista_reporte):
+        request = getattr(self.factory, metodo)('/')
+        request.session = self.sesion
+        return LecturaPropiaMiddleware(vista)(request)
+
+    def test_despues_de_un_post_lee_del_primario(self, configurada):
+        self.assertEqual(self.peticion('get').content.decode(), ALIAS_REPORTES)
+
+        self.peticion('post', lambda request: HttpResponse())
+        self.assertIn(SESION_ULTIMA_ESCRITURA, self.sesion)
+
+        self.assertEqual(self.peticion('get').content.decode(), 'default')
+
+    def test_la_ventana_expira(self, configurada):
+        self.sesion[SESION_ULTIMA_ESCRITURA] = time.time() - 11
+        self.assertEqual(self.peticion('get').content.decode(), ALIAS_REPORTES)
+
+    def test_un_post_con_error_no_marca_escritura(self, configurada):
+        self.peticion('post', lambda request: HttpResponse(status=400))
+        self.assertNotIn(SESION_ULTIMA_ESCRITURA, self.sesion)
+        self.assertEqual(self.peticion('get').content.decode(), ALIAS_REPORTES)
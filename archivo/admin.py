@@ -0,0 +1,43 @@
+from django.contrib import admin
+from .models import EjercicioArchivado, VentaArchivada, DetalleVentaArchivado, MovimientoArchivado
+
+
+class SoloLecturaAdmin(admin.ModelAdmin):
+    """El archivo sólo se escribe con el comando archivar_ejercicio"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EjercicioArchivado)
+class EjercicioArchivadoAdmin(SoloLecturaAdmin):
+    list_display = ('anio', 'ventas', 'detalles', 'movimientos', 'total_ventas', 'fecha_archivado', 'usuario')
+
+
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(SoloLecturaAdmin):
+    list_display = ('folio', 'fecha', 'sucursal_id', 'cliente_id', 'total', 'estado')
+    list_filter = ('ejercicio', 'estado', 'forma_pago')
+    search_fields = ('folio',)
+    list_per_page = 20
+
+
+@admin.register(DetalleVentaArchivado)
+class DetalleVentaArchivadoAdmin(SoloLecturaAdmin):
+    list_display = ('venta', 'producto_codigo', 'producto_nombre', 'cantidad', 'subtotal')
+    search_fields = ('venta__folio', 'producto_codigo', 'producto_nombre')
+    list_per_page = 20
+
+
+@admin.register(MovimientoArchivado)
+class MovimientoArchivadoAdmin(SoloLecturaAdmin):
+    list_display = ('fecha', 'producto_codigo', 'producto_nombre', 'tipo', 'cantidad', 'referencia')
+    list_filter = ('ejercicio', 'tipo')
+    search_fields = ('producto_codigo', 'producto_nombre', 'referencia', 'motivo')
+    list_per_page = 20
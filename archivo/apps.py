@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class ArchivoConfig(AppConfig):
+    name = 'archivo'
+    verbose_name = 'Archivo Histórico'
@@ -0,0 +1,230 @@
+"""
+API de lectura del archivo histórico.
+
+Las vistas que pueden tocar periodos archivados (historial de clientes,
+reporte de ventas, auditorías de inventario) consultan aquí la parte
+archivada y la combinan con la activa. Los ejercicios archivados siempre
+son anteriores a los datos activos, así que basta con anteponerlos.
+"""
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncDate
+
+from .models import EjercicioArchivado, VentaArchivada, DetalleVentaArchivado, MovimientoArchivado
+
+
+def anios_archivados():
+    return set(EjercicioArchivado.objects.values_list('anio', flat=True))
+
+
+def periodo_archivado(desde=None, hasta=None):
+    """¿El rango [desde, hasta) incluye algún ejercicio archivado?"""
+    anios = anios_archivados()
+    if not anios:
+        return False
+    primero = desde.year if desde else min(anios)
+    ultimo = hasta.year if hasta else max(anios)
+    return any(primero <= anio <= ultimo for anio in anios)
+
+
+# =========== CONSULTAS ===========
+def ventas_archivadas(sucursal=None, desde=None, hasta=None, cliente=None, estado=None):
+    ventas = VentaArchivada.objects.all()
+    if sucursal:
+        ventas = ventas.filter(sucursal_id=sucursal.pk)
+    if cliente:
+        ventas = ventas.filter(cliente_id=cliente.pk)
+    if estado:
+        ventas = ventas.filter(estado=estado)
+    if desde:
+        ventas = ventas.filter(fecha__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha__lt=hasta)
+    return ventas
+
+
+def detalles_archivados(sucursal=None, desde=None, hasta=None, estado='completada'):
+    detalles = DetalleVentaArchivado.objects.all()
+    if sucursal:
+        detalles = detalles.filter(venta__sucursal_id=sucursal.pk)
+    if estado:
+        detalles = detalles.filter(venta__estado=estado)
+    if desde:
+        detalles = detalles.filter(venta__fecha__gte=desde)
+    if hasta:
+        detalles = detalles.filter(venta__fecha__lt=hasta)
+    return detalles
+
+
+def movimientos_archivados(sucursal=None, producto_sucursal=None, desde=None, hasta=None, tipo=None):
+    """Movimientos de inventario archivados (auditorías)"""
+    movimientos = MovimientoArchivado.objects.all()
+    if sucursal:
+        movimientos = movimientos.filter(sucursal_id=sucursal.pk)
+    if producto_sucursal:
+        movimientos = movimientos.filter(producto_sucursal_id=producto_sucursal.pk)
+    if tipo:
+        movimientos = movimientos.filter(tipo=tipo)
+    if desde:
+        movimientos = movimientos.filter(fecha__gte=desde)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lt=hasta)
+    return movimientos
+
+
+# =========== CLIENTES ===========
+def historial_cliente(cliente, ventas_activas):
+    """Ventas activas del cliente seguidas de las archivadas (más recientes primero)"""
+    return list(ventas_activas) + list(ventas_archivadas(cliente=cliente).order_by('-fecha'))
+
+
+def resumen_cliente(cliente):
+    """Número y monto de compras archivadas del cliente"""
+    resumen = ventas_archivadas(cliente=cliente).aggregate(conteo=Count('id'), total=Sum('total'))
+    return {
+        'total_compras': resumen['conteo'],
+        'monto_total_compras': resumen['total'] or Decimal('0'),
+    }
+
+
+def resumen_clientes(cliente_ids):
+    """Compras archivadas por cliente: filas con cliente_id, conteo y total"""
+    return VentaArchivada.objects.filter(cliente_id__in=cliente_ids).values('cliente_id').annotate(
+        conteo=Count('id'),
+        total=Sum('total')
+    ).order_by()
+
+
+# =========== REPORTES ===========
+def reporte_archivado(sucursal, desde, hasta, grupo_por='dia', tipo_cliente=''):
+    """
+    Parte archivada del reporte de ventas, con las mismas estructuras que
+    arma `ventas.views.reporte_ventas`.
+    """
+    ventas = ventas_archivadas(sucursal, desde, hasta, estado='completada')
+    if tipo_cliente == 'sin_cliente':
+        ventas = ventas.filter(cliente_id__isnull=True)
+    elif tipo_cliente:
+        ventas = ventas.filter(cliente_tipo=tipo_cliente)
+
+    datos = []
+    if grupo_por == 'dia':
+        for item in ventas.annotate(dia=TruncDate('fecha')).values('dia').annotate(
+            total_ventas=Sum('total'),
+            total_ventas_count=Count('id'),
+            total_descuentos=Sum('descuento_total'),
+            promedio_descuento=Avg('descuento_porcentaje')
+        ).order_by('dia'):
+            datos.append({
+                'periodo': item['dia'].isoformat(),
+                'total_ventas': item['total_ventas'] or 0,
+                'ventas_count': item['total_ventas_count'],
+                'total_descuentos': item['total_descuentos'] or 0,
+                'promedio_descuento': item['promedio_descuento'] or 0,
+            })
+    elif grupo_por == 'mes':
+        for item in ventas.annotate(
+            ano=ExtractYear('fecha'), mes=ExtractMonth('fecha')
+        ).values('ano', 'mes').annotate(
+            total_ventas=Sum('total'),
+            total_ventas_count=Count('id'),
+            total_descuentos=Sum('descuento_total')
+        ).order_by('ano', 'mes'):
+            datos.append({
+                'periodo': f"{item['mes']}/{item['ano']}",
+                'total_ventas': item['total_ventas'] or 0,
+                'ventas_count': item['total_ventas_count'],
+                'total_descuentos': item['total_descuentos'] or 0,
+            })
+
+    total_general = ventas.aggregate(
+        total=Sum('total'),
+        count=Count('id'),
+        descuentos=Sum('descuento_total')
+    )
+
+    por_tipo = [
+        {'cliente__tipo_cliente': item['cliente_tipo'] or None, 'total': item['total'], 'count': item['count']}
+        for item in ventas.values('cliente_tipo').annotate(total=Sum('total'), count=Count('id'))
+    ]
+
+    # Mismas llaves que el reporte activo (columnas copiadas de DetalleVenta)
+    productos = list(DetalleVentaArchivado.objects.filter(venta__in=ventas).values(
+        'producto_nombre', 'producto_codigo'
+    ).annotate(
+        cantidad_total=Sum('cantidad'),
+        total_ventas=Sum('subtotal')
+    ))
+
+    return {
+        'datos': datos,
+        'total_general': total_general,
+        'ventas_por_tipo_cliente': por_tipo,
+        'productos_mas_vendidos': productos,
+        'ventas_por_categoria': totales_por_categoria(ventas),
+    }
+
+
+def totales_por_categoria(ventas):
+    """
+    {categoria_id: {'total', 'cantidad'}} de los detalles de `ventas`
+    archivadas, con la categoría actual de cada producto (None si ya no existe).
+    """
+    from catalogos.models import ProductoSucursal
+
+    por_producto = DetalleVentaArchivado.objects.filter(venta__in=ventas).values(
+        'producto_sucursal_id'
+    ).annotate(
+        total=Sum('subtotal'),
+        cantidad=Sum('cantidad')
+    ).order_by()
+    por_producto = {item['producto_sucursal_id']: item for item in por_producto}
+    categorias = dict(ProductoSucursal.objects.filter(
+        pk__in=por_producto
+    ).values_list('pk', 'producto__categoria_id'))
+
+    totales = {}
+    for producto_sucursal_id, item in por_producto.items():
+        acumulado = totales.setdefault(categorias.get(producto_sucursal_id), {'total': 0, 'cantidad': 0})
+        acumulado['total'] += item['total'] or 0
+        acumulado['cantidad'] += item['cantidad'] or 0
+    return totales
+
+
+def combinar_reporte(activo, archivado, limite_productos=10):
+    """Suma la parte archivada a las estructuras del reporte activo"""
+    total_general = dict(activo['total_general'])
+    for campo in ('total', 'count', 'descuentos'):
+        total_general[campo] = (total_general.get(campo) or 0) + (archivado['total_general'][campo] or 0)
+    total_general['promedio_venta'] = (
+        total_general['total'] / total_general['count'] if total_general['count'] else None
+    )
+
+    por_tipo = {}
+    for item in list(archivado['ventas_por_tipo_cliente']) + list(activo['ventas_por_tipo_cliente']):
+        acumulado = por_tipo.setdefault(item['cliente__tipo_cliente'], {
+            'cliente__tipo_cliente': item['cliente__tipo_cliente'], 'total': 0, 'count': 0
+        })
+        acumulado['total'] += item['total'] or 0
+        acumulado['count'] += item['count']
+
+    productos = {}
+    for item in list(archivado['productos_mas_vendidos']) + list(activo['productos_mas_vendidos']):
+        acumulado = productos.setdefault(item['producto_codigo'], {
+            'producto_nombre': item['producto_nombre'],
+            'producto_codigo': item['producto_codigo'],
+            'cantidad_total': 0,
+            'total_ventas': 0,
+        })
+        acumulado['cantidad_total'] += item['cantidad_total'] or 0
+        acumulado['total_ventas'] += item['total_ventas'] or 0
+
+    return {
+        'datos': archivado['datos'] + list(activo['datos']),
+        'total_general': total_general,
+        'ventas_por_tipo_cliente': list(por_tipo.values()),
+        'productos_mas_vendidos': sorted(
+            productos.values(), key=lambda item: item['cantidad_total'], reverse=True
+        )[:limite_productos],
+    }
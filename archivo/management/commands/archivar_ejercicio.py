@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from archivo.services import ErrorArchivo, archivar_ejercicio, resumen_ejercicio, validar_ejercicio
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las ventas, detalles y movimientos de inventario de un ejercicio '
+        'cerrado al archivo histórico, verificando conteos y totales antes de borrar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anio', type=int, help='Año a archivar')
+        parser.add_argument('--lote', type=int, default=2000,
+                            help='Filas por inserción (default: 2000)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Sólo muestra lo que se archivaría')
+
+    def handle(self, *args, **options):
+        anio = options['anio']
+        try:
+            validar_ejercicio(anio)
+        except ErrorArchivo as e:
+            raise CommandError(str(e))
+
+        if options['simular']:
+            resumen = resumen_ejercicio(anio)
+            self.stdout.write(
+                f"Ejercicio {anio}: {resumen['ventas']} ventas (${resumen['total_ventas']}), "
+                f"{resumen['detalles']} detalles, {resumen['movimientos']} movimientos"
+            )
+            return
+
+        try:
+            ejercicio = archivar_ejercicio(anio, lote=options['lote'])
+        except ErrorArchivo as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ejercicio {anio} archivado: {ejercicio.ventas} ventas (${ejercicio.total_ventas}), '
+            f'{ejercicio.detalles} detalles, {ejercicio.movimientos} movimientos'
+        ))
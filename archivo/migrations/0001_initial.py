@@ -0,0 +1,124 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjercicioArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField(unique=True, verbose_name='Año')),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+                ('ventas', models.PositiveIntegerField(default=0)),
+                ('detalles', models.PositiveIntegerField(default=0)),
+                ('movimientos', models.PositiveIntegerField(default=0)),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_detalles', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_movimientos', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ejercicio Archivado',
+                'verbose_name_plural': 'Ejercicios Archivados',
+                'ordering': ['-anio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('sucursal_id', models.BigIntegerField()),
+                ('usuario_id', models.BigIntegerField()),
+                ('cliente_id', models.BigIntegerField(blank=True, null=True)),
+                ('cliente_tipo', models.CharField(blank=True, max_length=20)),
+                ('folio', models.CharField(max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('completada', 'Completada'), ('cancelada', 'Cancelada')], max_length=20)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descuento_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descuento_porcentaje', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('forma_pago', models.CharField(max_length=50)),
+                ('efectivo_recibido', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cambio', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('observaciones', models.TextField(blank=True)),
+                ('fecha', models.DateTimeField()),
+                ('ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_archivadas', to='archivo.ejercicioarchivado')),
+            ],
+            options={
+                'verbose_name': 'Venta Archivada',
+                'verbose_name_plural': 'Ventas Archivadas',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('producto_sucursal_id', models.BigIntegerField()),
+                ('producto_codigo', models.CharField(max_length=50)),
+                ('producto_nombre', models.CharField(max_length=200)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_final', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descuento_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descuento_porcentaje', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tiene_iva', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='archivo.ventaarchivada')),
+            ],
+            options={
+                'verbose_name': 'Detalle de Venta Archivado',
+                'verbose_name_plural': 'Detalles de Venta Archivados',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('producto_sucursal_id', models.BigIntegerField()),
+                ('sucursal_id', models.BigIntegerField()),
+                ('producto_codigo', models.CharField(max_length=50)),
+                ('producto_nombre', models.CharField(max_length=200)),
+                ('tipo', models.CharField(max_length=20)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad_nueva', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('motivo', models.TextField()),
+                ('usuario_id', models.BigIntegerField()),
+                ('referencia', models.CharField(blank=True, max_length=100)),
+                ('fecha', models.DateTimeField()),
+                ('ejercicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_archivados', to='archivo.ejercicioarchivado')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Archivado',
+                'verbose_name_plural': 'Movimientos Archivados',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['producto_sucursal_id', 'fecha'], name='archivo_mov_product_b71f30_idx'), models.Index(fields=['sucursal_id', 'fecha'], name='archivo_mov_sucursa_bff876_idx'), models.Index(fields=['referencia'], name='archivo_mov_referen_0751a9_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['sucursal_id', 'fecha'], name='archivo_ven_sucursa_f24532_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['cliente_id'], name='archivo_ven_cliente_75cd89_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['folio'], name='archivo_ven_folio_2da0ce_idx'),
+        ),
+    ]
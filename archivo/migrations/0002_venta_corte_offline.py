@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archivo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='corte_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='fecha_captura',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='uuid_offline',
+            field=models.CharField(blank=True, max_length=36, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,148 @@
+from django.db import models
+
+from ventas.models import Venta
+
+
+class EjercicioArchivado(models.Model):
+    """Ejercicio (año) cerrado cuyas ventas y movimientos se movieron al archivo"""
+    anio = models.PositiveIntegerField(unique=True, verbose_name="Año")
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(
+        'usuarios.Usuario',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+
+    # Totales verificados contra las tablas de origen antes de borrarlas
+    ventas = models.PositiveIntegerField(default=0)
+    detalles = models.PositiveIntegerField(default=0)
+    movimientos = models.PositiveIntegerField(default=0)
+    total_ventas = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_detalles = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_movimientos = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-anio']
+        verbose_name = "Ejercicio Archivado"
+        verbose_name_plural = "Ejercicios Archivados"
+
+    def __str__(self):
+        return f"Ejercicio {self.anio}"
+
+
+class VentaArchivada(models.Model):
+    """
+    Copia de solo lectura de ventas.Venta. Conserva el id original y guarda
+    los ids de las relaciones sin llaves foráneas, más los datos necesarios
+    para consultar sin unir con las tablas activas.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    ejercicio = models.ForeignKey(
+        EjercicioArchivado,
+        on_delete=models.CASCADE,
+        related_name='ventas_archivadas'
+    )
+    sucursal_id = models.BigIntegerField()
+    usuario_id = models.BigIntegerField()
+    cliente_id = models.BigIntegerField(null=True, blank=True)
+    cliente_tipo = models.CharField(max_length=20, blank=True)
+
+    folio = models.CharField(max_length=20)
+    estado = models.CharField(max_length=20, choices=Venta.ESTADO_CHOICES)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    descuento_total = models.DecimalField(max_digits=12, decimal_places=2)
+    descuento_porcentaje = models.DecimalField(max_digits=5, decimal_places=2)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    forma_pago = models.CharField(max_length=50)
+    efectivo_recibido = models.DecimalField(max_digits=12, decimal_places=2)
+    cambio = models.DecimalField(max_digits=12, decimal_places=2)
+    observaciones = models.TextField(blank=True)
+    fecha = models.DateTimeField()
+    corte_id = models.BigIntegerField(null=True, blank=True)
+
+    # Ventas capturadas sin conexión: la llave de idempotencia y la hora real
+    # de captura (el cubo por hora usa fecha_captura si existe)
+    uuid_offline = models.CharField(max_length=36, unique=True, null=True, blank=True)
+    fecha_captura = models.DateTimeField(null=True, blank=True)
+
+    archivada = True
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = "Venta Archivada"
+        verbose_name_plural = "Ventas Archivadas"
+        indexes = [
+            models.Index(fields=['sucursal_id', 'fecha']),
+            models.Index(fields=['cliente_id']),
+            models.Index(fields=['folio']),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.folio} (archivada)"
+
+
+class DetalleVentaArchivado(models.Model):
+    """Copia de solo lectura de ventas.DetalleVenta"""
+    id = models.BigIntegerField(primary_key=True)
+    venta = models.ForeignKey(
+        VentaArchivada,
+        on_delete=models.CASCADE,
+        related_name='detalles'
+    )
+    producto_sucursal_id = models.BigIntegerField()
+    producto_codigo = models.CharField(max_length=50)
+    producto_nombre = models.CharField(max_length=200)
+
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_final = models.DecimalField(max_digits=10, decimal_places=2)
+    descuento_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    descuento_porcentaje = models.DecimalField(max_digits=5, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    tiene_iva = models.BooleanField(default=True)
+    fecha_creacion = models.DateTimeField()
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Detalle de Venta Archivado"
+        verbose_name_plural = "Detalles de Venta Archivados"
+
+    def __str__(self):
+        return f"{self.producto_nombre} - {self.cantidad}"
+
+
+class MovimientoArchivado(models.Model):
+    """Copia de solo lectura de catalogos.MovimientoInventario"""
+    id = models.BigIntegerField(primary_key=True)
+    ejercicio = models.ForeignKey(
+        EjercicioArchivado,
+        on_delete=models.CASCADE,
+        related_name='movimientos_archivados'
+    )
+    producto_sucursal_id = models.BigIntegerField()
+    sucursal_id = models.BigIntegerField()
+    producto_codigo = models.CharField(max_length=50)
+    producto_nombre = models.CharField(max_length=200)
+
+    tipo = models.CharField(max_length=20)
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad_nueva = models.DecimalField(max_digits=10, decimal_places=2)
+    motivo = models.TextField()
+    usuario_id = models.BigIntegerField()
+    referencia = models.CharField(max_length=100, blank=True)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = "Movimiento Archivado"
+        verbose_name_plural = "Movimientos Archivados"
+        indexes = [
+            models.Index(fields=['producto_sucursal_id', 'fecha']),
+            models.Index(fields=['sucursal_id', 'fecha']),
+            models.Index(fields=['referencia']),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - {self.producto_codigo} - {self.cantidad}"
@@ -0,0 +1,190 @@
+"""
+Archivado de ejercicios cerrados.
+
+Copia ventas, detalles y movimientos de inventario de un año a las tablas
+del archivo, verifica conteos y totales (y los detalles de cada venta)
+contra las tablas activas y sólo entonces borra las filas activas. Todo ocurre en una sola transacción: si
+la verificación falla no se borra nada.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from agrofeed_pv.particiones import rango_fechas, filtro_poda
+from catalogos.models import MovimientoInventario
+from ventas.models import Venta, DetalleVenta, CorteCaja
+from .models import EjercicioArchivado, VentaArchivada, DetalleVentaArchivado, MovimientoArchivado
+
+
+class ErrorArchivo(Exception):
+    """El ejercicio no se puede archivar o la verificación falló"""
+
+
+CAMPOS_VENTA = [
+    'id', 'sucursal_id', 'usuario_id', 'cliente_id', 'folio', 'estado',
+    'subtotal', 'descuento_total', 'descuento_porcentaje', 'total',
+    'forma_pago', 'efectivo_recibido', 'cambio', 'observaciones', 'fecha',
+    'corte_id', 'uuid_offline', 'fecha_captura',
+]
+CAMPOS_DETALLE = [
+    'id', 'venta_id', 'cantidad', 'precio_unitario', 'precio_final',
+    'descuento_unitario', 'descuento_porcentaje', 'subtotal', 'tiene_iva',
+    'fecha_creacion', 'producto_codigo', 'producto_nombre',
+]
+CAMPOS_MOVIMIENTO = [
+    'id', 'producto_sucursal_id', 'tipo', 'cantidad', 'cantidad_anterior',
+    'cantidad_nueva', 'motivo', 'usuario_id', 'referencia', 'fecha',
+]
+
+
+# =========== CONSULTAS DEL EJERCICIO ===========
+def _consultas(anio):
+    """Querysets activos (ventas, detalles, movimientos) del año"""
+    inicio, fin = rango_fechas(date(anio, 1, 1), date(anio, 12, 31))
+    ventas = Venta.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+    # Todos los detalles de las ventas del año. Un detalle nunca es anterior
+    # a su venta, así que la poda sólo usa el límite inferior: un renglón
+    # agregado días después de la venta también se archiva
+    detalles = DetalleVenta.objects.filter(
+        venta_id__in=ventas.values('id'),
+        **filtro_poda('fecha_creacion', inicio)
+    )
+    movimientos = MovimientoInventario.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+    return ventas, detalles, movimientos
+
+
+def _totales(ventas, detalles, movimientos):
+    """Conteos y sumas que deben coincidir entre origen y archivo"""
+    resumen_ventas = ventas.aggregate(conteo=Count('id'), total=Sum('total'))
+    resumen_detalles = detalles.aggregate(conteo=Count('id'), total=Sum('subtotal'))
+    resumen_movimientos = movimientos.aggregate(conteo=Count('id'), total=Sum('cantidad'))
+    return {
+        'ventas': resumen_ventas['conteo'],
+        'detalles': resumen_detalles['conteo'],
+        'movimientos': resumen_movimientos['conteo'],
+        'total_ventas': resumen_ventas['total'] or Decimal('0'),
+        'total_detalles': resumen_detalles['total'] or Decimal('0'),
+        'total_movimientos': resumen_movimientos['total'] or Decimal('0'),
+    }
+
+
+def _ventas_incompletas(ejercicio):
+    """
+    ¿Alguna venta archivada tiene distinto número de detalles que en las
+    tablas activas? Se cuenta sin filtro de poda, antes de borrar (el
+    borrado de Venta elimina en cascada cualquier detalle no copiado).
+    """
+    activos = DetalleVenta.objects.filter(venta_id=OuterRef('id')).order_by().values(
+        'venta_id'
+    ).annotate(n=Count('id')).values('n')
+    return VentaArchivada.objects.filter(ejercicio=ejercicio).annotate(
+        archivados=Count('detalles'),
+        activos=Coalesce(Subquery(activos), 0),
+    ).exclude(archivados=F('activos')).exists()
+
+
+def _en_lotes(queryset, lote):
+    bloque = []
+    for fila in queryset.iterator(chunk_size=lote):
+        bloque.append(fila)
+        if len(bloque) >= lote:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def validar_ejercicio(anio):
+    """Lanza ErrorArchivo si el año no está cerrado o ya se archivó"""
+    if anio >= timezone.localdate().year:
+        raise ErrorArchivo(f'El ejercicio {anio} no está cerrado')
+
+    if EjercicioArchivado.objects.filter(anio=anio).exists():
+        raise ErrorArchivo(f'El ejercicio {anio} ya está archivado')
+
+    inicio, fin = rango_fechas(date(anio, 1, 1), date(anio, 12, 31))
+    if CorteCaja.objects.filter(estado='abierto', fecha_inicio__lt=fin).exists():
+        raise ErrorArchivo(f'Hay cortes de caja abiertos con ventas del ejercicio {anio}')
+
+
+# =========== ARCHIVADO ===========
+def resumen_ejercicio(anio):
+    """Conteos y totales activos del año (para simular antes de archivar)"""
+    return _totales(*_consultas(anio))
+
+
+def archivar_ejercicio(anio, usuario=None, lote=2000):
+    """
+    Mueve el ejercicio `anio` al archivo. Regresa el EjercicioArchivado.
+    """
+    validar_ejercicio(anio)
+    ventas, detalles, movimientos = _consultas(anio)
+
+    with transaction.atomic():
+        origen = _totales(ventas, detalles, movimientos)
+        ejercicio = EjercicioArchivado.objects.create(anio=anio, usuario=usuario, **origen)
+
+        # Ventas (con el tipo de cliente para los reportes)
+        for bloque in _en_lotes(ventas.values(*CAMPOS_VENTA, 'cliente__tipo_cliente').order_by('id'), lote):
+            VentaArchivada.objects.bulk_create([
+                VentaArchivada(
+                    ejercicio=ejercicio,
+                    cliente_tipo=fila.pop('cliente__tipo_cliente') or '',
+                    **fila
+                )
+                for fila in bloque
+            ])
+
+        # Detalles, con el código y nombre del producto copiados al cobrar
+        for bloque in _en_lotes(detalles.values(*CAMPOS_DETALLE, 'producto_id').order_by('id'), lote):
+            DetalleVentaArchivado.objects.bulk_create([
+                DetalleVentaArchivado(producto_sucursal_id=fila.pop('producto_id'), **fila)
+                for fila in bloque
+            ])
+
+        for bloque in _en_lotes(movimientos.values(
+            *CAMPOS_MOVIMIENTO,
+            'producto_sucursal__sucursal_id',
+            'producto_sucursal__producto__codigo',
+            'producto_sucursal__producto__nombre'
+        ).order_by('id'), lote):
+            MovimientoArchivado.objects.bulk_create([
+                MovimientoArchivado(
+                    ejercicio=ejercicio,
+                    sucursal_id=fila.pop('producto_sucursal__sucursal_id'),
+                    producto_codigo=fila.pop('producto_sucursal__producto__codigo'),
+                    producto_nombre=fila.pop('producto_sucursal__producto__nombre'),
+                    **fila
+                )
+                for fila in bloque
+            ])
+
+        archivado = _totales(
+            VentaArchivada.objects.filter(ejercicio=ejercicio),
+            DetalleVentaArchivado.objects.filter(venta__ejercicio=ejercicio),
+            MovimientoArchivado.objects.filter(ejercicio=ejercicio),
+        )
+        diferencias = [campo for campo in origen if origen[campo] != archivado[campo]]
+        if _ventas_incompletas(ejercicio):
+            diferencias.append('detalles por venta')
+        if diferencias:
+            raise ErrorArchivo(
+                f'La verificación del ejercicio {anio} falló en: {", ".join(diferencias)}'
+            )
+
+        # Borrar de las tablas activas: primero lo que depende de Venta
+        detalles.delete()
+        movimientos.delete()
+        ids = list(ventas.values_list('id', flat=True))
+        for inicio in range(0, len(ids), lote):
+            Venta.objects.filter(id__in=ids[inicio:inicio + lote]).delete()
+
+        restantes = _totales(*_consultas(anio))
+        if restantes['ventas'] or restantes['detalles'] or restantes['movimientos']:
+            raise ErrorArchivo(f'Quedaron filas activas del ejercicio {anio}')
+
+    return ejercicio
@@ -3,6 +3,8 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.http import JsonResponse
+from django.db.models import Count, Sum
+from decimal import Decimal
 from ventas.models import CorteCaja, Venta  # ¡Importar de ventas!
 from sucursales.models import Sucursal
 from usuarios.decorators import admin_required
@@ -95,36 +97,27 @@ def cierre_caja(request):
     
     if request.method == 'POST':
         try:
-            # Calcular ventas durante el período del corte
-            ventas_periodo = Venta.objects.filter(
-                sucursal=sucursal,
-                fecha__gte=corte_activo.fecha_inicio,
-                fecha__lte=timezone.now()
-            )
-            total_ventas = sum(venta.total for venta in ventas_periodo)
+            efectivo_real = Decimal(request.POST.get('efectivo_real') or 0)
+            observaciones = request.POST.get('observaciones', '')
             
-            # Actualizar corte
-            corte_activo.fecha_fin = timezone.now()
-            corte_activo.total_ventas = total_ventas
-            corte_activo.save()
-            
-            messages.success(request, f"Caja cerrada exitosamente. Total ventas: ${total_ventas:.2f}")
-            return redirect('caja_principal')
+            # Calcula los totales de las ventas del corte y congela su resumen
+            if corte_activo.cerrar_corte(request.user, efectivo_real, observaciones):
+                messages.success(request, f"Caja cerrada exitosamente. Total ventas: ${corte_activo.total_ventas:.2f}")
+                return redirect('caja_principal')
+            messages.error(request, "Error al cerrar caja")
         except Exception as e:
             messages.error(request, f"Error al cerrar caja: {str(e)}")
     
-    # Obtener ventas para mostrar en el resumen
-    ventas_periodo = Venta.objects.filter(
-        sucursal=sucursal,
-        fecha__gte=corte_activo.fecha_inicio
-    )
+    # Ventas cobradas en el corte
+    ventas_periodo = corte_activo.ventas_incluidas.select_related('cliente').order_by('fecha')
+    totales = ventas_periodo.filter(estado='completada').aggregate(total=Sum('total'), cantidad=Count('id'))
     
     context = {
         'sucursal': sucursal,
         'corte_activo': corte_activo,
         'ventas_periodo': ventas_periodo,
-        'total_ventas': sum(venta.total for venta in ventas_periodo),
-        'cantidad_ventas': ventas_periodo.count(),
+        'total_ventas': totales['total'] or Decimal('0'),
+        'cantidad_ventas': totales['cantidad'],
     }
     
     return render(request, 'caja/cierre.html', context)
@@ -139,7 +132,7 @@ def historial_cortes(request):
     
     cortes = CorteCaja.objects.filter(
         sucursal=sucursal
-    ).order_by('-fecha_inicio')
+    ).select_related('usuario', 'resumen').order_by('-fecha_inicio')
     
     return render(request, 'caja/historial.html', {
         'cortes': cortes,
@@ -149,23 +142,17 @@ def historial_cortes(request):
 @login_required
 @admin_required
 def detalle_corte(request, pk):
-    corte = get_object_or_404(CorteCaja, pk=pk)
+    corte = get_object_or_404(CorteCaja.objects.select_related('sucursal', 'usuario', 'resumen'), pk=pk)
     
     # Verificar que el corte pertenezca a la sucursal del usuario
     if request.user.sucursal != corte.sucursal:
         messages.error(request, "No tienes permiso para ver este corte")
         return redirect('historial_cortes')
     
-    # Obtener ventas del período
-    ventas = Venta.objects.filter(
-        sucursal=corte.sucursal,
-        fecha__gte=corte.fecha_inicio,
-        fecha__lte=corte.fecha_fin if corte.fecha_fin else timezone.now()
-    )
+    # Cerrado: el resumen congelado al cerrar; abierto: calculado al momento
+    resumen = corte.resumen_vigente()
     
     return render(request, 'caja/detalle_corte.html', {
         'corte': corte,
-        'ventas': ventas,
-        'total_ventas': sum(venta.total for venta in ventas),
-        'cantidad_ventas': ventas.count(),
-    })
\ No newline at end of file
+        'resumen': resumen,
+    })
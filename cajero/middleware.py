@@ -1,23 +1,38 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.shortcuts import redirect
 from django.urls import reverse
 
 class CajeroRedirectMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         response = self.get_response(request)
-        
+        return self._redirigir(request.user, request) or response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self._redirigir(await request.auser(), request) or response
+
+    def _redirigir(self, user, request):
         # Si el usuario está autenticado y es cajero
-        if request.user.is_authenticated and hasattr(request.user, 'rol'):
-            if request.user.rol == 'cajero':
+        if user.is_authenticated and hasattr(user, 'rol'):
+            if user.rol == 'cajero':
                 # Redirigir de la página principal a dashboard de cajero
                 if request.path == '/' or request.path == '/dashboard/':
                     return redirect('cajero_dashboard')
-                
+
                 # Evitar que cajeros accedan a admin
                 admin_paths = ['/admin/', '/catalogos/', '/sucursales/', '/usuarios/']
                 if any(request.path.startswith(path) for path in admin_paths):
                     return redirect('cajero_dashboard')
-        
-        return response
\ No newline at end of file
+
+        return None
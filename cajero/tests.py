@@ -1,3 +1,125 @@
+import json
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from catalogos.models import Cliente, Producto, ProductoSucursal
+from sucursales.models import Sucursal
+from usuarios.models import Usuario
+from ventas.models import Venta
+
+
+class DatosCajero:
+    """Sucursal con un cajero, un producto (stock 10, precio 20.00) y un cliente con 10% de descuento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sucursal = Sucursal.objects.create(codigo='S1', nombre='Centro', direccion='Centro')
+        cls.cajero = Usuario.objects.create_user('cajero', 'cajero@x.com', 'x', rol='cajero', sucursal=cls.sucursal)
+        cls.producto = ProductoSucursal.objects.create(
+            producto=Producto.objects.create(codigo='P0', nombre='Producto 0'),
+            sucursal=cls.sucursal,
+            precio_venta=Decimal('20.00'),
+            stock=Decimal('10'),
+        )
+        cls.cliente = Cliente.objects.create(
+            codigo='CLI000001', nombre='Ana', apellido='López',
+            tipo_cliente='frecuente', porcentaje_descuento=Decimal('10'),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.cajero)
+
+    def post_json(self, nombre, datos):
+        respuesta = self.client.post(reverse(nombre), json.dumps(datos), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+
+# =========== COBRO EN LÍNEA ===========
+class ProcesarVentaTests(DatosCajero, TestCase):
+    def test_reintento_con_el_mismo_uuid_regresa_la_venta_registrada(self):
+        self.post_json('ajax_agregar_carrito', {'producto_id': self.producto.id, 'cantidad': 2})
+        primera = self.post_json('cajero_procesar_venta', {'uuid_offline': 'e-1', 'efectivo_recibido': 50})
+        self.assertTrue(primera['success'])
+
+        # La respuesta se perdió: la misma venta llega de nuevo (o por la cola) con su uuid
+        reintento = self.post_json('cajero_procesar_venta', {'uuid_offline': 'e-1', 'efectivo_recibido': 50})
+        self.assertEqual(reintento['venta_id'], primera['venta_id'])
+        sincronizada = self.post_json('ajax_sincronizar_ventas', {'ventas': [{
+            'uuid': 'e-1', 'items': [{'id': self.producto.id, 'cantidad': 2, 'precio': '20.00'}],
+        }]})
+        self.assertEqual(sincronizada['resultados'][0]['estado'], 'duplicada')
+
+        self.assertEqual(Venta.objects.count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, Decimal('8'))
+
+
+# =========== SINCRONIZACIÓN OFFLINE ===========
+class SincronizarVentasTests(DatosCajero, TestCase):
+    def venta(self, uuid, **datos):
+        return {
+            'uuid': uuid,
+            'items': [{'id': self.producto.id, 'cantidad': 1, 'precio': '20.00'}],
+            'forma_pago': 'efectivo',
+            **datos,
+        }
+
+    def sincronizar(self, *ventas):
+        return self.post_json('ajax_sincronizar_ventas', {'ventas': list(ventas)})
+
+    def test_reintento_con_el_mismo_uuid_no_duplica(self):
+        primera = self.sincronizar(self.venta('a-1'))
+        self.assertEqual(primera['resultados'][0]['estado'], 'registrada')
+
+        reintento = self.sincronizar(self.venta('a-1'), self.venta('a-2'), self.venta('a-2'))
+        estados = [resultado['estado'] for resultado in reintento['resultados']]
+        self.assertEqual(estados, ['duplicada', 'registrada', 'duplicada'])
+        self.assertEqual(reintento['resultados'][0]['venta_id'], primera['resultados'][0]['venta_id'])
+        self.assertEqual(Venta.objects.count(), 2)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, Decimal('8'))
+
+    def test_sobreventa_y_cambio_de_precio_son_conflictos(self):
+        respuesta = self.sincronizar(
+            self.venta('b-1', items=[{'id': self.producto.id, 'cantidad': 11, 'precio': '20.00'}]),
+            self.venta('b-2', items=[{'id': self.producto.id, 'cantidad': 1, 'precio': '15.00'}]),
+        )
+        tipos = [resultado['conflictos'][0]['tipo'] for resultado in respuesta['resultados']]
+        self.assertEqual(tipos, ['stock', 'precio'])
+        self.assertEqual(respuesta['conflictos'], 2)
+        self.assertFalse(Venta.objects.exists())
+
+    def test_cliente_id_como_texto_aplica_el_descuento(self):
+        respuesta = self.sincronizar(self.venta('c-1', cliente_id=str(self.cliente.id)))
+        venta = Venta.objects.get(pk=respuesta['resultados'][0]['venta_id'])
+        self.assertEqual(venta.cliente, self.cliente)
+        self.assertEqual(venta.total, Decimal('18.00'))
+
+    def test_cliente_inexistente_o_inactivo_es_conflicto(self):
+        Cliente.objects.filter(pk=self.cliente.pk).update(activo=False)
+        respuesta = self.sincronizar(
+            self.venta('d-1', cliente_id=self.cliente.id),
+            self.venta('d-2', cliente_id='no-es-id'),
+        )
+        for resultado in respuesta['resultados']:
+            self.assertEqual(resultado['estado'], 'conflicto')
+            self.assertEqual(resultado['conflictos'][0]['tipo'], 'cliente')
+        self.assertFalse(Venta.objects.exists())
 
-# Create your tests here.
+    def test_datos_malformados_son_conflicto_de_esa_venta(self):
+        item = {'id': self.producto.id, 'cantidad': 1, 'precio': '20.00'}
+        respuesta = self.sincronizar(
+            self.venta('f-1', items=[{**item, 'cantidad': 'NaN'}]),
+            self.venta('f-2', items=[{**item, 'precio': 'abc'}]),
+            self.venta('f-3', efectivo_recibido='Infinity'),
+            self.venta('f-4', items=[{**item, 'id': 'x'}]),
+            self.venta('f-5'),
+        )
+        estados = [resultado['estado'] for resultado in respuesta['resultados']]
+        self.assertEqual(estados, ['conflicto'] * 4 + ['registrada'])
+        for resultado in respuesta['resultados'][:4]:
+            self.assertEqual(resultado['conflictos'][0]['tipo'], 'datos')
+        self.assertEqual(Venta.objects.get().uuid_offline, 'f-5')
@@ -1,19 +1,27 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
+from django.db.models import Q, Sum
 from django.utils import timezone
 from django.core.paginator import Paginator
 from decimal import Decimal
 import json
+import time
 from datetime import datetime, timedelta
 
 from ventas.models import Venta, DetalleVenta, CorteCaja
+from ventas.services import registrar_venta, registrar_ventas, corte_abierto, ErrorVenta
+from ventas import tickets
 from catalogos.models import ProductoSucursal, Cliente, MovimientoInventario
+from catalogos import alertas, asociaciones, escaneo
 from sucursales.models import Sucursal
 from usuarios.decorators import cajero_required
+from agrofeed_pv.routers import usa_base_reportes
+from archivo.consultas import ventas_archivadas
+from agrofeed_pv.cargas import clase_carga, COBRO, INTERACTIVA, REPORTE
 
 @login_required
 @cajero_required
@@ -33,11 +41,7 @@ def cajero_dashboard(request):
     cantidad_ventas_hoy = ventas_hoy.count()
     
     # Productos con bajo stock
-    productos_bajo_stock = ProductoSucursal.objects.filter(
-        sucursal=sucursal,
-        stock__lte=models.F('stock_minimo'),
-        activo=True
-    ).count()
+    productos_bajo_stock = alertas.productos_bajo_stock(sucursal.id if sucursal else None)
     
     # Corte de caja activo
     corte_activo = CorteCaja.objects.filter(
@@ -113,9 +117,40 @@ def cajero_nueva_venta(request):
     
     return render(request, 'cajero/nueva_venta.html', context)
 
+def _agregar_al_carrito(request, producto, cantidad):
+    """Suma `cantidad` del producto (id, nombre, codigo, precio, stock, tiene_iva) al carrito de la sesión"""
+    carrito = request.session.get('carrito_cajero', [])
+    
+    # Buscar si ya existe en el carrito
+    item_encontrado = False
+    for item in carrito:
+        if item['id'] == producto['id']:
+            item['cantidad'] = float(Decimal(str(item['cantidad'])) + cantidad)
+            item['subtotal'] = float(Decimal(str(item['precio'])) * Decimal(str(item['cantidad'])))
+            item_encontrado = True
+            break
+    
+    # Si no existe, agregarlo
+    if not item_encontrado:
+        carrito.append({
+            'id': producto['id'],
+            'nombre': producto['nombre'],
+            'codigo': producto['codigo'],
+            'precio': float(producto['precio']),
+            'cantidad': float(cantidad),
+            'subtotal': float(producto['precio'] * cantidad),
+            'stock': float(producto['stock']),
+            'tiene_iva': producto['tiene_iva'],
+        })
+    
+    request.session['carrito_cajero'] = carrito
+    request.session.modified = True
+    return carrito
+
 @login_required
 @cajero_required
 @csrf_exempt
+@clase_carga(COBRO)
 def ajax_agregar_carrito(request):
     """Agregar producto al carrito (AJAX)"""
     if request.method == 'POST':
@@ -136,33 +171,14 @@ def ajax_agregar_carrito(request):
                     'error': f'Stock insuficiente. Disponible: {producto_sucursal.stock}'
                 })
             
-            carrito = request.session.get('carrito_cajero', [])
-            
-            # Buscar si ya existe en el carrito
-            item_encontrado = False
-            for item in carrito:
-                if item['id'] == producto_sucursal.id:
-                    item['cantidad'] = float(Decimal(str(item['cantidad'])) + cantidad)
-                    item['subtotal'] = float(Decimal(str(item['precio'])) * Decimal(str(item['cantidad'])))
-                    item_encontrado = True
-                    break
-            
-            # Si no existe, agregarlo
-            if not item_encontrado:
-                item = {
-                    'id': producto_sucursal.id,
-                    'nombre': producto_sucursal.producto.nombre,
-                    'codigo': producto_sucursal.producto.codigo,
-                    'precio': float(producto_sucursal.precio_venta),
-                    'cantidad': float(cantidad),
-                    'subtotal': float(producto_sucursal.precio_venta * cantidad),
-                    'stock': float(producto_sucursal.stock),
-                    'tiene_iva': producto_sucursal.producto.tiene_iva,
-                }
-                carrito.append(item)
-            
-            request.session['carrito_cajero'] = carrito
-            request.session.modified = True
+            carrito = _agregar_al_carrito(request, {
+                'id': producto_sucursal.id,
+                'nombre': producto_sucursal.producto.nombre,
+                'codigo': producto_sucursal.producto.codigo,
+                'precio': producto_sucursal.precio_venta,
+                'stock': producto_sucursal.stock,
+                'tiene_iva': producto_sucursal.producto.tiene_iva,
+            }, cantidad)
             
             return JsonResponse({
                 'success': True,
@@ -181,6 +197,88 @@ def ajax_agregar_carrito(request):
 @login_required
 @cajero_required
 @csrf_exempt
+@clase_carga(COBRO)
+def ajax_escanear(request):
+    """
+    Escaneo de código de barras (AJAX): busca el código principal o alterno
+    en el índice en memoria de la sucursal y agrega el producto al carrito.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'})
+
+    inicio = time.perf_counter()
+    try:
+        data = json.loads(request.body)
+        codigo = str(data.get('codigo', '')).strip()
+        cantidad = Decimal(str(data.get('cantidad', 1)))
+    except (ValueError, ArithmeticError):
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'})
+    if not codigo or cantidad <= 0:
+        return JsonResponse({'success': False, 'error': 'Datos inválidos'})
+
+    articulo = escaneo.buscar(request.user.sucursal_id, codigo)
+    if articulo is None:
+        return JsonResponse({'success': False, 'encontrado': False, 'error': f'Código {codigo} no encontrado'})
+
+    # El stock cambia con cada venta: no vive en el índice
+    stock = ProductoSucursal.objects.filter(pk=articulo.id).values_list('stock', flat=True).first()
+    cantidad *= articulo.cantidad
+    if stock is None or cantidad > stock:
+        return JsonResponse({
+            'success': False,
+            'encontrado': True,
+            'error': f'Stock insuficiente. Disponible: {stock or 0}'
+        })
+
+    producto = {
+        'id': articulo.id,
+        'nombre': articulo.nombre,
+        'codigo': articulo.codigo,
+        'precio': articulo.precio,
+        'stock': stock,
+        'tiene_iva': articulo.tiene_iva,
+    }
+    carrito = _agregar_al_carrito(request, producto, cantidad)
+    duracion = (time.perf_counter() - inicio) * 1000
+
+    response = JsonResponse({
+        'success': True,
+        'producto': {
+            **producto,
+            'precio': float(articulo.precio),
+            'stock': float(stock),
+            'cantidad': float(cantidad),
+        },
+        'carrito': carrito,
+        'carrito_count': len(carrito),
+    })
+    response['Server-Timing'] = f'escaneo;dur={duracion:.3f}'
+    return response
+
+@login_required
+@cajero_required
+def ajax_sugerencias(request):
+    """
+    Productos que suelen comprarse con los del carrito (AJAX). Lee las
+    asociaciones precalculadas de cada producto (catalogos/asociaciones.py).
+    """
+    if 'productos' in request.GET:
+        try:
+            ids = [int(i) for i in request.GET['productos'].split(',') if i]
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Datos inválidos'})
+    else:
+        ids = [item['id'] for item in request.session.get('carrito_cajero', [])]
+
+    return JsonResponse({
+        'success': True,
+        'sugerencias': asociaciones.sugerencias(ids, request.user.sucursal_id),
+    })
+
+@login_required
+@cajero_required
+@csrf_exempt
+@clase_carga(COBRO)
 def ajax_remover_carrito(request):
     """Remover producto del carrito (AJAX)"""
     if request.method == 'POST':
@@ -253,135 +351,72 @@ def ajax_seleccionar_cliente(request):
 @login_required
 @cajero_required
 @csrf_exempt
+@clase_carga(COBRO)
 def cajero_procesar_venta(request):
     """Procesar la venta del cajero"""
     if request.method == 'POST':
         carrito = request.session.get('carrito_cajero', [])
-        
-        if not carrito:
-            return JsonResponse({
-                'success': False,
-                'error': 'El carrito está vacío'
-            })
-        
         sucursal = request.user.sucursal
         
         try:
-            with transaction.atomic():
+            # Obtener datos del formulario
+            data = json.loads(request.body)
+            
+            # El navegador genera el uuid antes de enviar: si la respuesta se
+            # perdió y la venta se encoló, el reintento no la duplica
+            uuid = data.get('uuid_offline') or None
+            if uuid is not None and (not isinstance(uuid, str) or len(uuid) > 36):
+                return JsonResponse({'success': False, 'error': 'Identificador de venta inválido'})
+            venta = Venta.objects.filter(uuid_offline=uuid, sucursal=sucursal).first() if uuid else None
+            
+            if venta is None:
+                if not carrito:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'El carrito está vacío'
+                    })
+                
                 # Obtener cliente si existe
                 cliente_id = request.session.get('cliente_id_cajero')
                 cliente = None
                 if cliente_id:
                     cliente = Cliente.objects.get(id=cliente_id, activo=True)
                 
-                # Calcular totales
-                subtotal = sum(Decimal(str(item['subtotal'])) for item in carrito)
-                descuento_total = Decimal('0')
-                descuento_porcentaje = Decimal('0')
-                
-                if cliente and cliente.porcentaje_descuento > 0:
-                    descuento_porcentaje = cliente.porcentaje_descuento
-                    descuento_total = subtotal * (descuento_porcentaje / Decimal('100'))
-                
-                total = subtotal - descuento_total
-                
-                # Obtener datos del formulario
-                data = json.loads(request.body)
-                forma_pago = data.get('forma_pago', 'efectivo')
                 efectivo_recibido = Decimal(str(data.get('efectivo_recibido', 0)))
-                observaciones = data.get('observaciones', '')
                 
-                # Crear venta
-                venta = Venta.objects.create(
-                    sucursal=sucursal,
-                    usuario=request.user,
+                # Registrar venta (bloqueo de stock, detalles y movimientos en lote)
+                venta = registrar_venta(
+                    sucursal,
+                    request.user,
+                    carrito,
+                    corte=corte_abierto(sucursal, request.user),
                     cliente=cliente,
-                    subtotal=subtotal,
-                    descuento_total=descuento_total,
-                    descuento_porcentaje=descuento_porcentaje,
-                    total=total,
-                    forma_pago=forma_pago,
+                    forma_pago=data.get('forma_pago', 'efectivo'),
                     efectivo_recibido=efectivo_recibido,
-                    cambio=max(efectivo_recibido - total, Decimal('0')),
-                    observaciones=observaciones,
-                    creado_por=request.user
+                    observaciones=data.get('observaciones', ''),
+                    uuid_offline=uuid
                 )
-                
-                # Crear detalles y actualizar stock
-                for item in carrito:
-                    producto_sucursal = ProductoSucursal.objects.get(
-                        id=item['id'],
-                        sucursal=sucursal
-                    )
-                    
-                    # Precios
-                    precio_unitario = Decimal(str(item['precio']))
-                    precio_final = precio_unitario
-                    descuento_unitario = Decimal('0')
-                    
-                    # Aplicar descuento del cliente
-                    if cliente and cliente.porcentaje_descuento > 0:
-                        descuento_unitario = precio_unitario * (cliente.porcentaje_descuento / Decimal('100'))
-                        precio_final = precio_unitario - descuento_unitario
-                    
-                    # Calcular subtotal
-                    cantidad = Decimal(str(item['cantidad']))
-                    subtotal_item = precio_final * cantidad
-                    
-                    # Registrar movimiento de inventario
-                    cantidad_anterior = producto_sucursal.stock
-                    producto_sucursal.stock -= cantidad
-                    producto_sucursal.save()
-                    
-                    MovimientoInventario.objects.create(
-                        producto_sucursal=producto_sucursal,
-                        tipo='salida',
-                        cantidad=cantidad,
-                        cantidad_anterior=cantidad_anterior,
-                        cantidad_nueva=producto_sucursal.stock,
-                        motivo=f'Venta #{venta.folio}',
-                        usuario=request.user,
-                        referencia=f'VENTA-{venta.folio}'
-                    )
-                    
-                    # Crear detalle de venta
-                    DetalleVenta.objects.create(
-                        venta=venta,
-                        producto=producto_sucursal,
-                        cantidad=cantidad,
-                        precio_unitario=precio_unitario,
-                        precio_final=precio_final,
-                        descuento_unitario=descuento_unitario,
-                        subtotal=subtotal_item,
-                        tiene_iva=item.get('tiene_iva', True),
-                        descuento_porcentaje=descuento_porcentaje
-                    )
-                
-                # Actualizar corte de caja actual
-                corte_actual = CorteCaja.objects.filter(
-                    sucursal=sucursal,
-                    estado='abierto',
-                    usuario=request.user
-                ).first()
-                
-                if corte_actual:
-                    corte_actual.ventas_incluidas.add(venta)
-                    corte_actual.calcular_totales()
-                
-                # Limpiar sesión
-                if 'carrito_cajero' in request.session:
-                    del request.session['carrito_cajero']
-                if 'cliente_id_cajero' in request.session:
-                    del request.session['cliente_id_cajero']
-                
-                return JsonResponse({
-                    'success': True,
-                    'venta_id': venta.id,
-                    'folio': venta.folio,
-                    'total': float(total),
-                    'cambio': float(max(efectivo_recibido - total, Decimal('0')))
-                })
+            
+            # Limpiar sesión
+            if 'carrito_cajero' in request.session:
+                del request.session['carrito_cajero']
+            if 'cliente_id_cajero' in request.session:
+                del request.session['cliente_id_cajero']
+            
+            return JsonResponse({
+                'success': True,
+                'venta_id': venta.id,
+                'folio': venta.folio,
+                'total': float(venta.total),
+                'cambio': float(venta.cambio)
+            })
         
+        except ErrorVenta as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e),
+                'conflictos': e.conflictos
+            })
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -390,6 +425,230 @@ def cajero_procesar_venta(request):
     
     return JsonResponse({'success': False, 'error': 'Método no permitido'})
 
+@login_required
+@cajero_required
+@clase_carga(INTERACTIVA)
+def ajax_catalogo_offline(request):
+    """Snapshot del catálogo de la sucursal para operar sin conexión (AJAX)"""
+    sucursal = request.user.sucursal
+    
+    productos = ProductoSucursal.objects.filter(
+        sucursal=sucursal,
+        activo=True,
+        producto__activo=True
+    ).values(
+        'id', 'precio_venta', 'stock',
+        'producto__codigo', 'producto__nombre',
+        'producto__tiene_iva', 'producto__categoria__nombre'
+    ).order_by('producto__nombre')
+    
+    clientes = Cliente.objects.filter(activo=True).values(
+        'id', 'codigo', 'nombre', 'apellido', 'telefono', 'porcentaje_descuento'
+    )
+    
+    return JsonResponse({
+        'success': True,
+        'generado': timezone.now().isoformat(),
+        'productos': [{
+            'id': p['id'],
+            'codigo': p['producto__codigo'],
+            'nombre': p['producto__nombre'],
+            'precio': float(p['precio_venta']),
+            'stock': float(p['stock']),
+            'tiene_iva': p['producto__tiene_iva'],
+            'categoria': p['producto__categoria__nombre'] or '',
+        } for p in productos],
+        'clientes': [{
+            'id': c['id'],
+            'codigo': c['codigo'],
+            'nombre': f"{c['nombre']} {c['apellido']}",
+            'telefono': c['telefono'],
+            'descuento': float(c['porcentaje_descuento']),
+        } for c in clientes],
+    })
+
+def _numero_offline(valor, campo, opcional=False):
+    """Decimal finito y no negativo de la cola offline; ValueError si no lo es"""
+    if opcional and valor in (None, ''):
+        return None
+    try:
+        numero = Decimal(str(valor))
+    except ArithmeticError:
+        raise ValueError(f'{campo}: "{valor}" no es un número')
+    if not numero.is_finite():
+        raise ValueError(f'{campo}: "{valor}" no es un número')
+    if numero < 0 or numero >= Decimal('100000000'):
+        raise ValueError(f'{campo} fuera de rango: {valor}')
+    return numero
+
+def _venta_offline(venta_data):
+    """Valida y convierte una venta de la cola offline; ValueError con el motivo"""
+    items = venta_data.get('items')
+    if not isinstance(items, list):
+        raise ValueError('La venta no trae una lista de productos')
+    
+    convertidos = []
+    for item in items:
+        try:
+            producto_id = int(item['id'])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            producto_id = 0
+        if not 0 < producto_id < 2 ** 63:
+            raise ValueError('Producto sin identificador válido')
+        convertidos.append({
+            'id': producto_id,
+            'cantidad': _numero_offline(item.get('cantidad'), 'cantidad'),
+            'precio': _numero_offline(item.get('precio'), 'precio', opcional=True),
+        })
+    
+    fecha_captura = venta_data.get('fecha')
+    if fecha_captura:
+        try:
+            fecha_captura = datetime.fromisoformat(str(fecha_captura).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f'Fecha de captura inválida: {fecha_captura}')
+    
+    return {
+        'items': convertidos,
+        'forma_pago': venta_data.get('forma_pago', 'efectivo'),
+        'efectivo_recibido': _numero_offline(venta_data.get('efectivo_recibido') or 0, 'efectivo_recibido'),
+        'observaciones': venta_data.get('observaciones', ''),
+        'fecha_captura': fecha_captura or None,
+    }
+
+@login_required
+@cajero_required
+@csrf_exempt
+@clase_carga(COBRO)
+def ajax_sincronizar_ventas(request):
+    """Recibe un lote de ventas capturadas sin conexión (AJAX)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'})
+    
+    try:
+        data = json.loads(request.body)
+        ventas_data = data.get('ventas', [])[:200]
+        if not all(isinstance(v, dict) for v in ventas_data):
+            raise ValueError
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Formato inválido'})
+    
+    sucursal = request.user.sucursal
+    resultados = [None] * len(ventas_data)
+    
+    # Ventas ya sincronizadas (reintentos de la misma cola)
+    uuids = [v['uuid'] for v in ventas_data if isinstance(v.get('uuid'), str)]
+    existentes = {
+        v['uuid_offline']: v for v in Venta.objects.filter(
+            uuid_offline__in=uuids
+        ).values('uuid_offline', 'id', 'folio')
+    }
+    # Una cola rezagada puede traer ventas de un ejercicio ya archivado
+    faltantes = [uuid for uuid in uuids if uuid not in existentes]
+    if faltantes:
+        existentes.update({
+            v['uuid_offline']: v for v in ventas_archivadas().filter(
+                uuid_offline__in=faltantes
+            ).values('uuid_offline', 'id', 'folio')
+        })
+    # El JSON puede traer el id como texto; in_bulk regresa llaves enteras
+    ids_clientes = set()
+    for venta_data in ventas_data:
+        try:
+            ids_clientes.add(int(venta_data['cliente_id']))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            pass
+    clientes = Cliente.objects.filter(activo=True).in_bulk(ids_clientes)
+    
+    pendientes = []
+    vistos = set()
+    for indice, venta_data in enumerate(ventas_data):
+        uuid = venta_data.get('uuid')
+        if not uuid or not isinstance(uuid, str):
+            resultados[indice] = {'uuid': None, 'estado': 'error', 'error': 'Venta sin identificador'}
+            continue
+        
+        if uuid in existentes or uuid in vistos:
+            existente = existentes.get(uuid, {})
+            resultados[indice] = {
+                'uuid': uuid,
+                'estado': 'duplicada',
+                'venta_id': existente.get('id'),
+                'folio': existente.get('folio'),
+            }
+            continue
+        vistos.add(uuid)
+        
+        # Un cliente que no existe (o se desactivó) no se descarta en silencio:
+        # la venta llevaría otro descuento
+        cliente = None
+        cliente_id = venta_data.get('cliente_id')
+        if cliente_id:
+            try:
+                cliente = clientes.get(int(cliente_id))
+            except (TypeError, ValueError, OverflowError):
+                pass
+            if cliente is None:
+                resultados[indice] = {
+                    'uuid': uuid,
+                    'estado': 'conflicto',
+                    'conflictos': [{
+                        'tipo': 'cliente',
+                        'cliente_id': cliente_id,
+                        'mensaje': 'Cliente no encontrado o inactivo'
+                    }],
+                }
+                continue
+        
+        # Un dato malformado (o NaN) es conflicto de esta venta, no error del lote
+        try:
+            datos = _venta_offline(venta_data)
+        except ValueError as e:
+            resultados[indice] = {
+                'uuid': uuid,
+                'estado': 'conflicto',
+                'conflictos': [{'tipo': 'datos', 'mensaje': str(e)}],
+            }
+            continue
+        datos.update({'cliente': cliente, 'uuid_offline': uuid})
+        pendientes.append((indice, datos))
+    
+    if pendientes:
+        try:
+            registradas = registrar_ventas(
+                sucursal,
+                request.user,
+                [datos for _, datos in pendientes],
+                corte=corte_abierto(sucursal, request.user),
+                validar_precios=True
+            )
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+        
+        for (indice, datos), resultado in zip(pendientes, registradas):
+            if 'venta' in resultado:
+                venta = resultado['venta']
+                resultados[indice] = {
+                    'uuid': datos['uuid_offline'],
+                    'estado': 'registrada',
+                    'venta_id': venta.id,
+                    'folio': venta.folio,
+                    'total': float(venta.total),
+                }
+            else:
+                resultados[indice] = {
+                    'uuid': datos['uuid_offline'],
+                    'estado': 'conflicto',
+                    'conflictos': resultado['conflictos'],
+                }
+    
+    return JsonResponse({
+        'success': True,
+        'resultados': resultados,
+        'registradas': sum(1 for r in resultados if r['estado'] == 'registrada'),
+        'conflictos': sum(1 for r in resultados if r['estado'] == 'conflicto'),
+    })
+
 @login_required
 @cajero_required
 def cajero_limpiar_carrito(request):
@@ -485,7 +744,7 @@ def cajero_cortes(request):
     cortes = CorteCaja.objects.filter(
         sucursal=sucursal,
         usuario=request.user
-    ).order_by('-fecha_inicio')
+    ).select_related('resumen').order_by('-fecha_inicio')
     
     # Corte activo
     corte_activo = cortes.filter(estado='abierto').first()
@@ -566,10 +825,10 @@ def cajero_cierre_caja(request):
             messages.error(request, f'Error: {str(e)}')
     
     # Calcular ventas del corte
-    ventas_corte = corte_activo.ventas_incluidas.filter(estado='completada')
-    total_efectivo_esperado = sum(
-        venta.total for venta in ventas_corte.filter(forma_pago='efectivo')
-    )
+    total_efectivo_esperado = corte_activo.ventas_incluidas.filter(
+        estado='completada',
+        forma_pago='efectivo'
+    ).aggregate(total=Sum('total'))['total'] or Decimal('0')
     
     context = {
         'corte': corte_activo,
@@ -580,6 +839,7 @@ def cajero_cierre_caja(request):
 
 @login_required
 @cajero_required
+@usa_base_reportes
 def cajero_lista_ventas(request):
     """Lista de ventas realizadas por el cajero"""
     sucursal = request.user.sucursal
@@ -617,7 +877,7 @@ def cajero_detalle_venta(request, pk):
         messages.error(request, "No tienes permiso para ver esta venta")
         return redirect('cajero_lista_ventas')
     
-    detalles = venta.detalles.all().select_related('producto__producto')
+    detalles = venta.detalles.all()
     
     context = {
         'venta': venta,
@@ -630,14 +890,24 @@ def cajero_detalle_venta(request, pk):
 @cajero_required
 def cajero_generar_ticket(request, pk):
     """Generar ticket/recibo de venta"""
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(Venta.objects.select_related('sucursal', 'usuario', 'cliente'), pk=pk)
     
     # Verificar que la venta sea del cajero
     if venta.usuario != request.user:
         messages.error(request, "No tienes permiso para ver esta venta")
         return redirect('cajero_lista_ventas')
     
-    detalles = venta.detalles.all().select_related('producto__producto')
+    detalles = venta.detalles.all()
+    
+    formato = request.GET.get('formato')
+    if formato == 'pdf':
+        response = HttpResponse(tickets.ticket_pdf(venta, detalles), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="ticket-{venta.folio}.pdf"'
+        return response
+    if formato == 'escpos':
+        response = HttpResponse(tickets.ticket_escpos(venta, detalles), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="ticket-{venta.folio}.bin"'
+        return response
     
     context = {
         'venta': venta,
@@ -649,19 +919,20 @@ def cajero_generar_ticket(request, pk):
 
 @login_required
 @cajero_required
-def cajero_buscar_productos(request):
-    """Búsqueda rápida de productos (AJAX)"""
+async def cajero_buscar_productos(request):
+    """Búsqueda rápida de productos (AJAX, async: se llama en cada tecla)"""
     query = request.GET.get('q', '')
+    usuario = await request.auser()
     
     productos = ProductoSucursal.objects.filter(
-        sucursal=request.user.sucursal,
+        sucursal_id=usuario.sucursal_id,
         producto__nombre__icontains=query,
         activo=True,
         producto__activo=True
-    ).select_related('producto')[:10]
+    ).select_related('producto__categoria')[:10]
     
     results = []
-    for producto in productos:
+    async for producto in productos:
         results.append({
             'id': producto.id,
             'nombre': producto.producto.nombre,
@@ -675,8 +946,8 @@ def cajero_buscar_productos(request):
 
 @login_required
 @cajero_required
-def cajero_buscar_clientes(request):
-    """Búsqueda rápida de clientes (AJAX)"""
+async def cajero_buscar_clientes(request):
+    """Búsqueda rápida de clientes (AJAX, async: se llama en cada tecla)"""
     query = request.GET.get('q', '')
     
     clientes = Cliente.objects.filter(
@@ -685,7 +956,7 @@ def cajero_buscar_clientes(request):
     )[:10]
     
     results = []
-    for cliente in clientes:
+    async for cliente in clientes:
         results.append({
             'id': cliente.id,
             'nombre': cliente.nombre_completo,
@@ -698,6 +969,8 @@ def cajero_buscar_clientes(request):
 
 @login_required
 @cajero_required
+@usa_base_reportes
+@clase_carga(REPORTE)
 def cajero_reportes_ventas(request):
     """Reporte de ventas del día"""
     sucursal = request.user.sucursal
@@ -1,7 +1,9 @@
 from django.contrib import admin
+from agrofeed_pv.admin_utils import AdminVolumen
 from .models import (
     Proveedor, Categoria, UnidadMedida, 
-    Producto, ProductoSucursal, MovimientoInventario
+    Producto, ProductoSucursal, MovimientoInventario, PronosticoDemanda, AsociacionProducto,
+    SecuenciaCodigo, CodigoBarras, Cliente
 )
 
 @admin.register(Proveedor)
@@ -14,10 +16,11 @@ class ProveedorAdmin(admin.ModelAdmin):
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'padre', 'activa', 'fecha_creacion')
-    list_filter = ('activa', 'padre')
-    search_fields = ('nombre', 'descripcion')
+    list_display = ('ruta', 'nivel', 'activa', 'fecha_creacion')
+    list_filter = ('activa', 'nivel')
+    search_fields = ('nombre', 'ruta', 'descripcion')
     list_per_page = 20
+    readonly_fields = ('ruta', 'nivel')
 
 
 @admin.register(UnidadMedida)
@@ -26,28 +29,76 @@ class UnidadMedidaAdmin(admin.ModelAdmin):
     search_fields = ('nombre', 'abreviatura')
 
 
+class CodigoBarrasInline(admin.TabularInline):
+    model = CodigoBarras
+    extra = 1
+    fields = ('codigo', 'descripcion', 'cantidad')
+
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ('codigo', 'nombre', 'categoria', 'proveedor', 'activo', 'fecha_creacion')
     list_filter = ('activo', 'tipo', 'categoria', 'proveedor')
-    search_fields = ('codigo', 'nombre', 'descripcion')
+    list_select_related = ('categoria', 'proveedor')
+    search_fields = ('codigo', 'nombre', 'descripcion', 'codigos_barras__codigo')
     list_per_page = 20
     readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+    inlines = [CodigoBarrasInline]
 
 
 @admin.register(ProductoSucursal)
-class ProductoSucursalAdmin(admin.ModelAdmin):
+class ProductoSucursalAdmin(AdminVolumen):
     list_display = ('producto', 'sucursal', 'precio_venta', 'stock', 'activo')
     list_filter = ('activo', 'sucursal')
+    list_select_related = ('producto', 'sucursal')
     search_fields = ('producto__nombre', 'producto__codigo')
-    list_per_page = 20
+    autocomplete_fields = ('producto', 'sucursal')
     readonly_fields = ('ultima_actualizacion',)
 
 
 @admin.register(MovimientoInventario)
-class MovimientoInventarioAdmin(admin.ModelAdmin):
+class MovimientoInventarioAdmin(AdminVolumen):
     list_display = ('producto_sucursal', 'tipo', 'cantidad', 'usuario', 'fecha')
-    list_filter = ('tipo', 'fecha')
+    list_filter = ('tipo', 'producto_sucursal__sucursal')
+    list_select_related = ('producto_sucursal__producto', 'producto_sucursal__sucursal', 'usuario')
     search_fields = ('producto_sucursal__producto__nombre', 'motivo')
-    list_per_page = 20
-    readonly_fields = ('fecha',)
\ No newline at end of file
+    autocomplete_fields = ('producto_sucursal', 'usuario')
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha',)
+
+
+@admin.register(PronosticoDemanda)
+class PronosticoDemandaAdmin(AdminVolumen):
+    list_display = ('producto_sucursal', 'semana', 'cantidad', 'fecha_calculo')
+    list_filter = ('producto_sucursal__sucursal',)
+    list_select_related = ('producto_sucursal__producto', 'producto_sucursal__sucursal')
+    search_fields = ('producto_sucursal__producto__nombre', 'producto_sucursal__producto__codigo')
+    autocomplete_fields = ('producto_sucursal',)
+    date_hierarchy = 'semana'
+    readonly_fields = ('fecha_calculo',)
+
+
+@admin.register(AsociacionProducto)
+class AsociacionProductoAdmin(AdminVolumen):
+    list_display = ('producto', 'rango', 'asociado', 'ventas_juntas', 'confianza', 'lift', 'fecha_calculo')
+    list_filter = ('producto__sucursal',)
+    list_select_related = ('producto__producto', 'producto__sucursal', 'asociado__producto', 'asociado__sucursal')
+    search_fields = ('producto__producto__nombre', 'producto__producto__codigo')
+    autocomplete_fields = ('producto', 'asociado')
+    readonly_fields = ('fecha_calculo',)
+
+
+@admin.register(Cliente)
+class ClienteAdmin(AdminVolumen):
+    list_display = ('codigo', 'nombre', 'apellido', 'telefono', 'tipo_cliente', 'sucursal_registro', 'activo')
+    list_filter = ('activo', 'tipo_cliente', 'sucursal_registro')
+    list_select_related = ('sucursal_registro',)
+    search_fields = ('codigo', 'nombre', 'apellido', 'telefono', 'email', 'rfc')
+    autocomplete_fields = ('sucursal_registro',)
+    readonly_fields = ('fecha_registro', 'fecha_actualizacion')
+
+
+@admin.register(SecuenciaCodigo)
+class SecuenciaCodigoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'ultimo')
+    search_fields = ('nombre',)
@@ -0,0 +1,91 @@
+"""
+Alertas y contador de productos bajo su stock mínimo.
+
+ProductoSucursal.stock_bajo es una columna generada (stock <= stock_minimo)
+con un índice parcial por sucursal, así que los listados de stock bajo no
+recorren todo el inventario. `en_alerta` guarda el último estado reportado
+de cada producto activo.
+
+Después de cualquier cambio de stock, mínimo o activo, `sincronizar` busca
+los productos cuyo stock_bajo (y activo) ya no coincide con en_alerta:
+registra el cruce en AlertaStock, actualiza en_alerta y ajusta con F() el
+ContadorStockBajo de la sucursal. Los tableros leen el contador en lugar de
+contar. Como la comparación es contra en_alerta, repetirla no duplica nada.
+
+Llamadas: ventas.services.actualizar_stock (cobro, cancelación y
+transferencias), la señal post_save de ProductoSucursal, el cálculo de
+reabastecimiento y la importación del catálogo.
+"""
+from django.db.models import F, Q, Sum
+
+from .models import AlertaStock, ContadorStockBajo, ProductoSucursal
+
+# Filas cuyo estado reportado ya no es el real
+FUERA_DE_SINCRONIA = (
+    Q(en_alerta=True) & ~Q(stock_bajo=True, activo=True)
+) | Q(en_alerta=False, stock_bajo=True, activo=True)
+
+
+def sincronizar(ids=None, sucursal=None):
+    """
+    Registra los cruces del stock mínimo de los productos `ids` (o de la
+    sucursal, o de todos). Regresa el número de productos que cruzaron.
+    """
+    productos = ProductoSucursal.objects.filter(FUERA_DE_SINCRONIA)
+    if ids is not None:
+        productos = productos.filter(id__in=list(ids))
+    if sucursal is not None:
+        productos = productos.filter(sucursal=sucursal)
+    filas = list(productos.values_list('id', 'sucursal_id', 'stock', 'stock_minimo', 'activo', 'en_alerta'))
+    if not filas:
+        return 0
+
+    grupos = {}
+    alertas = []
+    for ps_id, sucursal_id, stock, stock_minimo, activo, en_alerta in filas:
+        grupos.setdefault((sucursal_id, not en_alerta), []).append(ps_id)
+        # Un producto desactivado sale del contador sin alerta
+        if activo:
+            alertas.append(AlertaStock(
+                producto_sucursal_id=ps_id,
+                sucursal_id=sucursal_id,
+                tipo='normal' if en_alerta else 'bajo',
+                stock=stock,
+                stock_minimo=stock_minimo,
+            ))
+
+    ContadorStockBajo.objects.bulk_create([
+        ContadorStockBajo(sucursal_id=sucursal_id) for sucursal_id in {s for s, _ in grupos}
+    ], ignore_conflicts=True)
+    # La condición sobre en_alerta evita contar dos veces un cruce concurrente
+    for (sucursal_id, estado), lista in sorted(grupos.items()):
+        cambiados = ProductoSucursal.objects.filter(id__in=lista, en_alerta=not estado).update(en_alerta=estado)
+        if cambiados:
+            ContadorStockBajo.objects.filter(sucursal_id=sucursal_id).update(
+                productos=F('productos') + (cambiados if estado else -cambiados)
+            )
+    AlertaStock.objects.bulk_create(alertas)
+    return len(filas)
+
+
+def quitar(producto_sucursal):
+    """Descuenta del contador un producto que se va a eliminar, si estaba en alerta"""
+    # La instancia puede traer un en_alerta viejo: se decide en la base de datos
+    if ProductoSucursal.objects.filter(pk=producto_sucursal.pk, en_alerta=True).update(en_alerta=False):
+        ContadorStockBajo.objects.filter(sucursal_id=producto_sucursal.sucursal_id).update(
+            productos=F('productos') - 1
+        )
+
+
+def productos_bajo_stock(sucursal_id=None):
+    """Productos activos bajo su mínimo en la sucursal (o en todas), del contador"""
+    if sucursal_id is not None:
+        return ContadorStockBajo.objects.filter(sucursal_id=sucursal_id).values_list(
+            'productos', flat=True
+        ).first() or 0
+    return ContadorStockBajo.objects.aggregate(total=Sum('productos'))['total'] or 0
+
+
+def contadores():
+    """{sucursal_id: productos bajo su mínimo} de todas las sucursales"""
+    return dict(ContadorStockBajo.objects.values_list('sucursal_id', 'productos'))
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CatalogosConfig(AppConfig):
     name = 'catalogos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,156 @@
+"""
+Productos que se compran juntos ("frecuentemente comprados juntos").
+
+Se ejecuta por las noches con el comando `generar_asociaciones`. Por cada
+sucursal se arma la matriz dispersa ventas x productos de DetalleVenta
+(1 si la venta incluye el producto) y su producto Xᵀ·X da cuántas ventas
+incluyen a cada par. Por producto se guardan las K asociaciones con mayor
+confianza (ventas juntas / ventas del producto) entre las que tienen lift
+mayor a 1, para no sugerir sólo los productos que se venden en todas partes.
+
+La caja lee AsociacionProducto por los productos del carrito: K filas por
+producto por el índice (producto, rango), sin recalcular nada.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from agrofeed_pv.particiones import filtro_poda, rango_fechas
+from sucursales.models import Sucursal
+from .models import AsociacionProducto, ProductoSucursal
+
+
+def cargar_canastas(sucursal, desde, hasta):
+    """Pares (venta_id, producto_id) de las ventas completadas, arreglo (m, 2)"""
+    from ventas.models import DetalleVenta
+
+    inicio, fin = rango_fechas(desde, hasta)
+    pares = DetalleVenta.objects.filter(
+        venta__sucursal=sucursal,
+        venta__estado='completada',
+        venta__fecha__gte=inicio,
+        venta__fecha__lt=fin,
+        **filtro_poda('fecha_creacion', inicio)
+    ).values_list('venta_id', 'producto_id')
+    return np.array(list(pares.iterator(chunk_size=20000)), dtype=np.int64).reshape(-1, 2)
+
+
+def calcular_asociaciones(pares, top=10, minimo=3):
+    """
+    Asociaciones a partir de los pares (venta_id, producto_id).
+
+    Regresa arreglos alineados (producto, asociado, rango, ventas_juntas,
+    confianza, lift), ordenados por producto y rango.
+    """
+    vacio = tuple(np.zeros(0, dtype=tipo) for tipo in (np.int64,) * 4 + (np.float64,) * 2)
+    if len(pares) == 0:
+        return vacio
+
+    ventas, filas = np.unique(pares[:, 0], return_inverse=True)
+    productos, columnas = np.unique(pares[:, 1], return_inverse=True)
+    canastas = sparse.csr_matrix(
+        (np.ones(len(pares), dtype=np.int32), (filas, columnas)),
+        shape=(len(ventas), len(productos))
+    )
+    # Un producto capturado en dos renglones cuenta una vez
+    canastas.data[:] = 1
+
+    soporte = np.asarray(canastas.sum(axis=0)).ravel()
+    juntas = (canastas.T @ canastas).tocoo()
+    validos = (juntas.row != juntas.col) & (juntas.data >= minimo)
+    i, j, n = juntas.row[validos], juntas.col[validos], juntas.data[validos].astype(np.int64)
+
+    confianza = n / soporte[i]
+    lift = confianza * len(ventas) / soporte[j]
+    utiles = lift > 1
+    i, j, n, confianza, lift = i[utiles], j[utiles], n[utiles], confianza[utiles], lift[utiles]
+    if len(i) == 0:
+        return vacio
+
+    # Por producto, de mayor a menor confianza (y ventas juntas al empatar)
+    orden = np.lexsort((-n, -confianza, i))
+    i, j, n, confianza, lift = i[orden], j[orden], n[orden], confianza[orden], lift[orden]
+    rango = np.arange(len(i)) - np.searchsorted(i, i) + 1
+    primeros = rango <= top
+
+    return (
+        productos[i[primeros]], productos[j[primeros]], rango[primeros],
+        n[primeros], confianza[primeros], lift[primeros],
+    )
+
+
+def generar_asociaciones(dias=180, top=10, minimo=3, sucursal=None):
+    """
+    Calcula y guarda las asociaciones de todas las sucursales activas (o
+    una) con las ventas de los últimos `dias`. Reemplaza las anteriores de
+    cada sucursal. Regresa el número de registros guardados.
+    """
+    sucursales = [sucursal] if sucursal else Sucursal.objects.filter(activa=True)
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=dias - 1)
+
+    guardados = 0
+    for actual in sucursales:
+        columnas = calcular_asociaciones(cargar_canastas(actual, desde, hasta), top, minimo)
+        nuevas = [
+            AsociacionProducto(
+                producto_id=int(producto),
+                asociado_id=int(asociado),
+                rango=int(rango),
+                ventas_juntas=int(n),
+                confianza=round(float(confianza), 4),
+                lift=round(float(lift), 4),
+            )
+            for producto, asociado, rango, n, confianza, lift in zip(*columnas)
+        ]
+        with transaction.atomic():
+            AsociacionProducto.objects.filter(
+                producto__in=ProductoSucursal.objects.filter(sucursal=actual)
+            ).delete()
+            AsociacionProducto.objects.bulk_create(nuevas, batch_size=2000)
+        guardados += len(nuevas)
+
+    return guardados
+
+
+def sugerencias(producto_ids, sucursal_id, limite=5):
+    """
+    Productos activos con stock de la sucursal que suelen comprarse con los
+    del carrito, de mayor a menor confianza acumulada. Lee K asociaciones
+    por producto.
+    """
+    en_carrito = set(producto_ids)
+    if not en_carrito:
+        return []
+
+    asociaciones = AsociacionProducto.objects.filter(
+        producto_id__in=en_carrito,
+        asociado__sucursal_id=sucursal_id,
+        asociado__activo=True,
+        asociado__stock__gt=0,
+        asociado__producto__activo=True,
+    ).exclude(asociado_id__in=en_carrito).select_related('asociado__producto')
+
+    puntajes = {}
+    for asociacion in asociaciones:
+        actual = puntajes.get(asociacion.asociado_id)
+        if actual is None:
+            puntajes[asociacion.asociado_id] = [asociacion.confianza, asociacion.asociado]
+        else:
+            actual[0] += asociacion.confianza
+
+    mejores = sorted(puntajes.values(), key=lambda p: -p[0])[:limite]
+    return [
+        {
+            'id': ps.id,
+            'nombre': ps.producto.nombre,
+            'codigo': ps.producto.codigo,
+            'precio': float(ps.precio_venta),
+            'stock': float(ps.stock),
+            'confianza': round(min(puntaje, 1.0), 2),
+        }
+        for puntaje, ps in mejores
+    ]
@@ -0,0 +1,148 @@
+"""
+Árbol de categorías.
+
+La jerarquía vive en la closure table CategoriaRelacion (mantenida por
+Categoria.save()); aquí están el árbol completo en cache, los filtros por
+subárbol y la acumulación de totales por rama para los reportes.
+
+El árbol se guarda en el cache bajo una versión que las señales de
+catalogos/signals.py incrementan al confirmar cada cambio de categoría.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .models import Categoria, CategoriaRelacion
+
+VERSION_ARBOL = 'categorias:version'
+TIEMPO_CACHE = 60 * 60 * 24
+
+
+def invalidar_arbol():
+    """Marca como viejo el árbol al confirmar la transacción (Categoria.save mueve subárboles en una)"""
+    def incrementar():
+        try:
+            cache.incr(VERSION_ARBOL)
+        except ValueError:
+            cache.add(VERSION_ARBOL, time.time_ns())
+    transaction.on_commit(incrementar)
+
+
+def _construir():
+    nodos = {
+        pk: {
+            'id': pk,
+            'nombre': nombre,
+            'ruta': ruta,
+            'nivel': nivel,
+            'padre_id': padre_id,
+            'activa': activa,
+            'descripcion': descripcion,
+            'hijos': [],
+        }
+        for pk, nombre, ruta, nivel, padre_id, activa, descripcion in Categoria.objects.values_list(
+            'pk', 'nombre', 'ruta', 'nivel', 'padre_id', 'activa', 'descripcion'
+        )
+    }
+    raices = []
+    for nodo in sorted(nodos.values(), key=lambda n: n['nombre'].lower()):
+        if nodo['padre_id'] in nodos:
+            nodos[nodo['padre_id']]['hijos'].append(nodo['id'])
+        else:
+            raices.append(nodo['id'])
+
+    # Preorden con la lista de ancestros (de la raíz a la categoría) de cada nodo
+    ordenados = []
+    pendientes = [(pk, ()) for pk in reversed(raices)]
+    while pendientes:
+        pk, ancestros = pendientes.pop()
+        nodo = nodos[pk]
+        nodo['ancestros'] = ancestros + (pk,)
+        ordenados.append(nodo)
+        pendientes.extend((hijo, nodo['ancestros']) for hijo in reversed(nodo['hijos']))
+    return ordenados
+
+
+def arbol():
+    """Categorías en preorden (cada nodo es un dict con nivel, ruta, hijos y ancestros)"""
+    version = cache.get_or_set(VERSION_ARBOL, time.time_ns, None)
+    clave = f'categorias:arbol:{version}'
+    nodos = cache.get(clave)
+    if nodos is None:
+        nodos = _construir()
+        cache.set(clave, nodos, TIEMPO_CACHE)
+    return nodos
+
+
+def opciones(solo_activas=True):
+    """(id, etiqueta con sangría) en orden de árbol, para los <select>"""
+    return [
+        (nodo['id'], '\xa0' * 4 * nodo['nivel'] + nodo['nombre'])
+        for nodo in arbol()
+        if nodo['activa'] or not solo_activas
+    ]
+
+
+def subarbol(categoria_id):
+    """Subconsulta con los ids de la categoría y todas sus descendientes"""
+    return CategoriaRelacion.objects.filter(ancestro_id=categoria_id).values('descendiente_id')
+
+
+def en_subarbol(categoria_id, campo='categoria'):
+    """Q para filtrar por la categoría o cualquiera de sus descendientes"""
+    return Q(**{f'{campo}_id__in': subarbol(categoria_id)})
+
+
+def acumular_por_rama(totales, campos=('total',)):
+    """
+    Suma por rama del árbol. `totales` es {categoria_id: {campo: valor}}
+    con lo asignado directamente a cada categoría (None = sin categoría).
+    Regresa los nodos con algo acumulado, en preorden, con `<campo>` (la
+    rama completa) y `<campo>_propio`.
+    """
+    nodos = arbol()
+    acumulado = {nodo['id']: dict.fromkeys(campos, 0) for nodo in nodos}
+    por_id = {nodo['id']: nodo for nodo in nodos}
+    for categoria_id, valores in totales.items():
+        if categoria_id not in por_id:
+            continue
+        for ancestro in por_id[categoria_id]['ancestros']:
+            for campo in campos:
+                acumulado[ancestro][campo] += valores.get(campo) or 0
+
+    filas = []
+    for nodo in nodos:
+        if not any(acumulado[nodo['id']].values()):
+            continue
+        fila = {'id': nodo['id'], 'nombre': nodo['nombre'], 'ruta': nodo['ruta'], 'nivel': nodo['nivel']}
+        for campo in campos:
+            fila[campo] = acumulado[nodo['id']][campo]
+            fila[f'{campo}_propio'] = (totales.get(nodo['id']) or {}).get(campo) or 0
+        filas.append(fila)
+
+    sin_categoria = totales.get(None)
+    if sin_categoria and any(sin_categoria.get(campo) for campo in campos):
+        fila = {'id': None, 'nombre': 'Sin categoría', 'ruta': 'Sin categoría', 'nivel': 0}
+        for campo in campos:
+            fila[campo] = fila[f'{campo}_propio'] = sin_categoria.get(campo) or 0
+        filas.append(fila)
+    return filas
+
+
+def ventas_por_categoria(detalles, totales=None):
+    """
+    Ventas acumuladas por rama del árbol a partir de un queryset de
+    DetalleVenta. `totales` permite sumar otra fuente (p. ej. ventas
+    archivadas) ya agrupada por categoría.
+    """
+    totales = {categoria_id: dict(valores) for categoria_id, valores in (totales or {}).items()}
+    for item in detalles.values('producto__producto__categoria_id').annotate(
+        total=Sum('subtotal'),
+        cantidad=Sum('cantidad')
+    ).order_by():
+        acumulado = totales.setdefault(item['producto__producto__categoria_id'], {'total': 0, 'cantidad': 0})
+        acumulado['total'] += item['total'] or 0
+        acumulado['cantidad'] += item['cantidad'] or 0
+    return acumular_por_rama(totales, ('total', 'cantidad'))
@@ -0,0 +1,104 @@
+"""
+Índice en memoria para el escaneo de códigos de barras en caja.
+
+Cada proceso guarda, por sucursal, un dict código -> Articulo con el
+código principal del producto y sus códigos alternos (CodigoBarras). Un
+escaneo es una búsqueda en el dict; el stock no vive en el índice (cambia
+con cada venta) y se lee aparte por llave primaria.
+
+El índice se versiona en el cache compartido: una versión global (cambios
+de Producto o CodigoBarras) y una por sucursal (cambios de
+ProductoSucursal). Las señales de catalogos/signals.py incrementan la
+versión al confirmar la transacción y cada proceso reconstruye su índice
+la siguiente vez que lo consulta. Con varios procesos el cache debe ser compartido (Redis,
+Memcached); con LocMemCache cada proceso sólo ve sus propios cambios.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CodigoBarras, ProductoSucursal
+
+Articulo = namedtuple('Articulo', 'id nombre codigo precio tiene_iva cantidad')
+
+VERSION_GLOBAL = 'escaneo:version'
+VERSION_SUCURSAL = 'escaneo:version:{}'
+
+_indices = {}
+_candado = threading.Lock()
+
+
+def _claves(sucursal_id):
+    return VERSION_GLOBAL, VERSION_SUCURSAL.format(sucursal_id)
+
+
+def _version(sucursal_id):
+    claves = _claves(sucursal_id)
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            # Sin versión (cache nuevo o desalojado): una nueva, distinta a cualquier anterior
+            cache.add(clave, time.time_ns())
+            versiones[clave] = cache.get(clave)
+    return tuple(versiones[clave] for clave in claves)
+
+
+def invalidar(sucursal_id=None):
+    """Marca como viejo el índice de la sucursal (o de todas) al confirmar la transacción"""
+    clave = VERSION_GLOBAL if sucursal_id is None else VERSION_SUCURSAL.format(sucursal_id)
+
+    # Antes del commit otro proceso reconstruiría con los datos anteriores
+    # bajo la versión nueva y los serviría hasta el siguiente cambio
+    def incrementar():
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.add(clave, time.time_ns())
+    transaction.on_commit(incrementar)
+
+
+def _construir(sucursal_id):
+    alternos = {}
+    for producto_id, codigo, cantidad in CodigoBarras.objects.values_list('producto_id', 'codigo', 'cantidad'):
+        alternos.setdefault(producto_id, []).append((codigo, cantidad))
+
+    indice = {}
+    principales = {}
+    filas = ProductoSucursal.objects.filter(
+        sucursal_id=sucursal_id,
+        activo=True,
+        producto__activo=True
+    ).values_list(
+        'id', 'producto_id', 'producto__nombre', 'producto__codigo',
+        'precio_venta', 'producto__tiene_iva'
+    )
+    for ps_id, producto_id, nombre, codigo, precio, tiene_iva in filas.iterator(chunk_size=5000):
+        principales[codigo] = Articulo(ps_id, nombre, codigo, precio, tiene_iva, 1)
+        for alterno, cantidad in alternos.get(producto_id, ()):
+            indice[alterno] = Articulo(ps_id, nombre, codigo, precio, tiene_iva, cantidad)
+
+    # El código principal gana sobre un alterno repetido
+    indice.update(principales)
+    return indice
+
+
+def indice_sucursal(sucursal_id):
+    """Dict código -> Articulo de la sucursal, reconstruido si cambió su versión"""
+    version = _version(sucursal_id)
+    actual = _indices.get(sucursal_id)
+    if actual is not None and actual[0] == version:
+        return actual[1]
+
+    with _candado:
+        actual = _indices.get(sucursal_id)
+        if actual is None or actual[0] != version:
+            actual = _indices[sucursal_id] = (version, _construir(sucursal_id))
+    return actual[1]
+
+
+def buscar(sucursal_id, codigo):
+    """Articulo del código en la sucursal, o None"""
+    return indice_sucursal(sucursal_id).get(codigo.strip())
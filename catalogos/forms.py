@@ -1,13 +1,14 @@
 from django import forms
 from .models import (
-    Cliente, Proveedor, Categoria, UnidadMedida, 
+    Cliente, Proveedor, Categoria, CategoriaRelacion, UnidadMedida, 
     Producto, ProductoSucursal
 )
+from sucursales.models import Sucursal
 
 class ProveedorForm(forms.ModelForm):
     class Meta:
         model = Proveedor
-        fields = ['nombre', 'telefono', 'email', 'direccion', 'rfc', 'contacto', 'activo']
+        fields = ['nombre', 'telefono', 'email', 'direccion', 'rfc', 'contacto', 'dias_entrega', 'activo']
         widgets = {
             'nombre': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre del proveedor'}),
             'telefono': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Teléfono'}),
@@ -15,6 +16,7 @@ class ProveedorForm(forms.ModelForm):
             'direccion': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Dirección'}),
             'rfc': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'RFC'}),
             'contacto': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Persona de contacto'}),
+            'dias_entrega': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
         }
 
 
@@ -28,6 +30,14 @@ class CategoriaForm(forms.ModelForm):
             'padre': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ni la categoría ni sus subcategorías pueden ser su padre
+        if self.instance.pk:
+            self.fields['padre'].queryset = Categoria.objects.exclude(
+                pk__in=CategoriaRelacion.objects.filter(ancestro=self.instance).values('descendiente_id')
+            )
+
 
 class UnidadMedidaForm(forms.ModelForm):
     class Meta:
@@ -164,6 +174,11 @@ class ClienteForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.request = kwargs.pop('request', None)
         super().__init__(*args, **kwargs)
+
+        # En el alta el código es opcional: sin él se toma de la secuencia al guardar
+        if not self.instance.pk:
+            self.fields['codigo'].required = False
+            self.fields['codigo'].widget.attrs['placeholder'] = 'Automático (CLI000123) si se deja vacío'
         
         # Si no es admin o superadmin, hacer el campo de descuento de solo lectura
         if self.request and not (self.request.user.es_admin or self.request.user.es_superadmin):
@@ -188,4 +203,58 @@ class ClienteFilterForm(forms.Form):
         ('', 'Todos'),
         ('activos', 'Activos'),
         ('inactivos', 'Inactivos'),
-    ], widget=forms.Select(attrs={'class': 'form-control'}))
\ No newline at end of file
+    ], widget=forms.Select(attrs={'class': 'form-control'}))
+
+
+class ImportarCatalogoForm(forms.Form):
+    """Carga de una lista de precios (CSV o XLSX)"""
+    archivo = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,.txt,.xlsx'
+    }))
+    sucursal = forms.ModelChoiceField(
+        queryset=Sucursal.objects.filter(activa=True),
+        required=False,
+        empty_label='Según la columna sucursal del archivo',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    crear_faltantes = forms.BooleanField(
+        required=False,
+        label='Dar de alta categorías y proveedores que no existan',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    simular = forms.BooleanField(
+        required=False,
+        label='Sólo validar (no guardar)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.txt', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('Usa un archivo CSV o XLSX')
+        return archivo
+
+
+class ImportarClientesForm(forms.Form):
+    """Carga masiva de clientes (CSV o XLSX)"""
+    archivo = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,.txt,.xlsx'
+    }))
+    importar_similares = forms.BooleanField(
+        required=False,
+        label='Importar también los que sólo se parecen por nombre',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    simular = forms.BooleanField(
+        required=False,
+        label='Sólo revisar duplicados (no guardar)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.txt', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('Usa un archivo CSV o XLSX')
+        return archivo
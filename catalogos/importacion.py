@@ -0,0 +1,415 @@
+"""
+Importación masiva del catálogo (listas de precios de proveedores).
+
+El archivo (CSV o XLSX) se lee fila por fila con generadores y se procesa
+por lotes: cada lote se valida contra índices en memoria (categorías,
+proveedores, unidades, sucursales) y se inserta o actualiza con
+`bulk_create(update_conflicts=True)`, tanto Producto como su
+ProductoSucursal. La memoria depende del tamaño del lote, no del archivo.
+
+Columnas (encabezados sin importar mayúsculas ni acentos):
+- obligatorias: codigo, nombre
+- de Producto: descripcion, tipo, categoria, proveedor, unidad, costo, tiene_iva, activo
+- por sucursal: sucursal (código), precio_venta, stock_minimo, stock_maximo
+
+Sólo se actualizan las celdas con valor: una celda vacía deja el dato
+como está (o el valor por omisión si el producto es nuevo). El stock no se
+importa: las existencias cambian con ajustes de inventario, que dejan
+movimiento. Las filas con error se reportan y no detienen el resto.
+"""
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import metricas
+from sucursales.models import Sucursal
+from . import alertas, escaneo
+from .models import Categoria, Proveedor, UnidadMedida, Producto, ProductoSucursal
+
+MAX_ERRORES = 500
+
+ALIAS_COLUMNAS = {
+    'codigo': 'codigo', 'clave': 'codigo', 'sku': 'codigo',
+    'nombre': 'nombre', 'producto': 'nombre',
+    'descripcion': 'descripcion',
+    'tipo': 'tipo',
+    'categoria': 'categoria',
+    'proveedor': 'proveedor',
+    'unidad': 'unidad', 'unidad_medida': 'unidad',
+    'costo': 'costo', 'costo_promedio': 'costo',
+    'tiene_iva': 'tiene_iva', 'iva': 'tiene_iva',
+    'activo': 'activo',
+    'sucursal': 'sucursal',
+    'precio_venta': 'precio_venta', 'precio': 'precio_venta',
+    'stock_minimo': 'stock_minimo', 'minimo': 'stock_minimo',
+    'stock_maximo': 'stock_maximo', 'maximo': 'stock_maximo',
+}
+
+# Columna del archivo -> campo del modelo
+CAMPOS_PRODUCTO = {
+    'nombre': 'nombre',
+    'descripcion': 'descripcion',
+    'tipo': 'tipo',
+    'categoria': 'categoria_id',
+    'proveedor': 'proveedor_id',
+    'unidad': 'unidad_medida_id',
+    'costo': 'costo_promedio',
+    'tiene_iva': 'tiene_iva',
+    'activo': 'activo',
+}
+CAMPOS_SUCURSAL = {
+    'precio_venta': 'precio_venta',
+    'stock_minimo': 'stock_minimo',
+    'stock_maximo': 'stock_maximo',
+}
+
+VERDADEROS = {'1', 'si', 'sí', 's', 'true', 'verdadero', 'x', 'yes'}
+FALSOS = {'0', 'no', 'n', 'false', 'falso', ''}
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer o le faltan columnas obligatorias"""
+
+
+@lru_cache(maxsize=4096)
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos ni espacios sobrantes (para comparar nombres)"""
+    return _normalizar(str(texto or ''))
+
+
+# =========== LECTURA ===========
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+    except csv.Error:
+        dialecto = csv.excel
+    try:
+        yield from csv.reader(texto, dialecto)
+    finally:
+        texto.detach()
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion('Para importar archivos XLSX instala openpyxl (o guarda el archivo como CSV)')
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield ['' if valor is None else valor for valor in fila]
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre, alias=ALIAS_COLUMNAS, obligatorias=('codigo', 'nombre')):
+    """
+    Genera (número de fila, {columna: valor}) del archivo, con las columnas
+    renombradas según `alias`. El número de fila es el de la hoja (el
+    encabezado es la fila 1).
+    """
+    if nombre.lower().endswith(('.xlsx', '.xlsm')):
+        filas = _filas_xlsx(archivo)
+    elif nombre.lower().endswith(('.csv', '.txt')):
+        filas = _filas_csv(archivo)
+    else:
+        raise ErrorImportacion('Formato no soportado: usa CSV o XLSX')
+
+    try:
+        encabezado = next(filas)
+    except StopIteration:
+        raise ErrorImportacion('El archivo está vacío')
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El CSV debe estar en UTF-8')
+
+    columnas = [alias.get(normalizar(titulo).replace(' ', '_')) for titulo in encabezado]
+    faltantes = set(obligatorias) - set(columnas)
+    if faltantes:
+        raise ErrorImportacion(f'Faltan columnas obligatorias: {", ".join(sorted(faltantes))}')
+
+    try:
+        for numero, fila in enumerate(filas, start=2):
+            if not any(str(valor).strip() for valor in fila):
+                continue
+            yield numero, {
+                columna: valor.strip() if isinstance(valor, str) else valor
+                for columna, valor in zip(columnas, fila)
+                if columna
+            }
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El CSV debe estar en UTF-8')
+
+
+def en_lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+# =========== VALIDACIÓN ===========
+class Indices:
+    """Catálogos relacionados en memoria, por nombre normalizado"""
+
+    def __init__(self, crear_faltantes=False):
+        self.crear_faltantes = crear_faltantes
+        self.categorias = {normalizar(nombre): pk for pk, nombre in Categoria.objects.values_list('pk', 'nombre')}
+        self.proveedores = {normalizar(nombre): pk for pk, nombre in Proveedor.objects.values_list('pk', 'nombre')}
+        self.unidades = {}
+        for pk, nombre, abreviatura in UnidadMedida.objects.values_list('pk', 'nombre', 'abreviatura'):
+            self.unidades[normalizar(nombre)] = pk
+            self.unidades.setdefault(normalizar(abreviatura), pk)
+        self.sucursales = {normalizar(codigo): pk for pk, codigo in Sucursal.objects.values_list('pk', 'codigo')}
+        self.codigos = set(Producto.objects.values_list('codigo', flat=True))
+        self.tipos = {}
+        for clave, etiqueta in Producto.TIPO_CHOICES:
+            self.tipos[normalizar(clave)] = clave
+            self.tipos[normalizar(etiqueta)] = clave
+
+    def _relacionado(self, indice, modelo, valor, simular):
+        clave = normalizar(valor)
+        if clave in indice:
+            return indice[clave]
+        if not self.crear_faltantes:
+            return None
+        # Sin escribir en simulación: un id negativo basta para validar
+        indice[clave] = -len(indice) - 1 if simular else modelo.objects.create(nombre=str(valor).strip()).pk
+        return indice[clave]
+
+    def categoria(self, valor, simular=False):
+        return self._relacionado(self.categorias, Categoria, valor, simular)
+
+    def proveedor(self, valor, simular=False):
+        return self._relacionado(self.proveedores, Proveedor, valor, simular)
+
+
+def _decimal(valor, campo):
+    if isinstance(valor, (int, float, Decimal)):
+        numero = Decimal(str(valor))
+    else:
+        texto = str(valor).replace('$', '').replace(',', '').replace(' ', '')
+        try:
+            numero = Decimal(texto)
+        except InvalidOperation:
+            raise ValueError(f'{campo}: "{valor}" no es un número')
+    if not numero.is_finite():
+        raise ValueError(f'{campo}: "{valor}" no es un número')
+    if numero < 0:
+        raise ValueError(f'{campo} no puede ser negativo')
+    if numero >= Decimal('100000000'):
+        raise ValueError(f'{campo} es demasiado grande')
+    return numero.quantize(Decimal('0.01'))
+
+
+def _booleano(valor, campo):
+    if isinstance(valor, bool):
+        return valor
+    texto = normalizar(valor)
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ValueError(f'{campo}: "{valor}" no es sí/no')
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def validar_fila(datos, indices, sucursal=None, simular=False):
+    """
+    Regresa (campos de Producto, sucursal_id, campos de ProductoSucursal)
+    sólo con las celdas que traen valor, o lanza ValueError con la lista de
+    errores de la fila.
+    """
+    errores = []
+    producto = {}
+
+    codigo = str(datos.get('codigo') or '').strip()
+    if not codigo:
+        errores.append('codigo es obligatorio')
+    elif len(codigo) > 50:
+        errores.append('codigo excede 50 caracteres')
+    producto['codigo'] = codigo
+
+    nombre = str(datos.get('nombre') or '').strip()
+    if not nombre:
+        errores.append('nombre es obligatorio')
+    elif len(nombre) > 150:
+        errores.append('nombre excede 150 caracteres')
+    producto['nombre'] = nombre
+
+    if not _vacio(datos.get('descripcion')):
+        producto['descripcion'] = str(datos['descripcion'])
+
+    if not _vacio(datos.get('tipo')):
+        producto['tipo'] = indices.tipos.get(normalizar(datos['tipo']))
+        if producto['tipo'] is None:
+            errores.append(f'tipo "{datos["tipo"]}" no existe')
+
+    relacionados = (
+        ('categoria', lambda valor: indices.categoria(valor, simular)),
+        ('proveedor', lambda valor: indices.proveedor(valor, simular)),
+        ('unidad', lambda valor: indices.unidades.get(normalizar(valor))),
+    )
+    for columna, buscar in relacionados:
+        valor = datos.get(columna)
+        if not _vacio(valor):
+            producto[CAMPOS_PRODUCTO[columna]] = buscar(valor)
+            if producto[CAMPOS_PRODUCTO[columna]] is None:
+                errores.append(f'{columna} "{valor}" no existe')
+
+    if not _vacio(datos.get('costo')):
+        try:
+            producto['costo_promedio'] = _decimal(datos['costo'], 'costo')
+        except ValueError as e:
+            errores.append(str(e))
+
+    for columna in ('tiene_iva', 'activo'):
+        if not _vacio(datos.get(columna)):
+            try:
+                producto[columna] = _booleano(datos[columna], columna)
+            except ValueError as e:
+                errores.append(str(e))
+
+    sucursal_id = sucursal.pk if sucursal else None
+    if not _vacio(datos.get('sucursal')):
+        sucursal_id = indices.sucursales.get(normalizar(datos['sucursal']))
+        if sucursal_id is None:
+            errores.append(f'sucursal "{datos["sucursal"]}" no existe')
+
+    por_sucursal = {}
+    for columna, campo in CAMPOS_SUCURSAL.items():
+        if not _vacio(datos.get(columna)):
+            try:
+                por_sucursal[campo] = _decimal(datos[columna], columna)
+            except ValueError as e:
+                errores.append(str(e))
+    if por_sucursal.get('stock_minimo', 0) > por_sucursal.get('stock_maximo', Decimal('Infinity')):
+        errores.append('stock_minimo es mayor que stock_maximo')
+
+    if errores:
+        raise ValueError(errores)
+    return producto, sucursal_id, por_sucursal
+
+
+def _por_campos(registros):
+    """Agrupa {llave: valores} por el conjunto de campos que traen"""
+    grupos = {}
+    for llave, valores in registros.items():
+        grupos.setdefault(tuple(sorted(valores)), []).append((llave, valores))
+    return grupos.items()
+
+
+# =========== IMPORTACIÓN ===========
+def _guardar_lote(productos, por_sucursal):
+    """Inserta o actualiza los productos del lote y sus ProductoSucursal"""
+    for campos, registros in _por_campos(productos):
+        Producto.objects.bulk_create(
+            [Producto(**valores) for _, valores in registros],
+            update_conflicts=True,
+            unique_fields=['codigo'],
+            update_fields=[campo for campo in campos if campo != 'codigo'] + ['fecha_actualizacion'],
+        )
+
+    if not por_sucursal:
+        return 0
+
+    ids = dict(Producto.objects.filter(
+        codigo__in={codigo for codigo, _ in por_sucursal}
+    ).values_list('codigo', 'id'))
+
+    for campos, registros in _por_campos(por_sucursal):
+        ProductoSucursal.objects.bulk_create(
+            [
+                ProductoSucursal(producto_id=ids[codigo], sucursal_id=sucursal_id, **valores)
+                for (codigo, sucursal_id), valores in registros
+            ],
+            update_conflicts=True,
+            unique_fields=['producto', 'sucursal'],
+            update_fields=list(campos) + ['ultima_actualizacion'],
+        )
+    return len(por_sucursal)
+
+
+def importar_catalogo(archivo, nombre, sucursal=None, lote=1000, simular=False, crear_faltantes=False):
+    """
+    Importa el catálogo desde `archivo` (binario). `sucursal` se usa para
+    las filas sin columna sucursal; sin ninguna de las dos sólo se
+    importa el Producto. Cada lote se guarda en su propia transacción.
+
+    Regresa un resumen con conteos y errores por fila.
+    """
+    inicio = timezone.now()
+    indices = Indices(crear_faltantes)
+    resultado = {
+        'filas': 0,
+        'creados': 0,
+        'actualizados': 0,
+        'por_sucursal': 0,
+        'total_errores': 0,
+        'errores': [],
+        'simulacion': simular,
+    }
+    # Sucursales con ProductoSucursal escritos (la del formulario o la columna)
+    sucursales = set()
+
+    for filas in en_lotes(leer_filas(archivo, nombre), lote):
+        productos = {}
+        por_sucursal = {}
+        for numero, datos in filas:
+            resultado['filas'] += 1
+            try:
+                producto, sucursal_id, valores = validar_fila(datos, indices, sucursal, simular)
+            except ValueError as e:
+                resultado['total_errores'] += 1
+                if len(resultado['errores']) < MAX_ERRORES:
+                    resultado['errores'].append({
+                        'fila': numero,
+                        'codigo': datos.get('codigo', ''),
+                        'errores': e.args[0],
+                    })
+                continue
+
+            # Un código repetido en el lote combina sus filas (gana la última)
+            productos.setdefault(producto['codigo'], {}).update(producto)
+            if sucursal_id:
+                por_sucursal.setdefault((producto['codigo'], sucursal_id), {}).update(valores)
+
+        nuevos = {codigo for codigo in productos if codigo not in indices.codigos}
+        resultado['creados'] += len(nuevos)
+        resultado['actualizados'] += len(productos) - len(nuevos)
+        indices.codigos |= nuevos
+
+        if simular or not productos:
+            resultado['por_sucursal'] += len(por_sucursal)
+            continue
+
+        with transaction.atomic():
+            resultado['por_sucursal'] += _guardar_lote(productos, por_sucursal)
+        sucursales.update(sucursal_id for _, sucursal_id in por_sucursal)
+        # bulk_create no manda señales
+        escaneo.invalidar()
+        metricas.invalidar()
+
+    # Un solo recorrido al final: los lotes pueden cruzar el stock mínimo en
+    # cualquier sucursal que escribieron, no sólo en la del formulario
+    for sucursal_id in sorted(sucursales):
+        alertas.sincronizar(sucursal=sucursal_id)
+
+    resultado['segundos'] = (timezone.now() - inicio).total_seconds()
+    return resultado
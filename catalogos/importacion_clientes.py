@@ -0,0 +1,373 @@
+"""
+Importación masiva de clientes con detección de duplicados.
+
+Cada fila se compara contra los clientes existentes y contra las filas
+anteriores del mismo archivo, sin comparar todos contra todos: sólo se
+evalúan los registros que comparten una llave de bloque.
+
+- Llaves exactas: RFC (sin guiones ni espacios), teléfono (últimos 10
+  dígitos) y email en minúsculas. Coincidir en cualquiera es duplicado.
+- Nombre: trigramas de nombre + apellido normalizados (palabras en orden
+  alfabético, así "López Ana" = "Ana López"). Se indexa sólo el prefijo de
+  trigramas más raros de cada nombre (prefix filtering): dos nombres con
+  similitud de Jaccard >= umbral comparten por fuerza trigramas de su
+  prefijo, así que los trigramas comunes ("ia ", "ez ") no generan bloques
+  enormes y no se pierde ningún candidato.
+
+El archivo se lee dos veces: la primera sólo cuenta trigramas de nombres.
+Los duplicados no se insertan (los de sólo nombre parecido, opcionalmente
+sí) y quedan en el reporte para revisión. Cada lote reserva sus códigos
+CLI de la secuencia 'cliente' e inserta las filas válidas con
+`bulk_create` en una misma transacción, así que un lote que falla no
+consume números de la secuencia.
+"""
+import datetime
+import math
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from .importacion import MAX_ERRORES, _decimal, _vacio, en_lotes, leer_filas, normalizar
+from .models import Cliente
+
+UMBRAL_NOMBRE = 0.8
+COMUNES_PREFIJO = 2
+
+ALIAS_COLUMNAS_CLIENTES = {
+    'nombre': 'nombre', 'nombres': 'nombre',
+    'apellido': 'apellido', 'apellidos': 'apellido',
+    'telefono': 'telefono', 'tel': 'telefono', 'celular': 'telefono',
+    'email': 'email', 'correo': 'email', 'correo_electronico': 'email',
+    'rfc': 'rfc',
+    'fecha_nacimiento': 'fecha_nacimiento', 'nacimiento': 'fecha_nacimiento',
+    'tipo': 'tipo_cliente', 'tipo_cliente': 'tipo_cliente',
+    'descuento': 'porcentaje_descuento', 'porcentaje_descuento': 'porcentaje_descuento',
+    'direccion': 'direccion_facturacion', 'direccion_facturacion': 'direccion_facturacion',
+    'direccion_envio': 'direccion_envio',
+    'ciudad': 'ciudad',
+    'estado': 'estado',
+    'cp': 'codigo_postal', 'codigo_postal': 'codigo_postal',
+    'notas': 'notas',
+}
+
+# Columna -> longitud máxima del campo
+CAMPOS_TEXTO = {
+    'nombre': 200,
+    'apellido': 200,
+    'telefono': 20,
+    'email': 254,
+    'rfc': 20,
+    'direccion_facturacion': None,
+    'direccion_envio': None,
+    'ciudad': 100,
+    'estado': 100,
+    'codigo_postal': 10,
+    'notas': None,
+}
+
+# RFC genéricos del SAT: los comparten muchos clientes distintos
+RFC_GENERICOS = {'XAXX010101000', 'XEXX010101000'}
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+# Llaves exactas en orden de confianza
+LLAVES = ('rfc', 'email', 'telefono')
+
+
+# =========== LLAVES DE BLOQUE ===========
+def llave_rfc(valor):
+    rfc = re.sub(r'[^A-Z0-9&Ñ]', '', str(valor or '').upper())
+    return rfc if len(rfc) in (12, 13) and rfc not in RFC_GENERICOS else ''
+
+
+def llave_telefono(valor):
+    digitos = re.sub(r'\D', '', str(valor or ''))
+    return digitos[-10:] if len(digitos) >= 8 else ''
+
+
+def llave_email(valor):
+    return str(valor or '').strip().lower()
+
+
+def llaves(rfc, email, telefono):
+    return {'rfc': llave_rfc(rfc), 'email': llave_email(email), 'telefono': llave_telefono(telefono)}
+
+
+def trigramas(nombre, apellido):
+    palabras = re.sub(r'[^a-z0-9ñ ]', ' ', normalizar(f'{nombre} {apellido}')).split()
+    texto = f" {' '.join(sorted(palabras))} "
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+class IndiceDuplicados:
+    """
+    Índice en memoria de clientes ya conocidos (de la base y del archivo).
+    El orden de los trigramas (más raros primero) se fija con las
+    frecuencias de los clientes existentes; lo que no aparece en la base
+    cuenta como raro.
+    """
+
+    def __init__(self, umbral=UMBRAL_NOMBRE):
+        self.umbral = umbral
+        self.exactas = {llave: {} for llave in LLAVES}
+        self.bloques = defaultdict(list)
+        self.nombres = {}
+        self.descripciones = {}
+        self.frecuencia = {}
+
+    def contar(self, tri):
+        for trigrama in tri:
+            self.frecuencia[trigrama] = self.frecuencia.get(trigrama, 0) + 1
+
+    @classmethod
+    def desde_base(cls, umbral=UMBRAL_NOMBRE, nombres_archivo=()):
+        """
+        Índice con los clientes existentes. `nombres_archivo` ((nombre,
+        apellido) del archivo a importar) sólo aporta frecuencias: sin ellas
+        un archivo grande contra una base chica tendría prefijos con trigramas
+        comunes y bloques enormes.
+        """
+        indice = cls(umbral)
+        for nombre, apellido in nombres_archivo:
+            indice.contar(trigramas(nombre, apellido))
+        existentes = [
+            (codigo, f'{nombre} {apellido}', llaves(rfc, email, telefono), trigramas(nombre, apellido))
+            for codigo, nombre, apellido, telefono, email, rfc in Cliente.objects.values_list(
+                'codigo', 'nombre', 'apellido', 'telefono', 'email', 'rfc'
+            ).iterator(chunk_size=5000)
+        ]
+        for *_, tri in existentes:
+            indice.contar(tri)
+        for codigo, nombre, claves, tri in existentes:
+            indice.agregar(('cliente', codigo), nombre, claves, tri)
+        return indice
+
+    def _prefijo(self, tri):
+        # Con un trigrama extra en el prefijo, dos nombres similares comparten
+        # al menos 2 (esquema ℓ-prefix): descarta casi todos los candidatos
+        # que sólo coinciden en un trigrama común
+        ordenados = sorted(tri, key=lambda t: (self.frecuencia.get(t, 0), t))
+        return ordenados[:len(ordenados) - math.ceil(self.umbral * len(ordenados)) + COMUNES_PREFIJO]
+
+    def agregar(self, referencia, nombre, claves, tri):
+        for llave in LLAVES:
+            if claves[llave]:
+                self.exactas[llave].setdefault(claves[llave], referencia)
+        self.nombres[referencia] = tri
+        self.descripciones[referencia] = nombre
+        for trigrama in self._prefijo(tri):
+            self.bloques[trigrama].append(referencia)
+
+    def buscar(self, claves, tri):
+        """
+        Regresa las coincidencias [(referencia, motivo, similitud)], primero
+        las de llave exacta. Una referencia aparece una sola vez.
+        """
+        coincidencias = {}
+        for llave in LLAVES:
+            referencia = self.exactas[llave].get(claves[llave]) if claves[llave] else None
+            if referencia is not None and referencia not in coincidencias:
+                coincidencias[referencia] = (referencia, llave, 1.0)
+
+        candidatos = Counter(chain.from_iterable(
+            self.bloques.get(trigrama, ()) for trigrama in self._prefijo(tri)
+        ))
+
+        # Jaccard >= umbral exige umbral*|a| <= |b| <= |a|/umbral
+        minimo, maximo = self.umbral * len(tri), len(tri) / self.umbral
+        for referencia, veces in candidatos.items():
+            if veces < COMUNES_PREFIJO or referencia in coincidencias:
+                continue
+            otro = self.nombres[referencia]
+            if not minimo <= len(otro) <= maximo:
+                continue
+            comunes = len(tri & otro)
+            valor = comunes / (len(tri) + len(otro) - comunes)
+            if valor >= self.umbral:
+                coincidencias[referencia] = (referencia, 'nombre', valor)
+
+        return sorted(coincidencias.values(), key=lambda c: (c[1] == 'nombre', -c[2]))
+
+
+# =========== VALIDACIÓN ===========
+def _fecha(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'fecha_nacimiento: "{valor}" no es una fecha (usa AAAA-MM-DD o DD/MM/AAAA)')
+
+
+def validar_cliente(datos):
+    """Regresa los campos del Cliente o lanza ValueError con los errores de la fila"""
+    errores = []
+    cliente = {}
+
+    for campo, longitud in CAMPOS_TEXTO.items():
+        valor = datos.get(campo)
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)  # teléfonos y códigos postales leídos del XLSX como número
+        valor = '' if _vacio(valor) else str(valor).strip()
+        if longitud and len(valor) > longitud:
+            errores.append(f'{campo} excede {longitud} caracteres')
+        cliente[campo] = valor
+    for campo in ('nombre', 'apellido'):
+        if not cliente[campo]:
+            errores.append(f'{campo} es obligatorio')
+
+    if cliente['email']:
+        try:
+            validate_email(cliente['email'])
+        except ValidationError:
+            errores.append(f'email "{cliente["email"]}" no es válido')
+    cliente['rfc'] = cliente['rfc'].upper()
+
+    if not _vacio(datos.get('fecha_nacimiento')):
+        try:
+            cliente['fecha_nacimiento'] = _fecha(datos['fecha_nacimiento'])
+        except ValueError as e:
+            errores.append(str(e))
+
+    if not _vacio(datos.get('tipo_cliente')):
+        # Acepta la clave o la etiqueta ("Frecuente (1-15%)")
+        cliente['tipo_cliente'] = normalizar(datos['tipo_cliente']).split(' (')[0]
+        if cliente['tipo_cliente'] not in dict(Cliente.TIPO_CLIENTE_CHOICES):
+            errores.append(f'tipo "{datos["tipo_cliente"]}" no existe')
+
+    # El descuento debe caber en el rango del tipo (normal sin tipo en el archivo);
+    # un tipo sin descuento toma el mínimo de su rango
+    tipo = cliente.get('tipo_cliente', 'normal')
+    if not _vacio(datos.get('porcentaje_descuento')):
+        try:
+            cliente['porcentaje_descuento'] = _decimal(
+                str(datos['porcentaje_descuento']).replace('%', ''), 'descuento'
+            )
+            if tipo in Cliente.RANGOS_DESCUENTO:
+                error = Cliente.error_descuento(tipo, cliente['porcentaje_descuento'])
+                if error:
+                    errores.append(error)
+        except ValueError as e:
+            errores.append(str(e))
+    elif tipo in Cliente.RANGOS_DESCUENTO:
+        cliente['porcentaje_descuento'] = Cliente.RANGOS_DESCUENTO[tipo][0]
+
+    if errores:
+        raise ValueError(errores)
+    return cliente
+
+
+# =========== IMPORTACIÓN ===========
+def _asignar_codigos(clientes):
+    """Reserva un bloque de códigos CLI y salta los que ya existan (capturados a mano)"""
+    pendientes = clientes
+    while pendientes:
+        codigos = Cliente.reservar_codigos(len(pendientes))
+        ocupados = set(Cliente.objects.filter(codigo__in=codigos).values_list('codigo', flat=True))
+        libres = [codigo for codigo in codigos if codigo not in ocupados]
+        for cliente, codigo in zip(pendientes, libres):
+            cliente.codigo = codigo
+        pendientes = pendientes[len(libres):]
+
+
+def _referencia(referencia, descripciones):
+    tipo, valor = referencia
+    return {
+        'coincide_con': valor if tipo == 'cliente' else f'fila {valor}',
+        'existente': tipo == 'cliente',
+        'nombre_coincidencia': descripciones[referencia],
+    }
+
+
+def importar_clientes(archivo, nombre, sucursal=None, lote=1000, simular=False,
+                      importar_similares=False, umbral=UMBRAL_NOMBRE):
+    """
+    Importa clientes desde `archivo` (binario). Las filas duplicadas se
+    omiten; con `importar_similares` las que sólo se parecen por nombre sí
+    se importan (y también quedan en el reporte).
+
+    Regresa un resumen con conteos, errores por fila y el reporte completo
+    de duplicados (una entrada por fila con su mejor coincidencia).
+    """
+    inicio = timezone.now()
+    # Primera pasada: sólo nombres, para las frecuencias de trigramas
+    alias = ALIAS_COLUMNAS_CLIENTES
+    obligatorias = ('nombre', 'apellido')
+    indice = IndiceDuplicados.desde_base(umbral, (
+        (datos.get('nombre', ''), datos.get('apellido', ''))
+        for _, datos in leer_filas(archivo, nombre, alias, obligatorias)
+    ))
+    archivo.seek(0)
+    resultado = {
+        'filas': 0,
+        'creados': 0,
+        'omitidos': 0,
+        'total_errores': 0,
+        'errores': [],
+        'duplicados': [],
+        'simulacion': simular,
+    }
+
+    for filas_lote in en_lotes(leer_filas(archivo, nombre, alias, obligatorias), lote):
+        nuevos = []
+        for numero, datos in filas_lote:
+            resultado['filas'] += 1
+            try:
+                campos = validar_cliente(datos)
+            except ValueError as e:
+                resultado['total_errores'] += 1
+                if len(resultado['errores']) < MAX_ERRORES:
+                    resultado['errores'].append({
+                        'fila': numero,
+                        'nombre': f"{datos.get('nombre', '')} {datos.get('apellido', '')}".strip(),
+                        'errores': e.args[0],
+                    })
+                continue
+
+            nombre_completo = f"{campos['nombre']} {campos['apellido']}"
+            claves = llaves(campos['rfc'], campos['email'], campos['telefono'])
+            tri = trigramas(campos['nombre'], campos['apellido'])
+            coincidencias = indice.buscar(claves, tri)
+
+            importar = True
+            if coincidencias:
+                referencia, motivo, valor = coincidencias[0]
+                importar = motivo == 'nombre' and importar_similares
+                resultado['duplicados'].append({
+                    'fila': numero,
+                    'nombre': nombre_completo,
+                    'telefono': campos['telefono'],
+                    'email': campos['email'],
+                    'rfc': campos['rfc'],
+                    'motivo': motivo,
+                    'similitud': round(valor, 2),
+                    'otras': len(coincidencias) - 1,
+                    'importado': importar,
+                    **_referencia(referencia, indice.descripciones),
+                })
+                if not importar:
+                    resultado['omitidos'] += 1
+                    continue
+
+            indice.agregar(('fila', numero), nombre_completo, claves, tri)
+            nuevos.append(Cliente(sucursal_registro=sucursal, **campos))
+
+        resultado['creados'] += len(nuevos)
+        if simular or not nuevos:
+            continue
+
+        with transaction.atomic():
+            _asignar_codigos(nuevos)
+            Cliente.objects.bulk_create(nuevos)
+
+    resultado['segundos'] = (timezone.now() - inicio).total_seconds()
+    return resultado
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.segmentacion import (
+    PUNTOS_FRECUENTE, PUNTOS_PREMIUM, RESPETAR_DIAS, aplicar_niveles, proponer_niveles
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Califica a los clientes por recencia, frecuencia y monto de compra (RFM) '
+        'y propone su nivel (normal, frecuente, premium) con el descuento dentro '
+        'del rango del nivel. Con --aplicar guarda los cambios y su historial.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365,
+                            help='Días de ventas a considerar (default: 365)')
+        parser.add_argument('--frecuente', type=int, default=PUNTOS_FRECUENTE,
+                            help=f'Calificación mínima (3-15) para frecuente (default: {PUNTOS_FRECUENTE})')
+        parser.add_argument('--premium', type=int, default=PUNTOS_PREMIUM,
+                            help=f'Calificación mínima (3-15) para premium (default: {PUNTOS_PREMIUM})')
+        parser.add_argument('--respetar-dias', type=int, default=RESPETAR_DIAS,
+                            help=f'Omite clientes con un cambio manual en estos días (default: {RESPETAR_DIAS})')
+        parser.add_argument('--aplicar', action='store_true',
+                            help='Guarda los cambios (sin esta opción sólo se muestran)')
+        parser.add_argument('--usuario',
+                            help='Usuario que queda en el historial de descuentos (requerido con --aplicar)')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser al menos 1')
+        if options['respetar_dias'] < 0:
+            raise CommandError('--respetar-dias no puede ser negativo')
+        if not 3 <= options['frecuente'] <= options['premium'] <= 15:
+            raise CommandError('Las calificaciones deben cumplir 3 <= --frecuente <= --premium <= 15')
+
+        usuario = None
+        if options['aplicar']:
+            if not options['usuario']:
+                raise CommandError('--aplicar requiere --usuario')
+            try:
+                usuario = get_user_model().objects.get(username=options['usuario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        cambios = proponer_niveles(
+            dias=options['dias'],
+            puntos_frecuente=options['frecuente'],
+            puntos_premium=options['premium'],
+            respetar_dias=options['respetar_dias'],
+        )
+        for cambio in cambios:
+            self.stdout.write(
+                f"{cambio['codigo']} {cambio['nombre']}: "
+                f"{cambio['tipo_anterior']} {cambio['porcentaje_anterior']}% -> "
+                f"{cambio['tipo_nuevo']} {cambio['porcentaje_nuevo']}% (RFM {cambio['rfm']})"
+            )
+
+        if usuario is None:
+            self.stdout.write(self.style.SUCCESS(f'{len(cambios)} cambios de nivel propuestos (sin guardar)'))
+            return
+        actualizados = aplicar_niveles(cambios, usuario)
+        self.stdout.write(self.style.SUCCESS(f'{actualizados} clientes actualizados'))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.reabastecimiento import ejecutar_reabastecimiento, sugerencias_por_proveedor
+from sucursales.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula puntos de reorden y cantidades sugeridas de compra para '
+        'cada ProductoSucursal (pensado para ejecutarse cada noche por cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90,
+                            help='Días de historial de ventas a considerar (default: 90)')
+        parser.add_argument('--cobertura', type=int, default=14,
+                            help='Días de venta que debe cubrir un pedido (default: 14)')
+        parser.add_argument('--nivel-servicio', type=float, default=1.65,
+                            help='Factor z del stock de seguridad (default: 1.65 ≈ 95%%)')
+        parser.add_argument('--sucursal', help='Código de la sucursal (default: todas)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Calcula sin guardar los resultados')
+        parser.add_argument('--sugerencias', action='store_true',
+                            help='Muestra las listas de compra por proveedor')
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser mayor a 0')
+
+        productos = ejecutar_reabastecimiento(
+            dias=options['dias'],
+            cobertura=options['cobertura'],
+            z=options['nivel_servicio'],
+            sucursal=sucursal,
+            guardar=not options['simular']
+        )
+
+        con_sugerencia = sum(1 for ps in productos if ps.cantidad_sugerida > 0)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(productos)} productos calculados, {con_sugerencia} con compra sugerida'
+            + (' (simulación)' if options['simular'] else '')
+        ))
+
+        if options['sugerencias'] and not options['simular']:
+            for lista in sugerencias_por_proveedor(sucursal):
+                nombre = lista['proveedor'].nombre if lista['proveedor'] else 'Sin proveedor'
+                self.stdout.write(f"\n{nombre} (estimado ${lista['total_estimado']:.2f})")
+                for ps in lista['productos']:
+                    self.stdout.write(
+                        f"  [{ps.sucursal.codigo}] {ps.producto.codigo} {ps.producto.nombre}: "
+                        f"{ps.cantidad_sugerida} (stock {ps.stock}, reorden {ps.stock_minimo})"
+                    )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.asociaciones import generar_asociaciones
+from sucursales.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula por sucursal los productos que se compran juntos y guarda las '
+        'mejores asociaciones de cada producto para las sugerencias de la caja '
+        '(ejecutar cada noche).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=180,
+                            help='Días de ventas a considerar (default: 180)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Asociaciones a guardar por producto (default: 10)')
+        parser.add_argument('--minimo', type=int, default=3,
+                            help='Ventas juntas mínimas de un par (default: 3)')
+        parser.add_argument('--sucursal', help='Código de la sucursal (default: todas)')
+
+    def handle(self, *args, **options):
+        for parametro in ('dias', 'top', 'minimo'):
+            if options[parametro] < 1:
+                raise CommandError(f'--{parametro} debe ser al menos 1')
+
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        total = generar_asociaciones(
+            dias=options['dias'],
+            top=options['top'],
+            minimo=options['minimo'],
+            sucursal=sucursal
+        )
+        self.stdout.write(self.style.SUCCESS(f'{total} asociaciones de productos guardadas'))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.pronosticos import generar_pronosticos
+from sucursales.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el pronóstico de demanda semanal de cada ProductoSucursal '
+        '(ejecutar cada noche antes de calcular_reabastecimiento).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semanas', type=int, default=8,
+                            help='Semanas a pronosticar, entre 4 y 8 (default: 8)')
+        parser.add_argument('--dias', type=int, default=420,
+                            help='Días de historial a considerar (default: 420)')
+        parser.add_argument('--alfa', type=float, default=0.2,
+                            help='Suavizado del nivel (default: 0.2)')
+        parser.add_argument('--beta', type=float, default=0.05,
+                            help='Suavizado de la tendencia (default: 0.05)')
+        parser.add_argument('--sucursal', help='Código de la sucursal (default: todas)')
+
+    def handle(self, *args, **options):
+        if not 4 <= options['semanas'] <= 8:
+            raise CommandError('--semanas debe estar entre 4 y 8')
+        if options['dias'] < 28:
+            raise CommandError('--dias debe ser al menos 28')
+        for parametro in ('alfa', 'beta'):
+            if not 0 < options[parametro] <= 1:
+                raise CommandError(f'--{parametro} debe estar entre 0 y 1')
+
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        total = generar_pronosticos(
+            semanas=options['semanas'],
+            dias=options['dias'],
+            sucursal=sucursal,
+            alfa=options['alfa'],
+            beta=options['beta']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{total} pronósticos semanales guardados'))
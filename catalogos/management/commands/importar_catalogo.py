@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.importacion import ErrorImportacion, importar_catalogo
+from sucursales.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos y precios por sucursal desde un CSV o XLSX '
+        '(p. ej. la lista de precios de un proveedor).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV o XLSX')
+        parser.add_argument('--sucursal',
+                            help='Código de sucursal para las filas sin columna sucursal')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Filas por lote (default: 1000)')
+        parser.add_argument('--crear-faltantes', action='store_true',
+                            help='Da de alta categorías y proveedores que no existan')
+        parser.add_argument('--simular', action='store_true',
+                            help='Valida el archivo sin guardar nada')
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0')
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_catalogo(
+                    archivo,
+                    options['archivo'],
+                    sucursal=sucursal,
+                    lote=options['lote'],
+                    simular=options['simular'],
+                    crear_faltantes=options['crear_faltantes'],
+                )
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']} ({error['codigo']}): {'; '.join(error['errores'])}")
+        if resultado['total_errores'] > len(resultado['errores']):
+            self.stderr.write(f"... y {resultado['total_errores'] - len(resultado['errores'])} errores más")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas en {resultado['segundos']:.1f}s: "
+            f"{resultado['creados']} productos nuevos, {resultado['actualizados']} actualizados, "
+            f"{resultado['por_sucursal']} precios por sucursal, {resultado['total_errores']} con error"
+            + (' (simulación)' if options['simular'] else '')
+        ))
@@ -0,0 +1,75 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogos.importacion import ErrorImportacion
+from catalogos.importacion_clientes import UMBRAL_NOMBRE, importar_clientes
+from sucursales.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa clientes desde un CSV o XLSX. Los duplicados (mismo RFC, '
+        'email o teléfono, o nombre muy parecido) se omiten y se reportan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV o XLSX')
+        parser.add_argument('--sucursal',
+                            help='Código de la sucursal de registro de los clientes')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Filas por lote (default: 1000)')
+        parser.add_argument('--umbral', type=float, default=UMBRAL_NOMBRE,
+                            help=f'Similitud mínima de nombre para duplicado (default: {UMBRAL_NOMBRE})')
+        parser.add_argument('--importar-similares', action='store_true',
+                            help='Importa también los que sólo se parecen por nombre')
+        parser.add_argument('--reporte',
+                            help='Escribe el reporte de duplicados en este CSV')
+        parser.add_argument('--simular', action='store_true',
+                            help='Revisa el archivo sin guardar nada')
+
+    def handle(self, *args, **options):
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0')
+        if not 0 < options['umbral'] <= 1:
+            raise CommandError('--umbral debe estar entre 0 y 1')
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_clientes(
+                    archivo,
+                    options['archivo'],
+                    sucursal=sucursal,
+                    lote=options['lote'],
+                    simular=options['simular'],
+                    importar_similares=options['importar_similares'],
+                    umbral=options['umbral'],
+                )
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        for error in resultado['errores']:
+            self.stderr.write(f"Fila {error['fila']} ({error['nombre']}): {'; '.join(error['errores'])}")
+        if resultado['total_errores'] > len(resultado['errores']):
+            self.stderr.write(f"... y {resultado['total_errores'] - len(resultado['errores'])} errores más")
+
+        if options['reporte'] and resultado['duplicados']:
+            with open(options['reporte'], 'w', newline='', encoding='utf-8-sig') as salida:
+                escritor = csv.DictWriter(salida, fieldnames=list(resultado['duplicados'][0]))
+                escritor.writeheader()
+                escritor.writerows(resultado['duplicados'])
+            self.stdout.write(f"Reporte de duplicados: {options['reporte']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas en {resultado['segundos']:.1f}s: "
+            f"{resultado['creados']} clientes nuevos, {len(resultado['duplicados'])} posibles duplicados "
+            f"({resultado['omitidos']} omitidos), {resultado['total_errores']} con error"
+            + (' (simulación)' if options['simular'] else '')
+        ))
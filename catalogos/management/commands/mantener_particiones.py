@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from agrofeed_pv.particiones import (
+    TABLAS_PARTICIONADAS, soporta_particiones, es_particionada,
+    crear_particiones, desprender_particiones, sumar_meses, inicio_mes
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea las particiones mensuales futuras y desprende las antiguas de '
+        'las tablas particionadas (ejecutar una vez al mes por cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-adelante', type=int, default=3,
+                            help='Meses futuros que deben existir (default: 3)')
+        parser.add_argument('--retener', type=int, default=0,
+                            help='Meses a conservar adjuntos; los anteriores se desprenden '
+                                 '(default: 0 = no desprender)')
+        parser.add_argument('--tabla', choices=sorted(TABLAS_PARTICIONADAS),
+                            help='Sólo esta tabla (default: todas)')
+
+    def handle(self, *args, **options):
+        if not soporta_particiones(connection):
+            self.stdout.write(self.style.WARNING(
+                f'El motor {connection.vendor} no usa particiones; nada que hacer'
+            ))
+            return
+
+        if options['meses_adelante'] < 1:
+            raise CommandError('--meses-adelante debe ser al menos 1')
+        if options['retener'] < 0:
+            raise CommandError('--retener no puede ser negativo')
+
+        hoy = timezone.localdate()
+        tablas = [options['tabla']] if options['tabla'] else sorted(TABLAS_PARTICIONADAS)
+
+        for tabla in tablas:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if not es_particionada(cursor, tabla):
+                    self.stdout.write(self.style.WARNING(f'{tabla} no está particionada; ejecute migrate'))
+                    continue
+
+                creadas = crear_particiones(
+                    cursor, tabla, inicio_mes(hoy), sumar_meses(hoy, options['meses_adelante'])
+                )
+                desprendidas = []
+                if options['retener']:
+                    desprendidas = desprender_particiones(
+                        cursor, tabla, sumar_meses(hoy, -(options['retener'] - 1))
+                    )
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{tabla}: {len(creadas)} particiones creadas, {len(desprendidas)} desprendidas'
+            ))
+            for nombre in desprendidas:
+                self.stdout.write(f'  desprendida: {nombre}')
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0003_cliente_historialdescuento_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productosucursal',
+            name='cantidad_sugerida',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Cantidad Sugerida de Compra'),
+        ),
+        migrations.AddField(
+            model_name='productosucursal',
+            name='demanda_diaria',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='productosucursal',
+            name='fecha_calculo_reorden',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productosucursal',
+            name='reorden_automatico',
+            field=models.BooleanField(default=True, help_text='Permite que el cálculo nocturno ajuste stock mínimo y máximo', verbose_name='Reorden Automático'),
+        ),
+        migrations.AddField(
+            model_name='proveedor',
+            name='dias_entrega',
+            field=models.PositiveIntegerField(default=7, help_text='Tiempo de reabastecimiento usado para calcular el punto de reorden', verbose_name='Días de Entrega'),
+        ),
+    ]
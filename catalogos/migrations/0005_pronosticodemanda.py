@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0004_reabastecimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField(verbose_name='Inicio de Semana')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Cantidad Pronosticada')),
+                ('fecha_calculo', models.DateTimeField(auto_now_add=True)),
+                ('producto_sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pronosticos', to='catalogos.productosucursal')),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de Demanda',
+                'verbose_name_plural': 'Pronósticos de Demanda',
+                'ordering': ['producto_sucursal', 'semana'],
+                'unique_together': {('producto_sucursal', 'semana')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from agrofeed_pv.particiones import particionar_tabla, desparticionar_tabla
+
+TABLA = 'catalogos_movimientoinventario'
+
+
+def particionar(apps, schema_editor):
+    particionar_tabla(schema_editor, TABLA)
+
+
+def desparticionar(apps, schema_editor):
+    desparticionar_tabla(schema_editor, TABLA)
+
+
+class Migration(migrations.Migration):
+    """Particionamiento mensual por fecha (sólo PostgreSQL)"""
+
+    dependencies = [
+        ('catalogos', '0005_pronosticodemanda'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:51
+
+import re
+
+from django.db import migrations, models
+
+
+def iniciar_secuencia_clientes(apps, schema_editor):
+    """Arranca la secuencia 'cliente' después del mayor código CLI existente"""
+    Cliente = apps.get_model('catalogos', 'Cliente')
+    SecuenciaCodigo = apps.get_model('catalogos', 'SecuenciaCodigo')
+    ultimo = 0
+    for codigo in Cliente.objects.filter(codigo__startswith='CLI').values_list('codigo', flat=True).iterator():
+        if re.fullmatch(r'CLI\d+', codigo):
+            ultimo = max(ultimo, int(codigo[3:]))
+    SecuenciaCodigo.objects.create(nombre='cliente', ultimo=ultimo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0006_particionar_movimientoinventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Códigos',
+                'verbose_name_plural': 'Secuencias de Códigos',
+            },
+        ),
+        migrations.RunPython(iniciar_secuencia_clientes, migrations.RunPython.noop),
+    ]
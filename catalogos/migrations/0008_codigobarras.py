@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:09
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0007_secuenciacodigo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoBarras',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=50, unique=True, verbose_name='Código de Barras')),
+                ('descripcion', models.CharField(blank=True, max_length=100)),
+                ('cantidad', models.DecimalField(decimal_places=2, default=1, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Unidades por Escaneo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos_barras', to='catalogos.producto')),
+            ],
+            options={
+                'verbose_name': 'Código de Barras',
+                'verbose_name_plural': 'Códigos de Barras',
+                'ordering': ['producto', 'codigo'],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def construir_arbol(apps, schema_editor):
+    """Closure table, ruta y nivel de las categorías existentes"""
+    Categoria = apps.get_model('catalogos', 'Categoria')
+    CategoriaRelacion = apps.get_model('catalogos', 'CategoriaRelacion')
+
+    categorias = {categoria.pk: categoria for categoria in Categoria.objects.all()}
+
+    # Un ciclo en los datos viejos se corta: la categoría donde se cierra queda como raíz
+    for categoria in categorias.values():
+        vistas = {categoria.pk}
+        actual = categoria
+        while actual.padre_id is not None:
+            if actual.padre_id in vistas:
+                actual.padre_id = None
+                break
+            vistas.add(actual.padre_id)
+            actual = categorias[actual.padre_id]
+
+    relaciones = []
+    for categoria in categorias.values():
+        cadena = [categoria]
+        while cadena[-1].padre_id is not None:
+            cadena.append(categorias[cadena[-1].padre_id])
+        relaciones += [
+            CategoriaRelacion(ancestro_id=ancestro.pk, descendiente_id=categoria.pk, profundidad=profundidad)
+            for profundidad, ancestro in enumerate(cadena)
+        ]
+        categoria.ruta = ' > '.join(c.nombre for c in reversed(cadena))
+        categoria.nivel = len(cadena) - 1
+
+    CategoriaRelacion.objects.bulk_create(relaciones, batch_size=1000)
+    Categoria.objects.bulk_update(categorias.values(), ['ruta', 'nivel', 'padre'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0008_codigobarras'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='categoria',
+            options={'ordering': ['ruta'], 'verbose_name': 'Categoría', 'verbose_name_plural': 'Categorías'},
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='nivel',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='ruta',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.CreateModel(
+            name='CategoriaRelacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profundidad', models.PositiveSmallIntegerField()),
+                ('ancestro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rel_descendientes', to='catalogos.categoria')),
+                ('descendiente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rel_ancestros', to='catalogos.categoria')),
+            ],
+            options={
+                'verbose_name': 'Relación de Categorías',
+                'verbose_name_plural': 'Relaciones de Categorías',
+                'unique_together': {('ancestro', 'descendiente')},
+            },
+        ),
+        migrations.RunPython(construir_arbol, migrations.RunPython.noop),
+    ]
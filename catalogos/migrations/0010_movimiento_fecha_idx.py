@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0009_arbol_categorias'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['fecha'], name='catalogos_m_fecha_d530f3_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0010_movimiento_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsociacionProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rango', models.PositiveSmallIntegerField()),
+                ('ventas_juntas', models.PositiveIntegerField(help_text='Ventas que incluyen a ambos productos')),
+                ('confianza', models.FloatField(help_text='Proporción de las ventas del producto que incluyen al asociado')),
+                ('lift', models.FloatField(help_text='Confianza entre la proporción de ventas que incluyen al asociado')),
+                ('fecha_calculo', models.DateTimeField(auto_now_add=True)),
+                ('asociado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogos.productosucursal')),
+                ('producto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='asociaciones', to='catalogos.productosucursal')),
+            ],
+            options={
+                'verbose_name': 'Asociación de Producto',
+                'verbose_name_plural': 'Asociaciones de Productos',
+                'ordering': ['producto', 'rango'],
+                'unique_together': {('producto', 'rango')},
+            },
+        ),
+    ]
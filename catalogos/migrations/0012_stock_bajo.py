@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def inicializar_alertas(apps, schema_editor):
+    """Estado inicial de en_alerta y de los contadores, sin registrar alertas"""
+    ProductoSucursal = apps.get_model('catalogos', 'ProductoSucursal')
+    ContadorStockBajo = apps.get_model('catalogos', 'ContadorStockBajo')
+    Sucursal = apps.get_model('sucursales', 'Sucursal')
+
+    bajos = ProductoSucursal.objects.filter(stock_bajo=True, activo=True)
+    bajos.update(en_alerta=True)
+    conteos = dict(bajos.values('sucursal_id').annotate(n=models.Count('id')).values_list('sucursal_id', 'n'))
+    ContadorStockBajo.objects.bulk_create([
+        ContadorStockBajo(sucursal_id=sucursal_id, productos=conteos.get(sucursal_id, 0))
+        for sucursal_id in Sucursal.objects.values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogos', '0011_asociacion_producto'),
+        ('sucursales', '0003_sucursal_logo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('bajo', 'Bajo stock mínimo'), ('normal', 'Stock recuperado')], max_length=10)),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock_minimo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+                'ordering': ['-fecha', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContadorStockBajo',
+            fields=[
+                ('sucursal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_stock_bajo', serialize=False, to='sucursales.sucursal')),
+                ('productos', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Stock Bajo',
+                'verbose_name_plural': 'Contadores de Stock Bajo',
+            },
+        ),
+        migrations.AddField(
+            model_name='productosucursal',
+            name='en_alerta',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productosucursal',
+            name='stock_bajo',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock__lte', models.F('stock_minimo'))), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='productosucursal',
+            index=models.Index(condition=models.Q(('stock_bajo', True)), fields=['sucursal', 'activo'], name='ps_stock_bajo_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertastock',
+            name='producto_sucursal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='catalogos.productosucursal'),
+        ),
+        migrations.AddField(
+            model_name='alertastock',
+            name='sucursal',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='sucursales.sucursal'),
+        ),
+        migrations.AddIndex(
+            model_name='alertastock',
+            index=models.Index(fields=['sucursal', '-fecha'], name='catalogos_a_sucursa_9ae00c_idx'),
+        ),
+        migrations.RunPython(inicializar_alertas, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Sum, Avg
 
@@ -12,6 +15,11 @@ class Proveedor(models.Model):
     direccion = models.TextField(blank=True)
     rfc = models.CharField(max_length=20, blank=True, verbose_name="RFC")
     contacto = models.CharField(max_length=100, blank=True)
+    dias_entrega = models.PositiveIntegerField(
+        default=7,
+        verbose_name="Días de Entrega",
+        help_text="Tiempo de reabastecimiento usado para calcular el punto de reorden"
+    )
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
@@ -38,15 +46,117 @@ class Categoria(models.Model):
     activa = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    # Jerarquía materializada (se mantiene en save(), ver CategoriaRelacion)
+    ruta = models.CharField(max_length=500, blank=True, editable=False)
+    nivel = models.PositiveSmallIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
-        ordering = ['nombre']
+        ordering = ['ruta']
 
     def __str__(self):
-        if self.padre:
-            return f"{self.padre.nombre} > {self.nombre}"
-        return self.nombre
+        return self.ruta or self.nombre
+
+    def clean(self):
+        self._validar_padre()
+
+    def _validar_padre(self):
+        if self.pk and self.padre_id and CategoriaRelacion.objects.filter(
+            ancestro_id=self.pk, descendiente_id=self.padre_id
+        ).exists():
+            raise ValidationError({'padre': 'Una categoría no puede depender de sí misma ni de sus subcategorías'})
+
+    def save(self, *args, **kwargs):
+        from django.db import transaction
+
+        campos = kwargs.get('update_fields')
+        if campos is not None and not {'padre', 'padre_id', 'nombre'} & set(campos):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = Categoria.objects.filter(pk=self.pk).values('padre_id', 'nombre').first()
+            self._validar_padre()
+
+            padre = Categoria.objects.filter(pk=self.padre_id).values('ruta', 'nivel').first() if self.padre_id else None
+            self.ruta = f"{padre['ruta']} > {self.nombre}" if padre else self.nombre
+            self.nivel = padre['nivel'] + 1 if padre else 0
+            if campos is not None:
+                kwargs['update_fields'] = set(campos) | {'ruta', 'nivel'}
+            super().save(*args, **kwargs)
+
+            if anterior is None:
+                CategoriaRelacion.objects.bulk_create(
+                    [CategoriaRelacion(ancestro_id=self.pk, descendiente_id=self.pk, profundidad=0)] + [
+                        CategoriaRelacion(ancestro_id=ancestro_id, descendiente_id=self.pk, profundidad=profundidad + 1)
+                        for ancestro_id, profundidad in CategoriaRelacion.objects.filter(
+                            descendiente_id=self.padre_id
+                        ).values_list('ancestro_id', 'profundidad')
+                    ]
+                )
+                return
+            if anterior['padre_id'] != self.padre_id:
+                self._mover_subarbol()
+            if anterior['padre_id'] != self.padre_id or anterior['nombre'] != self.nombre:
+                self._actualizar_rutas()
+
+    def _mover_subarbol(self):
+        """Cuelga el subárbol de su nuevo padre (movimiento clásico de closure table)"""
+        subarbol = dict(CategoriaRelacion.objects.filter(ancestro_id=self.pk).values_list('descendiente_id', 'profundidad'))
+        CategoriaRelacion.objects.filter(
+            descendiente_id__in=subarbol
+        ).exclude(ancestro_id__in=subarbol).delete()
+
+        if self.padre_id:
+            ancestros = CategoriaRelacion.objects.filter(
+                descendiente_id=self.padre_id
+            ).values_list('ancestro_id', 'profundidad')
+            CategoriaRelacion.objects.bulk_create([
+                CategoriaRelacion(
+                    ancestro_id=ancestro_id,
+                    descendiente_id=descendiente_id,
+                    profundidad=profundidad_ancestro + 1 + profundidad
+                )
+                for ancestro_id, profundidad_ancestro in ancestros
+                for descendiente_id, profundidad in subarbol.items()
+            ])
+
+    def _actualizar_rutas(self):
+        """Recalcula ruta y nivel de los descendientes a partir de esta categoría"""
+        calculadas = {self.pk: (self.ruta, self.nivel)}
+        descendientes = Categoria.objects.filter(
+            rel_ancestros__ancestro_id=self.pk,
+            rel_ancestros__profundidad__gt=0
+        ).order_by('rel_ancestros__profundidad')
+        cambios = []
+        for categoria in descendientes:
+            ruta_padre, nivel_padre = calculadas[categoria.padre_id]
+            categoria.ruta = f"{ruta_padre} > {categoria.nombre}"
+            categoria.nivel = nivel_padre + 1
+            calculadas[categoria.pk] = (categoria.ruta, categoria.nivel)
+            cambios.append(categoria)
+        Categoria.objects.bulk_update(cambios, ['ruta', 'nivel'])
+
+
+class CategoriaRelacion(models.Model):
+    """
+    Closure table de Categoria: una fila por cada par (ancestro, descendiente),
+    incluida la de cada categoría consigo misma (profundidad 0). El subárbol
+    de X son las filas con ancestro=X: un solo join indexado.
+    """
+    ancestro = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='rel_descendientes')
+    descendiente = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='rel_ancestros')
+    profundidad = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('ancestro', 'descendiente')
+        verbose_name = "Relación de Categorías"
+        verbose_name_plural = "Relaciones de Categorías"
+
+    def __str__(self):
+        return f"{self.ancestro_id} > {self.descendiente_id} ({self.profundidad})"
 
 
 class UnidadMedida(models.Model):
@@ -156,10 +266,46 @@ class ProductoSucursal(models.Model):
     activo = models.BooleanField(default=True)
     ultima_actualizacion = models.DateTimeField(auto_now=True)
 
+    # Reabastecimiento (calculado por el motor nocturno)
+    reorden_automatico = models.BooleanField(
+        default=True,
+        verbose_name="Reorden Automático",
+        help_text="Permite que el cálculo nocturno ajuste stock mínimo y máximo"
+    )
+    demanda_diaria = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0
+    )
+    cantidad_sugerida = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name="Cantidad Sugerida de Compra"
+    )
+    fecha_calculo_reorden = models.DateTimeField(null=True, blank=True)
+
+    # Stock bajo (ver catalogos/alertas.py): la base de datos calcula
+    # stock_bajo y en_alerta guarda el último estado reportado
+    stock_bajo = models.GeneratedField(
+        expression=models.Q(stock__lte=models.F('stock_minimo')),
+        output_field=models.BooleanField(),
+        db_persist=True
+    )
+    en_alerta = models.BooleanField(default=False, editable=False)
+
     class Meta:
         unique_together = ('producto', 'sucursal')
         verbose_name = "Producto por Sucursal"
         verbose_name_plural = "Productos por Sucursal"
+        indexes = [
+            # Sólo las filas bajo el mínimo: los reportes de stock bajo leen un rango pequeño
+            models.Index(
+                fields=['sucursal', 'activo'],
+                condition=models.Q(stock_bajo=True),
+                name='ps_stock_bajo_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.producto} - {self.sucursal}"
@@ -174,6 +320,41 @@ class ProductoSucursal(models.Model):
             return 'normal'
 
 
+class CodigoBarras(models.Model):
+    """
+    Código alterno de un producto (EAN del fabricante, código de la caja,
+    etc.). `cantidad` son las unidades que agrega cada escaneo: el código de
+    una caja de 12 agrega 12.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='codigos_barras'
+    )
+    codigo = models.CharField(max_length=50, unique=True, verbose_name="Código de Barras")
+    descripcion = models.CharField(max_length=100, blank=True)
+    cantidad = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=1,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name="Unidades por Escaneo"
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['producto', 'codigo']
+        verbose_name = "Código de Barras"
+        verbose_name_plural = "Códigos de Barras"
+
+    def __str__(self):
+        return f"{self.codigo} - {self.producto.nombre}"
+
+    def clean(self):
+        if Producto.objects.filter(codigo=self.codigo).exclude(pk=self.producto_id).exists():
+            raise ValidationError({'codigo': 'Ya existe un producto con ese código'})
+
+
 class MovimientoInventario(models.Model):
     TIPO_CHOICES = [
         ('entrada', 'Entrada'),
@@ -203,9 +384,120 @@ class MovimientoInventario(models.Model):
         ordering = ['-fecha']
         verbose_name = "Movimiento de Inventario"
         verbose_name_plural = "Movimientos de Inventario"
+        indexes = [
+            # El BRIN de las particiones no sirve para ordenar: el admin y el
+            # listado de movimientos ordenan por fecha descendente con LIMIT
+            models.Index(fields=['fecha']),
+        ]
 
     def __str__(self):
         return f"{self.tipo} - {self.producto_sucursal} - {self.cantidad}"
+
+
+class PronosticoDemanda(models.Model):
+    """Demanda semanal pronosticada (ver catalogos/pronosticos.py)"""
+    producto_sucursal = models.ForeignKey(
+        ProductoSucursal,
+        on_delete=models.CASCADE,
+        related_name='pronosticos'
+    )
+    semana = models.DateField(verbose_name="Inicio de Semana")
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Cantidad Pronosticada")
+    fecha_calculo = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['producto_sucursal', 'semana']
+        unique_together = ('producto_sucursal', 'semana')
+        verbose_name = "Pronóstico de Demanda"
+        verbose_name_plural = "Pronósticos de Demanda"
+
+    def __str__(self):
+        return f"{self.producto_sucursal} - {self.semana} - {self.cantidad}"
+
+
+class ContadorStockBajo(models.Model):
+    """Productos activos de la sucursal bajo su stock mínimo (ver catalogos/alertas.py)"""
+    sucursal = models.OneToOneField(
+        Sucursal,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='contador_stock_bajo'
+    )
+    productos = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Contador de Stock Bajo"
+        verbose_name_plural = "Contadores de Stock Bajo"
+
+    def __str__(self):
+        return f"{self.sucursal_id}: {self.productos}"
+
+
+class AlertaStock(models.Model):
+    """Cruce del stock mínimo de un producto activo (ver catalogos/alertas.py)"""
+    TIPO_CHOICES = [
+        ('bajo', 'Bajo stock mínimo'),
+        ('normal', 'Stock recuperado'),
+    ]
+
+    producto_sucursal = models.ForeignKey(
+        ProductoSucursal,
+        on_delete=models.CASCADE,
+        related_name='alertas_stock'
+    )
+    sucursal = models.ForeignKey(
+        Sucursal,
+        on_delete=models.CASCADE,
+        related_name='alertas_stock',
+        db_index=False  # cubierto por (sucursal, fecha)
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    stock = models.DecimalField(max_digits=10, decimal_places=2)
+    stock_minimo = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['sucursal', '-fecha']),
+        ]
+        verbose_name = "Alerta de Stock"
+        verbose_name_plural = "Alertas de Stock"
+
+    def __str__(self):
+        return f"{self.producto_sucursal} - {self.get_tipo_display()}"
+
+
+class AsociacionProducto(models.Model):
+    """
+    Producto que suele comprarse junto con otro en la misma sucursal
+    (ver catalogos/asociaciones.py). `rango` 1 es la asociación más fuerte.
+    """
+    producto = models.ForeignKey(
+        ProductoSucursal,
+        on_delete=models.CASCADE,
+        related_name='asociaciones',
+        db_index=False  # cubierto por (producto, rango)
+    )
+    asociado = models.ForeignKey(
+        ProductoSucursal,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rango = models.PositiveSmallIntegerField()
+    ventas_juntas = models.PositiveIntegerField(help_text="Ventas que incluyen a ambos productos")
+    confianza = models.FloatField(help_text="Proporción de las ventas del producto que incluyen al asociado")
+    lift = models.FloatField(help_text="Confianza entre la proporción de ventas que incluyen al asociado")
+    fecha_calculo = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['producto', 'rango']
+        unique_together = ('producto', 'rango')
+        verbose_name = "Asociación de Producto"
+        verbose_name_plural = "Asociaciones de Productos"
+
+    def __str__(self):
+        return f"{self.producto_id} -> {self.asociado_id} ({self.rango})"
     
 # Agrega esto al final del archivo models.py después del modelo MovimientoInventario
 
@@ -215,6 +507,12 @@ class Cliente(models.Model):
         ('frecuente', 'Frecuente (1-15%)'),
         ('premium', 'Premium (16-50%)'),
     ]
+    # Descuento (mínimo, máximo) permitido en cada tipo
+    RANGOS_DESCUENTO = {
+        'normal': (Decimal('0.00'), Decimal('0.00')),
+        'frecuente': (Decimal('1.00'), Decimal('15.00')),
+        'premium': (Decimal('16.00'), Decimal('50.00')),
+    }
     
     # Información personal
     codigo = models.CharField(max_length=20, unique=True, verbose_name="Código")
@@ -273,26 +571,80 @@ class Cliente(models.Model):
     @property
     def nombre_completo(self):
         return f"{self.nombre} {self.apellido}"
+
+    @classmethod
+    def error_descuento(cls, tipo_cliente, porcentaje):
+        """Mensaje si el porcentaje no cabe en el rango del tipo, o None"""
+        if tipo_cliente not in cls.RANGOS_DESCUENTO:
+            return f'El tipo de cliente "{tipo_cliente}" no existe'
+        minimo, maximo = cls.RANGOS_DESCUENTO[tipo_cliente]
+        if minimo <= porcentaje <= maximo:
+            return None
+        tipo = dict(cls.TIPO_CLIENTE_CHOICES)[tipo_cliente].split(' (')[0]
+        if maximo == 0:
+            return f'Los clientes tipo {tipo} no pueden tener descuento'
+        return (
+            f'El descuento para clientes tipo {tipo} debe estar entre '
+            f'{minimo.normalize():f}% y {maximo.normalize():f}%'
+        )
+
+    @staticmethod
+    def reservar_codigos(cantidad=1):
+        """Códigos CLI consecutivos tomados de la secuencia 'cliente'"""
+        return [f"CLI{numero:06d}" for numero in SecuenciaCodigo.reservar('cliente', cantidad)]
     
     @property
     def total_compras(self):
-        """Total de compras realizadas por el cliente"""
+        """Total de compras realizadas por el cliente (incluye ejercicios archivados)"""
         from ventas.models import Venta
-        return Venta.objects.filter(cliente=self).count()
+        from archivo.consultas import resumen_cliente
+        return Venta.objects.filter(cliente=self).count() + resumen_cliente(self)['total_compras']
     
     @property
     def monto_total_compras(self):
-        """Monto total de compras realizadas por el cliente"""
+        """Monto total de compras realizadas por el cliente (incluye ejercicios archivados)"""
         from ventas.models import Venta
-        ventas = Venta.objects.filter(cliente=self)
-        if ventas.exists():
-            return ventas.aggregate(total=Sum('total'))['total'] or 0
-        return 0
+        from archivo.consultas import resumen_cliente
+        activo = Venta.objects.filter(cliente=self).aggregate(total=Sum('total'))['total'] or 0
+        return activo + resumen_cliente(self)['monto_total_compras']
     
     def get_ultima_compra(self):
-        """Obtiene la última compra del cliente"""
+        """Obtiene la última compra del cliente (activa o archivada)"""
         from ventas.models import Venta
-        return Venta.objects.filter(cliente=self).order_by('-fecha').first()
+        from archivo.consultas import ventas_archivadas
+        return (
+            Venta.objects.filter(cliente=self).order_by('-fecha').first() or
+            ventas_archivadas(cliente=self).order_by('-fecha').first()
+        )
+
+
+class SecuenciaCodigo(models.Model):
+    """
+    Consecutivos para códigos (p. ej. CLI000123). Se reservan por bloques
+    con un solo UPDATE bajo bloqueo de fila; los números no usados se pierden,
+    igual que en una secuencia de base de datos.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de Códigos"
+        verbose_name_plural = "Secuencias de Códigos"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo}"
+
+    @classmethod
+    def reservar(cls, nombre, cantidad=1):
+        """Reserva `cantidad` números consecutivos. Regresa un range"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            secuencia, _ = cls.objects.select_for_update().get_or_create(nombre=nombre)
+            inicio = secuencia.ultimo + 1
+            secuencia.ultimo += cantidad
+            secuencia.save(update_fields=['ultimo'])
+        return range(inicio, inicio + cantidad)
 
 
 class HistorialDescuento(models.Model):
@@ -0,0 +1,196 @@
+"""
+Pronóstico de demanda semanal por ProductoSucursal.
+
+Se ejecuta por las noches con el comando `generar_pronosticos`. Todas las
+series (productos x días) se ajustan a la vez con NumPy:
+
+- índices de día de la semana (la venta de alimento se concentra en ciertos días)
+- suavizado exponencial con tendencia amortiguada sobre la serie desestacionalizada
+- si hay más de un año de historial, se mezcla con la misma semana del año
+  anterior ajustada por el crecimiento reciente (estacionalidad anual)
+
+Los resultados se guardan en PronosticoDemanda para que reportes y
+reabastecimiento los lean sin recalcular.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ProductoSucursal, PronosticoDemanda
+from .reabastecimiento import cargar_demanda_diaria
+
+DIAS_ANIO = 364  # 52 semanas exactas: conserva el día de la semana
+SEMANAS_COMPARACION = 8
+
+
+def indices_dia_semana(matriz, inicio, suavizado=10.0):
+    """
+    Índice estacional por día de la semana para cada serie, forma (n, 7).
+
+    Las series con pocas ventas se acercan a 1 (sin estacionalidad) en
+    proporción a los días con venta que tienen.
+    """
+    n, dias = matriz.shape
+    dia_semana = (inicio.weekday() + np.arange(dias)) % 7
+
+    sumas = np.zeros((n, 7))
+    conteos = np.bincount(dia_semana, minlength=7).astype(np.float64)
+    for dia in range(7):
+        sumas[:, dia] = matriz[:, dia_semana == dia].sum(axis=1)
+
+    media = matriz.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        indices = np.where(media > 0, (sumas / np.maximum(conteos, 1)) / media, 1.0)
+
+    dias_con_venta = (matriz > 0).sum(axis=1, keepdims=True)
+    peso = dias_con_venta / (dias_con_venta + suavizado)
+    indices = peso * indices + (1 - peso)
+
+    # Normalizar para que el promedio semanal sea 1
+    return indices / indices.mean(axis=1, keepdims=True)
+
+
+def suavizado_exponencial(serie, alfa=0.2, beta=0.05, amortiguamiento=0.9):
+    """
+    Holt con tendencia amortiguada, vectorizado sobre todas las series.
+
+    Regresa (nivel, tendencia) al final del historial, cada uno de forma (n,).
+    """
+    n, dias = serie.shape
+    arranque = min(14, dias)
+    nivel = serie[:, :arranque].mean(axis=1)
+    tendencia = np.zeros(n)
+
+    for t in range(arranque, dias):
+        anterior = nivel
+        nivel = alfa * serie[:, t] + (1 - alfa) * (anterior + amortiguamiento * tendencia)
+        tendencia = beta * (nivel - anterior) + (1 - beta) * amortiguamiento * tendencia
+
+    return nivel, tendencia
+
+
+def pronosticar(matriz, inicio, semanas=8, alfa=0.2, beta=0.05, amortiguamiento=0.9):
+    """
+    Pronóstico semanal, forma (n, semanas), a partir de la matriz diaria.
+
+    El primer día pronosticado es el siguiente a la última columna de la matriz.
+    """
+    n, dias = matriz.shape
+    horizonte = semanas * 7
+    if n == 0:
+        return np.zeros((0, semanas))
+
+    indices = indices_dia_semana(matriz, inicio)
+    dia_semana = (inicio.weekday() + np.arange(dias)) % 7
+    desestacionalizada = matriz / indices[:, dia_semana]
+
+    nivel, tendencia = suavizado_exponencial(desestacionalizada, alfa, beta, amortiguamiento)
+
+    pasos = np.arange(1, horizonte + 1)
+    acumulado = np.cumsum(amortiguamiento ** pasos)
+    dia_futuro = (inicio.weekday() + dias + np.arange(horizonte)) % 7
+    diario = (nivel[:, None] + acumulado[None, :] * tendencia[:, None]) * indices[:, dia_futuro]
+    semanal = np.clip(diario, 0.0, None).reshape(n, semanas, 7).sum(axis=2)
+
+    # Estacionalidad anual: misma semana del año anterior por el crecimiento reciente
+    if dias >= DIAS_ANIO + SEMANAS_COMPARACION * 7:
+        hace_un_anio = dias - DIAS_ANIO
+        comparacion = SEMANAS_COMPARACION * 7
+        reciente = matriz[:, dias - comparacion:].sum(axis=1)
+        anterior = matriz[:, hace_un_anio - comparacion:hace_un_anio].sum(axis=1)
+        base = matriz[:, hace_un_anio:hace_un_anio + horizonte].reshape(n, semanas, 7).sum(axis=2)
+
+        validas = (reciente > 0) & (anterior > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crecimiento = np.clip(np.where(validas, reciente / anterior, 1.0), 0.5, 2.0)
+        anual = base * crecimiento[:, None]
+        semanal = np.where(validas[:, None], 0.5 * semanal + 0.5 * anual, semanal)
+
+    return np.round(semanal, 2)
+
+
+def generar_pronosticos(semanas=8, dias=420, sucursal=None, alfa=0.2, beta=0.05, amortiguamiento=0.9):
+    """
+    Calcula y guarda el pronóstico de las próximas `semanas` para todas las
+    sucursales (o una). Reemplaza los pronósticos anteriores de los productos
+    calculados. Regresa el número de registros guardados.
+    """
+    productos = ProductoSucursal.objects.filter(activo=True)
+    if sucursal:
+        productos = productos.filter(sucursal=sucursal)
+    ids = list(productos.order_by('id').values_list('id', flat=True))
+    if not ids:
+        return 0
+
+    fin = timezone.localdate()
+    ids, matriz, inicio = cargar_demanda_diaria(dias=dias, sucursal=sucursal, fin=fin, ids=ids)
+    semanal = pronosticar(matriz, inicio, semanas, alfa, beta, amortiguamiento)
+
+    # Sólo se guardan las series con historial; el resto no tiene base
+    con_historial = matriz.sum(axis=1) > 0
+    fechas = [fin + timedelta(days=7 * k) for k in range(semanas)]
+
+    nuevos = [
+        PronosticoDemanda(
+            producto_sucursal_id=int(ids[i]),
+            semana=fechas[k],
+            cantidad=Decimal(str(semanal[i, k]))
+        )
+        for i in np.flatnonzero(con_historial)
+        for k in range(semanas)
+    ]
+
+    with transaction.atomic():
+        PronosticoDemanda.objects.filter(producto_sucursal_id__in=ids.tolist()).delete()
+        PronosticoDemanda.objects.bulk_create(nuevos, batch_size=2000)
+
+    return len(nuevos)
+
+
+def cargar_pronosticos(ids, semanas=8, desde=None):
+    """
+    Pronósticos vigentes como matriz (len(ids), semanas), en el orden de `ids`.
+
+    Una semana es vigente si empieza a lo más 6 días antes de `desde`. Los
+    productos sin pronóstico quedan con NaN.
+    """
+    desde = desde or timezone.localdate()
+    ids = np.asarray(ids, dtype=np.int64)
+    matriz = np.full((len(ids), semanas), np.nan)
+    if len(ids) == 0:
+        return matriz
+
+    registros = PronosticoDemanda.objects.filter(
+        producto_sucursal_id__in=ids.tolist(),
+        semana__gt=desde - timedelta(days=7),
+        semana__lt=desde + timedelta(days=7 * semanas)
+    ).values_list('producto_sucursal_id', 'semana', 'cantidad')
+
+    posiciones = {int(ps_id): i for i, ps_id in enumerate(ids)}
+    primera = {}
+    datos = sorted(registros, key=lambda r: (r[0], r[1]))
+    for ps_id, semana, cantidad in datos:
+        base = primera.setdefault(ps_id, semana)
+        columna = (semana - base).days // 7
+        if columna < semanas:
+            matriz[posiciones[ps_id], columna] = float(cantidad)
+
+    return matriz
+
+
+def demanda_diaria_pronosticada(ids, dias_horizonte, semanas=8):
+    """
+    Demanda diaria promedio pronosticada para las semanas que cubren
+    `dias_horizonte` (p. ej. el tiempo de entrega) de cada producto.
+    NaN donde no hay pronóstico.
+    """
+    matriz = cargar_pronosticos(ids, semanas)
+    semanas_cubiertas = np.clip(np.ceil(np.asarray(dias_horizonte) / 7), 1, semanas).astype(np.int64)
+
+    acumulado = np.cumsum(np.nan_to_num(matriz), axis=1)
+    total = np.take_along_axis(acumulado, (semanas_cubiertas - 1)[:, None], axis=1)[:, 0]
+    demanda = total / (semanas_cubiertas * 7)
+    return np.where(np.isnan(matriz[:, 0]), np.nan, demanda)
@@ -0,0 +1,220 @@
+"""
+Motor de reabastecimiento: puntos de reorden y cantidades sugeridas.
+
+Se ejecuta por las noches con el comando `calcular_reabastecimiento`.
+La demanda diaria de cada ProductoSucursal se carga en una matriz de NumPy
+(productos x días) y todos los cálculos se hacen en una sola pasada. Si hay
+pronósticos vigentes (ver pronosticos.py) se usan como demanda esperada.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from agrofeed_pv.particiones import rango_fechas, filtro_poda
+from dashboard import metricas
+from . import alertas
+from .models import ProductoSucursal
+
+
+def cargar_demanda_diaria(dias=90, sucursal=None, fin=None, ids=None):
+    """
+    Demanda diaria por ProductoSucursal a partir de DetalleVenta.
+
+    Regresa (ids, matriz, fecha_inicio): `ids` es un arreglo ordenado con los
+    ids de ProductoSucursal (los activos si no se indican) y `matriz` tiene
+    forma (len(ids), dias), con la cantidad vendida por día.
+    """
+    from ventas.models import DetalleVenta
+
+    fin = fin or timezone.localdate()
+    inicio = fin - timedelta(days=dias)
+
+    if ids is None:
+        productos = ProductoSucursal.objects.filter(activo=True)
+        if sucursal:
+            productos = productos.filter(sucursal=sucursal)
+        ids = productos.order_by('id').values_list('id', flat=True)
+    ids = np.sort(np.fromiter(ids, dtype=np.int64))
+
+    desde, hasta = rango_fechas(inicio, fin - timedelta(days=1))
+    ventas = DetalleVenta.objects.filter(
+        venta__estado='completada',
+        venta__fecha__gte=desde,
+        venta__fecha__lt=hasta,
+        producto__activo=True,
+        **filtro_poda('fecha_creacion', desde)
+    )
+    if sucursal:
+        ventas = ventas.filter(venta__sucursal=sucursal)
+
+    filas = ventas.annotate(
+        dia=TruncDate('venta__fecha')
+    ).values('producto_id', 'dia').annotate(
+        cantidad=Sum('cantidad')
+    ).values_list('producto_id', 'dia', 'cantidad')
+
+    matriz = np.zeros((len(ids), dias), dtype=np.float64)
+    if len(ids) == 0:
+        return ids, matriz, inicio
+
+    registros = list(filas)
+    if registros:
+        producto_ids = np.array([r[0] for r in registros], dtype=np.int64)
+        columnas = np.array([(r[1] - inicio).days for r in registros], dtype=np.int64)
+        cantidades = np.array([float(r[2]) for r in registros], dtype=np.float64)
+
+        # ids está ordenado: searchsorted da la fila de cada producto
+        filas_idx = np.searchsorted(ids, producto_ids)
+        validos = (filas_idx < len(ids)) & (columnas >= 0) & (columnas < dias)
+        validos &= ids[np.minimum(filas_idx, len(ids) - 1)] == producto_ids
+        np.add.at(matriz, (filas_idx[validos], columnas[validos]), cantidades[validos])
+
+    return ids, matriz, inicio
+
+
+def calcular_puntos_reorden(matriz, stock, tiempo_entrega, cobertura=14, z=1.65, demanda=None):
+    """
+    Cálculo vectorizado de reorden para todos los productos a la vez.
+
+    - demanda: promedio diario (o la pronosticada, si se indica; NaN = sin pronóstico)
+    - punto de reorden: demanda * tiempo_entrega + z * desviación * sqrt(tiempo_entrega)
+    - stock máximo: punto de reorden + demanda * cobertura
+    - sugerido: lo que falta para llegar al máximo, sólo si el stock ya
+      está en o por debajo del punto de reorden
+    """
+    dias = matriz.shape[1]
+    historica = matriz.mean(axis=1)
+    demanda = historica if demanda is None else np.where(np.isnan(demanda), historica, demanda)
+    desviacion = matriz.std(axis=1, ddof=1) if dias > 1 else np.zeros(len(matriz))
+
+    seguridad = z * desviacion * np.sqrt(tiempo_entrega)
+    punto_reorden = demanda * tiempo_entrega + seguridad
+    stock_maximo = punto_reorden + demanda * cobertura
+
+    sugerido = np.where(stock <= punto_reorden, stock_maximo - stock, 0.0)
+    sugerido = np.clip(sugerido, 0.0, None)
+
+    # Redondear hacia arriba a centésimas (unidades de venta fraccionarias)
+    redondear = lambda valores: np.ceil(np.round(valores * 100, 6)) / 100
+    return {
+        'demanda': np.round(demanda, 2),
+        'punto_reorden': redondear(punto_reorden),
+        'stock_maximo': redondear(stock_maximo),
+        'sugerido': redondear(sugerido),
+    }
+
+
+def _a_decimal(valor):
+    return Decimal(str(round(float(valor), 2)))
+
+
+def ejecutar_reabastecimiento(dias=90, cobertura=14, z=1.65, sucursal=None, guardar=True):
+    """
+    Calcula y guarda puntos de reorden para todas las sucursales (o una).
+
+    Los productos con `reorden_automatico` y con historial de ventas reciben
+    nuevo stock mínimo (punto de reorden) y máximo. Todos reciben la demanda
+    diaria y la cantidad sugerida. Regresa la lista de objetos actualizados.
+    """
+    productos = ProductoSucursal.objects.filter(activo=True)
+    if sucursal:
+        productos = productos.filter(sucursal=sucursal)
+    datos = list(productos.order_by('id').values_list(
+        'id', 'stock', 'reorden_automatico', 'producto__proveedor__dias_entrega'
+    ))
+    if not datos:
+        return []
+
+    _, matriz, _ = cargar_demanda_diaria(
+        dias=dias,
+        sucursal=sucursal,
+        ids=[d[0] for d in datos]
+    )
+    stock = np.array([float(d[1]) for d in datos], dtype=np.float64)
+    automatico = np.array([d[2] for d in datos], dtype=bool)
+    tiempo_entrega = np.array([d[3] or 7 for d in datos], dtype=np.float64)
+
+    from .pronosticos import demanda_diaria_pronosticada
+    pronostico = demanda_diaria_pronosticada([d[0] for d in datos], tiempo_entrega + cobertura)
+
+    resultado = calcular_puntos_reorden(
+        matriz, stock, tiempo_entrega,
+        cobertura=cobertura,
+        z=z,
+        demanda=pronostico
+    )
+
+    # Sin historial no hay base para mover los límites capturados a mano
+    con_historial = matriz.sum(axis=1) > 0
+    ajustar_limites = automatico & con_historial
+
+    ahora = timezone.now()
+    actualizados = []
+    for i, (ps_id, *_resto) in enumerate(datos):
+        ps = ProductoSucursal(id=ps_id)
+        ps.demanda_diaria = _a_decimal(resultado['demanda'][i])
+        ps.cantidad_sugerida = _a_decimal(resultado['sugerido'][i]) if con_historial[i] else Decimal('0')
+        ps.fecha_calculo_reorden = ahora
+        if ajustar_limites[i]:
+            ps.stock_minimo = _a_decimal(resultado['punto_reorden'][i])
+            ps.stock_maximo = _a_decimal(resultado['stock_maximo'][i])
+        actualizados.append((ps, ajustar_limites[i]))
+
+    if guardar:
+        campos = ['demanda_diaria', 'cantidad_sugerida', 'fecha_calculo_reorden']
+        ProductoSucursal.objects.bulk_update(
+            [ps for ps, ajustar in actualizados if ajustar],
+            campos + ['stock_minimo', 'stock_maximo'],
+            batch_size=1000
+        )
+        ProductoSucursal.objects.bulk_update(
+            [ps for ps, ajustar in actualizados if not ajustar],
+            campos,
+            batch_size=1000
+        )
+        # Cambian los mínimos: alertas y conteo de productos bajo stock
+        alertas.sincronizar([ps.id for ps, ajustar in actualizados if ajustar])
+        metricas.invalidar()
+
+    return [ps for ps, _ in actualizados]
+
+
+def sugerencias_por_proveedor(sucursal=None):
+    """
+    Listas de compra sugeridas agrupadas por proveedor.
+
+    Regresa una lista de dicts {'proveedor', 'productos', 'total_estimado'}
+    ordenada por nombre de proveedor; los productos sin proveedor van al final.
+    """
+    productos = ProductoSucursal.objects.filter(
+        cantidad_sugerida__gt=0,
+        activo=True,
+        producto__activo=True
+    ).select_related(
+        'producto', 'producto__proveedor', 'sucursal'
+    ).order_by('producto__proveedor__nombre', 'sucursal__nombre', 'producto__nombre')
+
+    if sucursal:
+        productos = productos.filter(sucursal=sucursal)
+
+    grupos = {}
+    for ps in productos:
+        proveedor = ps.producto.proveedor
+        grupo = grupos.setdefault(proveedor.id if proveedor else None, {
+            'proveedor': proveedor,
+            'productos': [],
+            'total_estimado': Decimal('0'),
+        })
+        ps.costo_sugerido = ps.cantidad_sugerida * ps.producto.costo_promedio
+        grupo['productos'].append(ps)
+        grupo['total_estimado'] += ps.costo_sugerido
+
+    sin_proveedor = grupos.pop(None, None)
+    listas = list(grupos.values())
+    if sin_proveedor:
+        listas.append(sin_proveedor)
+    return listas
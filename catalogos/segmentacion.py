@@ -0,0 +1,199 @@
+"""
+Nivel automático de los clientes (normal, frecuente, premium) por RFM.
+
+Una consulta agrupada sobre las ventas completadas de los últimos `dias`
+da por cliente la fecha de su última compra (recencia), el número de
+compras (frecuencia) y el monto (monetario); si el periodo incluye un
+ejercicio archivado se suma la misma consulta sobre VentaArchivada. Cada
+variable se califica del 1 al 5 con los quintiles de todos los clientes con
+compras (NumPy, sin recorrer cliente por cliente) y la suma (3 a 15) decide
+el nivel. Los empates en un corte caen en el quintil inferior, así que los
+muchos clientes de una sola compra no suben de calificación por llenar
+varios quintiles.
+
+Al cambiar de nivel, el descuento se lleva al extremo más cercano del rango
+del nuevo nivel (Cliente.RANGOS_DESCUENTO, los que valida
+clientes_cambiar_descuento). Los
+clientes activos sin compras en el periodo quedan en normal. Los que tienen
+un cambio manual reciente en HistorialDescuento no se tocan.
+
+`proponer_niveles` sólo calcula; `aplicar_niveles` guarda con bulk_update y
+registra el historial con bulk_create, omitiendo los clientes que cambiaron
+desde la propuesta. Se usa desde el comando `actualizar_niveles_clientes` y
+la vista clientes_niveles.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from agrofeed_pv.particiones import rango_fechas
+from .importacion import en_lotes
+from .models import Cliente, HistorialDescuento
+
+MOTIVO_AUTOMATICO = 'Nivel automático'
+
+ORDEN_NIVELES = {'normal': 0, 'frecuente': 1, 'premium': 2}
+
+# Calificación RFM mínima (de 3 a 15) de cada nivel
+PUNTOS_FRECUENTE = 9
+PUNTOS_PREMIUM = 13
+# Días en que un cambio manual de descuento tiene prioridad
+RESPETAR_DIAS = 90
+
+
+# =========== CALIFICACIÓN ===========
+def cargar_rfm(dias=365, fecha=None):
+    """
+    Arreglos alineados (cliente_id, días desde la última compra, compras,
+    monto) de los clientes con ventas completadas en los `dias` que terminan
+    en `fecha` (default: hoy).
+    """
+    from archivo.consultas import periodo_archivado, ventas_archivadas
+    from ventas.models import Venta
+
+    hasta = fecha or timezone.localdate()
+    desde = hasta - timedelta(days=dias - 1)
+    inicio, fin = rango_fechas(desde, hasta)
+
+    consultas = [Venta.objects.filter(
+        estado='completada', cliente__isnull=False, fecha__gte=inicio, fecha__lt=fin
+    )]
+    if periodo_archivado(desde, hasta):
+        consultas.append(ventas_archivadas(
+            desde=inicio, hasta=fin, estado='completada'
+        ).filter(cliente_id__isnull=False))
+
+    filas = []
+    for ventas in consultas:
+        filas.extend(ventas.values('cliente_id').annotate(
+            ultima=Max('fecha'), compras=Count('id'), monto=Sum('total')
+        ).values_list('cliente_id', 'ultima', 'compras', 'monto').order_by())
+    if not filas:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, vacio, np.zeros(0, dtype=np.float64)
+
+    # Un cliente puede tener ventas activas y archivadas
+    ids, posiciones = np.unique(np.array([fila[0] for fila in filas], dtype=np.int64), return_inverse=True)
+    recencia = np.full(len(ids), dias, dtype=np.int64)
+    compras = np.zeros(len(ids), dtype=np.int64)
+    monto = np.zeros(len(ids), dtype=np.float64)
+    np.minimum.at(recencia, posiciones, [(hasta - timezone.localtime(fila[1]).date()).days for fila in filas])
+    np.add.at(compras, posiciones, [fila[2] for fila in filas])
+    np.add.at(monto, posiciones, [float(fila[3] or 0) for fila in filas])
+    return ids, recencia, compras, monto
+
+
+def _quintil(valores):
+    """Calificación 1-5 de cada valor (mayor es mejor); un empate con el corte cuenta abajo"""
+    cortes = np.percentile(valores, [20, 40, 60, 80])
+    return np.searchsorted(cortes, valores, side='left') + 1
+
+
+def calificar(recencia, compras, monto):
+    """Calificaciones (r, f, m) del 1 al 5; la recencia más baja califica más alto"""
+    if len(recencia) == 0:
+        vacio = np.zeros(0, dtype=np.int64)
+        return vacio, vacio, vacio
+    return _quintil(-recencia), _quintil(compras), _quintil(monto)
+
+
+def ajustar_descuento(porcentaje, tipo_cliente):
+    """El porcentaje dentro del rango del nivel, movido al extremo más cercano si no cabe"""
+    minimo, maximo = Cliente.RANGOS_DESCUENTO[tipo_cliente]
+    return min(max(porcentaje, minimo), maximo)
+
+
+# =========== PROPUESTA Y APLICACIÓN ===========
+def proponer_niveles(dias=365, puntos_frecuente=PUNTOS_FRECUENTE, puntos_premium=PUNTOS_PREMIUM,
+                     respetar_dias=RESPETAR_DIAS):
+    """
+    Cambios de nivel de los clientes activos: lista de dicts con el cliente,
+    su nivel y descuento actuales y nuevos y su calificación RFM. Primero
+    los ascensos, de mayor a menor monto.
+    """
+    ids, recencia, compras, monto = cargar_rfm(dias)
+    r, f, m = calificar(recencia, compras, monto)
+    puntos = r + f + m
+    niveles = np.where(puntos >= puntos_premium, 'premium', np.where(puntos >= puntos_frecuente, 'frecuente', 'normal'))
+    calificados = {
+        cliente_id: datos
+        for cliente_id, *datos in zip(
+            ids.tolist(), niveles.tolist(), r.tolist(), f.tolist(), m.tolist(),
+            recencia.tolist(), compras.tolist(), monto.tolist()
+        )
+    }
+
+    manuales = HistorialDescuento.objects.filter(
+        fecha_cambio__gte=timezone.now() - timedelta(days=respetar_dias)
+    ).exclude(motivo__startswith=MOTIVO_AUTOMATICO).values('cliente_id')
+    clientes = Cliente.objects.filter(activo=True).exclude(id__in=manuales).values_list(
+        'id', 'codigo', 'nombre', 'apellido', 'tipo_cliente', 'porcentaje_descuento'
+    ).order_by()
+
+    cambios = []
+    for cliente_id, codigo, nombre, apellido, tipo, porcentaje in clientes.iterator(chunk_size=5000):
+        nivel, *calificacion, dias_compra, n, total = calificados.get(
+            cliente_id, ('normal', 0, 0, 0, None, 0, 0.0)
+        )
+        nuevo_porcentaje = ajustar_descuento(porcentaje, nivel)
+        if nivel == tipo and nuevo_porcentaje == porcentaje:
+            continue
+        cambios.append({
+            'cliente_id': cliente_id,
+            'codigo': codigo,
+            'nombre': f'{nombre} {apellido}',
+            'tipo_anterior': tipo,
+            'porcentaje_anterior': porcentaje,
+            'tipo_nuevo': nivel,
+            'porcentaje_nuevo': nuevo_porcentaje,
+            'rfm': '-'.join(str(c) for c in calificacion),
+            'dias_ultima_compra': dias_compra,
+            'compras': n,
+            'monto': round(total, 2),
+            'asciende': ORDEN_NIVELES[nivel] > ORDEN_NIVELES.get(tipo, 0),
+        })
+
+    cambios.sort(key=lambda c: (not c['asciende'], -c['monto']))
+    return cambios
+
+
+def aplicar_niveles(cambios, usuario, lote=1000):
+    """
+    Guarda los cambios propuestos y su historial a nombre de `usuario`. Se
+    omiten los clientes cuyo nivel o descuento ya no es el de la propuesta.
+    Regresa el número de clientes actualizados.
+    """
+    por_id = {cambio['cliente_id']: cambio for cambio in cambios}
+    ahora = timezone.now()
+    actualizados = 0
+    with transaction.atomic():
+        for ids in en_lotes(sorted(por_id), lote):
+            clientes = []
+            historial = []
+            for cliente in Cliente.objects.select_for_update().filter(id__in=ids).order_by('id'):
+                cambio = por_id[cliente.id]
+                if (cliente.tipo_cliente, cliente.porcentaje_descuento) != (
+                    cambio['tipo_anterior'], cambio['porcentaje_anterior']
+                ):
+                    continue
+                cliente.tipo_cliente = cambio['tipo_nuevo']
+                cliente.porcentaje_descuento = cambio['porcentaje_nuevo']
+                # bulk_update no aplica auto_now
+                cliente.fecha_actualizacion = ahora
+                clientes.append(cliente)
+                historial.append(HistorialDescuento(
+                    cliente=cliente,
+                    tipo_cliente_anterior=cambio['tipo_anterior'],
+                    tipo_cliente_nuevo=cambio['tipo_nuevo'],
+                    porcentaje_anterior=cambio['porcentaje_anterior'],
+                    porcentaje_nuevo=cambio['porcentaje_nuevo'],
+                    usuario=usuario,
+                    motivo=f"{MOTIVO_AUTOMATICO} (RFM {cambio['rfm']})",
+                ))
+            Cliente.objects.bulk_update(clientes, ['tipo_cliente', 'porcentaje_descuento', 'fecha_actualizacion'])
+            HistorialDescuento.objects.bulk_create(historial)
+            actualizados += len(clientes)
+    return actualizados
@@ -0,0 +1,62 @@
+"""
+Invalidación de los índices en cache: escaneo (catalogos/escaneo.py) y
+árbol de categorías (catalogos/categorias.py). Alertas de stock bajo
+(catalogos/alertas.py) de los cambios que pasan por save()/delete().
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import alertas, categorias, escaneo
+from .models import Categoria, CodigoBarras, Producto, ProductoSucursal
+
+# Campos de ProductoSucursal que no están en el índice
+CAMPOS_FUERA_DEL_INDICE = {
+    'stock', 'stock_minimo', 'stock_maximo', 'ultima_actualizacion',
+    'reorden_automatico', 'demanda_diaria', 'cantidad_sugerida', 'fecha_calculo_reorden',
+}
+
+# Campos de ProductoSucursal que pueden cruzar el stock mínimo
+CAMPOS_STOCK_BAJO = {'stock', 'stock_minimo', 'activo'}
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=CodigoBarras)
+@receiver(post_delete, sender=CodigoBarras)
+def invalidar_catalogo(sender, **kwargs):
+    escaneo.invalidar()
+
+
+@receiver(post_save, sender=ProductoSucursal)
+@receiver(post_delete, sender=ProductoSucursal)
+def invalidar_sucursal(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= CAMPOS_FUERA_DEL_INDICE:
+        return
+    escaneo.invalidar(instance.sucursal_id)
+
+
+@receiver(post_save, sender=ProductoSucursal)
+def sincronizar_stock_bajo(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & CAMPOS_STOCK_BAJO:
+        return
+    alertas.sincronizar([instance.pk])
+
+
+@receiver(pre_delete, sender=ProductoSucursal)
+def quitar_stock_bajo(sender, instance, **kwargs):
+    alertas.quitar(instance)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_arbol(sender, **kwargs):
+    categorias.invalidar_arbol()
+
+
+@receiver(pre_delete, sender=Categoria)
+def desligar_subcategorias(sender, instance, **kwargs):
+    # Las subcategorías quedan como raíces (on_delete=SET_NULL): se mueven
+    # con save() para que la closure table y sus rutas sigan correctas
+    for hija in instance.subcategorias.all():
+        hija.padre = None
+        hija.save()
@@ -1,3 +1,25 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .importacion_clientes import validar_cliente
+
+
+# =========== IMPORTACIÓN DE CLIENTES ===========
+class ValidarClienteTests(SimpleTestCase):
+    def fila(self, tipo, descuento):
+        return {'nombre': 'Ana', 'apellido': 'López', 'tipo_cliente': tipo, 'porcentaje_descuento': descuento}
+
+    def test_descuento_fuera_del_rango_del_tipo(self):
+        for tipo, descuento in (('normal', '30'), ('', '5'), ('frecuente', '0'), ('premium', '15%')):
+            with self.subTest(tipo=tipo, descuento=descuento), self.assertRaises(ValueError):
+                validar_cliente(self.fila(tipo, descuento))
+
+    def test_tipo_sin_descuento_toma_el_minimo_de_su_rango(self):
+        self.assertEqual(validar_cliente(self.fila('premium', ''))['porcentaje_descuento'], Decimal('16.00'))
+        self.assertEqual(validar_cliente(self.fila('Frecuente (1-15%)', None))['porcentaje_descuento'], Decimal('1.00'))
+        self.assertEqual(validar_cliente(self.fila('', ''))['porcentaje_descuento'], Decimal('0.00'))
+
+    def test_descuento_dentro_del_rango(self):
+        cliente = validar_cliente(self.fila('frecuente', '12.5%'))
+        self.assertEqual((cliente['tipo_cliente'], cliente['porcentaje_descuento']), ('frecuente', Decimal('12.50')))
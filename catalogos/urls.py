@@ -26,6 +26,7 @@ urlpatterns = [
     # =========== PRODUCTOS ===========
     path('productos/', views.productos_lista, name='productos_lista'),
     path('productos/crear/', views.productos_crear, name='productos_crear'),
+    path('productos/importar/', views.productos_importar, name='productos_importar'),
     path('productos/editar/<int:pk>/', views.productos_editar, name='productos_editar'),
     path('productos/eliminar/<int:pk>/', views.productos_eliminar, name='productos_eliminar'),
     path('productos/toggle/<int:pk>/', views.productos_toggle, name='productos_toggle'),
@@ -37,6 +38,8 @@ urlpatterns = [
     path('inventario/ajuste/', views.inventario_ajuste, name='inventario_ajuste'),
     path('inventario/movimientos/', views.inventario_movimientos, name='inventario_movimientos'),
     path('inventario/reporte/', views.inventario_reporte, name='inventario_reporte'),
+    path('inventario/alertas/', views.inventario_alertas, name='inventario_alertas'),
+    path('inventario/sugerencias/', views.inventario_sugerencias, name='inventario_sugerencias'),
 
     # ============ Clientes ===========
     # Agrega estas rutas al final del urlpatterns
@@ -44,6 +47,9 @@ urlpatterns = [
     # =========== CLIENTES ===========
     path('clientes/', views.clientes_lista, name='clientes_lista'),
     path('clientes/crear/', views.clientes_crear, name='clientes_crear'),
+    path('clientes/importar/', views.clientes_importar, name='clientes_importar'),
+    path('clientes/importar/reporte/<str:clave>/', views.clientes_importar_reporte, name='clientes_importar_reporte'),
+    path('clientes/niveles/', views.clientes_niveles, name='clientes_niveles'),
     path('clientes/editar/<int:pk>/', views.clientes_editar, name='clientes_editar'),
     path('clientes/eliminar/<int:pk>/', views.clientes_eliminar, name='clientes_eliminar'),
     path('clientes/toggle/<int:pk>/', views.clientes_toggle, name='clientes_toggle'),
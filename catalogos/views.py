@@ -1,16 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Q, Sum, Count, F
+from django.db.models import Q, Sum, Count, F, Max
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta
+import csv
 import json
+import uuid
 
 from caja import models
 from dashboard import models
@@ -19,18 +22,24 @@ from catalogos import models
 
 from .models import (
     Proveedor, Categoria, UnidadMedida,
-    Producto, ProductoSucursal, MovimientoInventario,
-    Cliente, HistorialDescuento
+    Producto, ProductoSucursal, MovimientoInventario, PronosticoDemanda,
+    Cliente, HistorialDescuento, AlertaStock
     
 )
 
 from .forms import (
     ProveedorForm, CategoriaForm, UnidadMedidaForm,
     ProductoForm, ProductoSucursalForm,
-    ClienteForm, ClienteFilterForm
+    ClienteForm, ClienteFilterForm, ImportarCatalogoForm, ImportarClientesForm
 )
 
 from sucursales.models import Sucursal
+from agrofeed_pv.particiones import rango_fechas, filtro_poda
+from agrofeed_pv.routers import usa_base_reportes
+from agrofeed_pv.cargas import clase_carga, REPORTE, EXPORTACION
+from archivo.consultas import historial_cliente
+from . import alertas
+from .categorias import arbol as arbol_categorias, opciones as opciones_categorias, en_subarbol
 from usuarios.decorators import admin_required, puede_editar_precios, superadmin_required
 
 # =========== PROVEEDORES ===========
@@ -163,7 +172,24 @@ def proveedores_detalle(request, pk):
 @login_required
 @admin_required
 def categorias_lista(request):
-    categorias = Categoria.objects.filter(padre__isnull=True)
+    # Árbol en cache y productos activos por rama (una sola consulta agrupada)
+    nodos = arbol_categorias()
+    directos = dict(
+        Producto.objects.filter(activo=True, categoria__isnull=False)
+        .values_list('categoria_id').annotate(total=Count('id')).order_by()
+    )
+    productos_rama = dict.fromkeys((nodo['id'] for nodo in nodos), 0)
+    for nodo in nodos:
+        for ancestro in nodo['ancestros']:
+            productos_rama[ancestro] += directos.get(nodo['id'], 0)
+    
+    categorias = []
+    for nodo in nodos:
+        nodo = {**nodo, 'productos': productos_rama[nodo['id']]}
+        if nodo['nivel'] == 0:
+            categorias.append({**nodo, 'descendientes': []})
+        else:
+            categorias[-1]['descendientes'].append(nodo)
     
     return render(request, 'catalogos/categorias/lista.html', {
         'categorias': categorias
@@ -326,6 +352,7 @@ def unidades_eliminar(request, pk):
 
 # =========== PRODUCTOS ===========
 @login_required
+@usa_base_reportes
 def productos_lista(request):
     query = request.GET.get('q', '')
     categoria_id = request.GET.get('categoria', '')
@@ -343,7 +370,8 @@ def productos_lista(request):
         )
     
     if categoria_id:
-        productos = productos.filter(categoria_id=categoria_id)
+        # Incluye las subcategorías
+        productos = productos.filter(en_subarbol(categoria_id))
     
     if proveedor_id:
         productos = productos.filter(proveedor_id=proveedor_id)
@@ -395,7 +423,7 @@ def productos_lista(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    categorias = Categoria.objects.filter(activa=True)
+    categorias = opciones_categorias()
     proveedores = Proveedor.objects.filter(activo=True)
     
     context = {
@@ -450,6 +478,46 @@ def productos_crear(request):
     })
 
 
+@login_required
+@admin_required
+@clase_carga(EXPORTACION)
+def productos_importar(request):
+    """Importación masiva de productos y precios por sucursal (CSV/XLSX)"""
+    from .importacion import ErrorImportacion, importar_catalogo
+
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarCatalogoForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            try:
+                resultado = importar_catalogo(
+                    archivo.file,
+                    archivo.name,
+                    sucursal=form.cleaned_data['sucursal'],
+                    simular=form.cleaned_data['simular'],
+                    crear_faltantes=form.cleaned_data['crear_faltantes'],
+                )
+            except ErrorImportacion as e:
+                messages.error(request, str(e))
+            else:
+                if resultado['simulacion']:
+                    messages.info(request, 'Validación terminada: no se guardó ningún cambio')
+                else:
+                    messages.success(
+                        request,
+                        f"Importación terminada: {resultado['creados']} productos nuevos, "
+                        f"{resultado['actualizados']} actualizados"
+                    )
+    else:
+        form = ImportarCatalogoForm(initial={'sucursal': request.user.sucursal})
+
+    return render(request, 'catalogos/productos/importar.html', {
+        'form': form,
+        'resultado': resultado,
+    })
+
+
 @login_required
 @puede_editar_precios
 def productos_editar(request, pk):
@@ -616,6 +684,7 @@ def productos_precios(request, pk):
 # =========== INVENTARIO ===========
 @login_required
 @admin_required
+@usa_base_reportes
 def inventario_lista(request):
     sucursal = request.user.sucursal
     if not sucursal:
@@ -637,18 +706,18 @@ def inventario_lista(request):
         )
     
     if estado == 'bajo':
-        productos_sucursal = productos_sucursal.filter(stock__lte=models.F('stock_minimo'))
+        productos_sucursal = productos_sucursal.filter(stock_bajo=True)
     elif estado == 'normal':
         productos_sucursal = productos_sucursal.filter(
-            stock__gt=models.F('stock_minimo'),
-            stock__lt=models.F('stock_maximo')
+            stock__gt=F('stock_minimo'),
+            stock__lt=F('stock_maximo')
         )
     elif estado == 'alto':
-        productos_sucursal = productos_sucursal.filter(stock__gte=models.F('stock_maximo'))
+        productos_sucursal = productos_sucursal.filter(stock__gte=F('stock_maximo'))
     
     # Estadísticas
     total_productos = productos_sucursal.count()
-    productos_bajo_stock = productos_sucursal.filter(stock__lte=models.F('stock_minimo')).count()
+    productos_bajo_stock = productos_sucursal.filter(stock_bajo=True).count()
     valor_inventario = sum(ps.producto.costo_promedio * ps.stock for ps in productos_sucursal)
     
     # Paginación
@@ -714,7 +783,7 @@ def inventario_ajuste(request):
             
             # Actualizar stock
             producto_sucursal.stock = nuevo_stock
-            producto_sucursal.save()
+            producto_sucursal.save(update_fields=['stock', 'ultima_actualizacion'])
             
             messages.success(request, 'Ajuste de inventario registrado exitosamente')
             return redirect('inventario_lista')
@@ -735,6 +804,7 @@ def inventario_ajuste(request):
 
 @login_required
 @admin_required
+@usa_base_reportes
 def inventario_movimientos(request):
     sucursal = request.user.sucursal
     if not sucursal:
@@ -752,11 +822,12 @@ def inventario_movimientos(request):
         'usuario'
     ).order_by('-fecha')
     
-    if fecha_inicio:
-        movimientos = movimientos.filter(fecha__date__gte=fecha_inicio)
+    desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
+    if desde:
+        movimientos = movimientos.filter(fecha__gte=desde)
     
-    if fecha_fin:
-        movimientos = movimientos.filter(fecha__date__lte=fecha_fin)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lt=hasta)
     
     if tipo:
         movimientos = movimientos.filter(tipo=tipo)
@@ -790,6 +861,38 @@ def inventario_movimientos(request):
 
 @login_required
 @admin_required
+@usa_base_reportes
+def inventario_alertas(request):
+    """Cruces del stock mínimo de la sucursal, más recientes primero (ver catalogos/alertas.py)"""
+    sucursal = request.user.sucursal
+    if not sucursal:
+        messages.error(request, "No tienes una sucursal asignada")
+        return redirect('dashboard')
+    
+    tipo = request.GET.get('tipo', '')
+    alertas_stock = AlertaStock.objects.filter(sucursal=sucursal).select_related(
+        'producto_sucursal__producto'
+    )
+    if tipo:
+        alertas_stock = alertas_stock.filter(tipo=tipo)
+    
+    # Paginación
+    paginator = Paginator(alertas_stock, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'alertas': page_obj,
+        'sucursal': sucursal,
+        'tipo': tipo,
+        'productos_bajo_stock': alertas.productos_bajo_stock(sucursal.id),
+    }
+    return render(request, 'catalogos/inventario/alertas.html', context)
+
+
+@login_required
+@admin_required
+@usa_base_reportes
+@clase_carga(REPORTE)
 def inventario_reporte(request):
     sucursal = request.user.sucursal
     if not sucursal:
@@ -799,7 +902,7 @@ def inventario_reporte(request):
     # Obtener productos con bajo stock
     productos_bajo_stock = ProductoSucursal.objects.filter(
         sucursal=sucursal,
-        stock__lte=models.F('stock_minimo'),
+        stock_bajo=True,
         activo=True
     ).select_related('producto').order_by('stock')
     
@@ -808,14 +911,15 @@ def inventario_reporte(request):
     from ventas.models import DetalleVenta
     from datetime import datetime, timedelta
     
-    fecha_inicio = datetime.now() - timedelta(days=30)
+    fecha_inicio = timezone.now() - timedelta(days=30)
     
     productos_vendidos = DetalleVenta.objects.filter(
         venta__sucursal=sucursal,
-        venta__fecha__gte=fecha_inicio
+        venta__fecha__gte=fecha_inicio,
+        **filtro_poda('fecha_creacion', fecha_inicio)
     ).values(
-        'producto__producto__codigo',
-        'producto__producto__nombre'
+        'producto_codigo',
+        'producto_nombre'
     ).annotate(
         total_vendido=Sum('cantidad')
     ).order_by('-total_vendido')[:10]
@@ -825,22 +929,72 @@ def inventario_reporte(request):
         sucursal=sucursal,
         activo=True
     ).aggregate(
-        total=models.Sum(models.F('stock') * models.F('producto__costo_promedio'))
+        total=Sum(F('stock') * F('producto__costo_promedio'))
     )['total'] or 0
     
+    # Demanda pronosticada (próximas 4 semanas, calculada cada noche)
+    hoy = timezone.localdate()
+    productos_pronostico = list(PronosticoDemanda.objects.filter(
+        producto_sucursal__sucursal=sucursal,
+        semana__gt=hoy - timedelta(days=7),
+        semana__lte=hoy + timedelta(days=21)
+    ).values(
+        'producto_sucursal__producto__codigo',
+        'producto_sucursal__producto__nombre',
+        'producto_sucursal__stock'
+    ).annotate(
+        total_pronosticado=Sum('cantidad')
+    ).order_by('-total_pronosticado')[:10])
+
+    for pronostico in productos_pronostico:
+        demanda_diaria = pronostico['total_pronosticado'] / 28
+        pronostico['dias_cobertura'] = (
+            int(pronostico['producto_sucursal__stock'] / demanda_diaria) if demanda_diaria > 0 else None
+        )
+
     context = {
         'sucursal': sucursal,
         'productos_bajo_stock': productos_bajo_stock,
         'productos_vendidos': productos_vendidos,
+        'productos_pronostico': productos_pronostico,
         'valor_inventario': valor_inventario,
         'total_productos': ProductoSucursal.objects.filter(sucursal=sucursal, activo=True).count(),
         'productos_sin_stock': ProductoSucursal.objects.filter(sucursal=sucursal, stock=0, activo=True).count(),
     }
     return render(request, 'catalogos/inventario/reporte.html', context)
 
+
+@login_required
+@admin_required
+@usa_base_reportes
+@clase_carga(REPORTE)
+def inventario_sugerencias(request):
+    """Listas de compra sugeridas por proveedor (calculadas cada noche)"""
+    from .reabastecimiento import sugerencias_por_proveedor
+
+    sucursal = request.user.sucursal
+    if not sucursal:
+        messages.error(request, "No tienes una sucursal asignada")
+        return redirect('dashboard')
+
+    listas = sugerencias_por_proveedor(sucursal)
+    ultimo_calculo = ProductoSucursal.objects.filter(
+        sucursal=sucursal
+    ).aggregate(fecha=Max('fecha_calculo_reorden'))['fecha']
+
+    context = {
+        'sucursal': sucursal,
+        'listas': listas,
+        'total_productos': sum(len(lista['productos']) for lista in listas),
+        'total_estimado': sum((lista['total_estimado'] for lista in listas), Decimal('0')),
+        'ultimo_calculo': ultimo_calculo,
+    }
+    return render(request, 'catalogos/inventario/sugerencias.html', context)
+
 # Clientes=============================================
 # =========== CLIENTES ===========
 @login_required
+@usa_base_reportes
 def clientes_lista(request):
     """Lista de clientes con filtros"""
     form = ClienteFilterForm(request.GET)
@@ -907,6 +1061,10 @@ def clientes_crear(request):
                 cliente.tipo_cliente = 'normal'
                 cliente.porcentaje_descuento = 0
             
+            # Código automático de la secuencia (no choca con otras altas simultáneas)
+            if not cliente.codigo:
+                cliente.codigo, = Cliente.reservar_codigos(1)
+            
             # Asignar sucursal de registro
             cliente.sucursal_registro = request.user.sucursal
             cliente.save()
@@ -914,12 +1072,7 @@ def clientes_crear(request):
             messages.success(request, 'Cliente creado exitosamente')
             return redirect('clientes_lista')
     else:
-        # Generar código automático
-        ultimo_cliente = Cliente.objects.order_by('-id').first()
-        ultimo_numero = int(ultimo_cliente.codigo[3:]) if ultimo_cliente and ultimo_cliente.codigo.startswith('CLI') else 0
-        nuevo_codigo = f"CLI{str(ultimo_numero + 1).zfill(6)}"
-        
-        form = ClienteForm(initial={'codigo': nuevo_codigo}, request=request)
+        form = ClienteForm(request=request)
     
     return render(request, 'catalogos/clientes/form.html', {
         'form': form,
@@ -929,6 +1082,105 @@ def clientes_crear(request):
     })
 
 
+@login_required
+@admin_required
+@clase_carga(EXPORTACION)
+def clientes_importar(request):
+    """Importación masiva de clientes con reporte de duplicados (CSV/XLSX)"""
+    from .importacion import MAX_ERRORES, ErrorImportacion
+    from .importacion_clientes import importar_clientes
+
+    resultado = None
+    reporte = None
+    if request.method == 'POST':
+        form = ImportarClientesForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            try:
+                resultado = importar_clientes(
+                    archivo.file,
+                    archivo.name,
+                    sucursal=request.user.sucursal,
+                    simular=form.cleaned_data['simular'],
+                    importar_similares=form.cleaned_data['importar_similares'],
+                )
+            except ErrorImportacion as e:
+                messages.error(request, str(e))
+            else:
+                if resultado['duplicados']:
+                    reporte = uuid.uuid4().hex
+                    cache.set(f'importacion_clientes:{reporte}', resultado['duplicados'], 60 * 60)
+                if resultado['simulacion']:
+                    messages.info(request, 'Revisión terminada: no se guardó ningún cliente')
+                else:
+                    messages.success(
+                        request,
+                        f"Importación terminada: {resultado['creados']} clientes nuevos, "
+                        f"{resultado['omitidos']} duplicados omitidos"
+                    )
+    else:
+        form = ImportarClientesForm()
+
+    return render(request, 'catalogos/clientes/importar.html', {
+        'form': form,
+        'resultado': resultado,
+        'duplicados': resultado['duplicados'][:MAX_ERRORES] if resultado else [],
+        'reporte': reporte,
+    })
+
+
+@login_required
+@admin_required
+def clientes_importar_reporte(request, clave):
+    """Descarga en CSV el reporte de duplicados de una importación (1 hora)"""
+    duplicados = cache.get(f'importacion_clientes:{clave}')
+    if duplicados is None:
+        messages.error(request, 'El reporte expiró, vuelve a revisar el archivo')
+        return redirect('clientes_importar')
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="duplicados_clientes.csv"'
+    response.write('\ufeff')  # BOM para que Excel respete los acentos
+    columnas = [
+        'fila', 'nombre', 'telefono', 'email', 'rfc', 'motivo', 'similitud',
+        'coincide_con', 'nombre_coincidencia', 'otras', 'importado',
+    ]
+    escritor = csv.DictWriter(response, fieldnames=columnas, extrasaction='ignore')
+    escritor.writeheader()
+    escritor.writerows(duplicados)
+    return response
+
+
+@login_required
+@admin_required
+@clase_carga(REPORTE)
+def clientes_niveles(request):
+    """Propuesta de niveles de cliente por RFM; con POST se aplica"""
+    from .segmentacion import RESPETAR_DIAS, aplicar_niveles, proponer_niveles
+
+    try:
+        dias = max(int(request.POST.get('dias') or request.GET.get('dias') or 365), 1)
+    except ValueError:
+        dias = 365
+
+    # Se recalcula al aplicar: la propuesta mostrada pudo cambiar
+    cambios = proponer_niveles(dias=dias)
+    if request.method == 'POST':
+        actualizados = aplicar_niveles(cambios, request.user)
+        messages.success(request, f'{actualizados} clientes cambiaron de nivel')
+        return redirect('clientes_lista')
+
+    ascensos = sum(1 for cambio in cambios if cambio['asciende'])
+    return render(request, 'catalogos/clientes/niveles.html', {
+        'cambios': cambios[:200],
+        'total': len(cambios),
+        'ascensos': ascensos,
+        'descensos': len(cambios) - ascensos,
+        'dias': dias,
+        'respetar_dias': RESPETAR_DIAS,
+    })
+
+
 @login_required
 def clientes_editar(request, pk):
     cliente = get_object_or_404(Cliente, pk=pk)
@@ -999,10 +1251,10 @@ def clientes_detalle(request, pk):
     # Obtener historial de descuentos
     historial_descuentos = HistorialDescuento.objects.filter(cliente=cliente).order_by('-fecha_cambio')
     
-    # Estadísticas
-    total_ventas = ventas.count()
+    # Estadísticas (incluyen ejercicios archivados)
+    total_ventas = cliente.total_compras
     monto_total = cliente.monto_total_compras
-    ultima_compra = ventas.first()
+    ultima_compra = cliente.get_ultima_compra()
     
     # Paginación de ventas
     paginator = Paginator(ventas, 10)
@@ -1031,6 +1283,9 @@ def clientes_historial(request, pk):
     from ventas.models import Venta
     ventas = Venta.objects.filter(cliente=cliente).order_by('-fecha')
     
+    # Incluir las ventas de ejercicios archivados
+    ventas = historial_cliente(cliente, ventas)
+    
     # Obtener historial de descuentos
     historial_descuentos = HistorialDescuento.objects.filter(cliente=cliente).order_by('-fecha_cambio')
     
@@ -1089,20 +1344,11 @@ def clientes_cambiar_descuento(request, pk):
         porcentaje = Decimal(porcentaje)
         
         # Validar rangos según tipo de cliente
-        if tipo_cliente == 'normal' and porcentaje != 0:
-            return JsonResponse({
-                'success': False,
-                'message': 'Los clientes normales no pueden tener descuento'
-            })
-        elif tipo_cliente == 'frecuente' and not (1 <= porcentaje <= 15):
-            return JsonResponse({
-                'success': False,
-                'message': 'El descuento para clientes frecuentes debe estar entre 1% y 15%'
-            })
-        elif tipo_cliente == 'premium' and not (16 <= porcentaje <= 50):
+        error = Cliente.error_descuento(tipo_cliente, porcentaje)
+        if error:
             return JsonResponse({
                 'success': False,
-                'message': 'El descuento para clientes premium debe estar entre 16% y 50%'
+                'message': error
             })
         
         # Guardar valores anteriores
@@ -0,0 +1,122 @@
+"""
+Métricas del dashboard por sucursal en el cache compartido: ventas y
+descuentos del día, productos bajo su stock mínimo (del contador de
+catalogos/alertas.py) y cortes abiertos.
+
+Cada sucursal tiene una versión en el cache que incrementan el cobro, las
+cancelaciones y los movimientos de stock (ventas/services.py,
+sucursales/services.py y dashboard/signals.py); la siguiente consulta
+recalcula. La vista sin sucursal (superadmin) suma todas y tiene su propia
+versión, que se incrementa junto con la de cualquier sucursal.
+
+El recálculo es de un solo vuelo: el primero que no encuentra la versión
+vigente toma un candado (cache.add) y calcula; los demás sirven el último
+valor del día si lo hay, o esperan el resultado antes de calcular por su
+cuenta. Como en catalogos/escaneo.py, con varios procesos el cache debe ser
+compartido.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from agrofeed_pv.particiones import rango_fechas
+from catalogos import alertas
+from ventas.models import CorteCaja, Venta
+
+VERSION_GLOBAL = 'metricas:version'
+VERSION_SUCURSAL = 'metricas:version:{}'
+TODAS = 'todas'
+
+# Red de seguridad para cambios que no pasan por los eventos
+TIEMPO_CACHE = 60 * 10
+TIEMPO_CANDADO = 30
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, time.time_ns())
+
+
+def invalidar(sucursal_id=None):
+    """Marca como viejas las métricas de la sucursal (o de todas) al confirmar la transacción"""
+    if sucursal_id is None:
+        claves = [VERSION_GLOBAL]
+    else:
+        claves = [VERSION_SUCURSAL.format(sucursal_id), VERSION_SUCURSAL.format(TODAS)]
+
+    def incrementar():
+        for clave in claves:
+            _incrementar(clave)
+    transaction.on_commit(incrementar)
+
+
+def _version(sucursal_id):
+    claves = (VERSION_GLOBAL, VERSION_SUCURSAL.format(sucursal_id or TODAS))
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            cache.add(clave, time.time_ns())
+            versiones[clave] = cache.get(clave)
+    return tuple(versiones[clave] for clave in claves)
+
+
+def calcular(sucursal_id, fecha):
+    """Métricas del día `fecha` (sucursal_id=None: todas las sucursales)"""
+    inicio, fin = rango_fechas(fecha, fecha)
+    ventas = Venta.objects.filter(fecha__gte=inicio, fecha__lt=fin, estado='completada')
+    cortes = CorteCaja.objects.filter(estado='abierto')
+    if sucursal_id is not None:
+        ventas = ventas.filter(sucursal_id=sucursal_id)
+        cortes = cortes.filter(sucursal_id=sucursal_id)
+
+    totales = ventas.aggregate(total=Sum('total'), ventas=Count('id'), descuentos=Sum('descuento_total'))
+    return {
+        'ventas_hoy': totales['ventas'],
+        'total_hoy': totales['total'] or 0,
+        'descuentos_hoy': totales['descuentos'] or 0,
+        'productos_bajo_stock': alertas.productos_bajo_stock(sucursal_id),
+        'cortes_abiertos': cortes.count(),
+    }
+
+
+def obtener(sucursal_id=None):
+    """Métricas de hoy de la sucursal (o de todas), del cache si siguen vigentes"""
+    fecha = timezone.localdate()
+    nombre = sucursal_id or TODAS
+    clave = f'metricas:{nombre}:{fecha}:' + ':'.join(str(v) for v in _version(sucursal_id))
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    ultimo = f'metricas:{nombre}:ultimo'
+    candado = f'{clave}:calculando'
+    if cache.add(candado, True, TIEMPO_CANDADO):
+        try:
+            datos = calcular(sucursal_id, fecha)
+            cache.set_many({clave: datos, ultimo: (fecha, datos)}, TIEMPO_CACHE)
+        finally:
+            cache.delete(candado)
+        return datos
+
+    # Otro ya está calculando: el último valor del día, aunque le falte el evento más reciente
+    anterior = cache.get(ultimo)
+    if anterior is not None and anterior[0] == fecha:
+        return anterior[1]
+
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        datos = cache.get(clave)
+        if datos is not None:
+            return datos
+        if cache.get(candado) is None:
+            # El que calculaba falló
+            break
+    return calcular(sucursal_id, fecha)
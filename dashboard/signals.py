@@ -0,0 +1,30 @@
+"""
+Invalidación de las métricas del dashboard (dashboard/metricas.py) con los
+cambios que pasan por save()/delete(). Los servicios que usan bulk_create o
+update() invalidan por su cuenta.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalogos.models import ProductoSucursal
+from ventas.models import CorteCaja, Venta
+from . import metricas
+
+# Campos de ProductoSucursal que cuentan para las métricas
+CAMPOS_METRICAS = {'stock', 'stock_minimo', 'activo'}
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+@receiver(post_save, sender=CorteCaja)
+@receiver(post_delete, sender=CorteCaja)
+def invalidar_por_sucursal(sender, instance, **kwargs):
+    metricas.invalidar(instance.sucursal_id)
+
+
+@receiver(post_save, sender=ProductoSucursal)
+@receiver(post_delete, sender=ProductoSucursal)
+def invalidar_por_stock(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & CAMPOS_METRICAS:
+        return
+    metricas.invalidar(instance.sucursal_id)
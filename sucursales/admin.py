@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import Sucursal
 
-# Register your models here.
+
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'ciudad', 'encargado', 'activa', 'permite_ventas')
+    list_filter = ('activa', 'permite_ventas', 'estado')
+    search_fields = ('codigo', 'nombre', 'ciudad')
+    list_per_page = 20
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
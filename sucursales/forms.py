@@ -8,7 +8,7 @@ class SucursalForm(forms.ModelForm):
             'codigo', 'nombre', 'direccion', 'telefono', 'email',
             'encargado', 'rfc', 'codigo_postal', 'ciudad', 'estado', 'pais',
             'horario_apertura', 'horario_cierre', 'dias_operacion',
-            'activa', 'permite_ventas', 'permite_compras'
+            'activa', 'permite_ventas', 'permite_compras', 'logo'
         ]
         widgets = {
             'codigo': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: SUC001'}),
@@ -28,6 +28,7 @@ class SucursalForm(forms.ModelForm):
             'activa': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'permite_ventas': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'permite_compras': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'logo': forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': 'image/*'}),
         }
         labels = {
             'codigo': 'Código de Sucursal',
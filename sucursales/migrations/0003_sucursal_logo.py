@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sucursales', '0002_alter_sucursal_options_sucursal_ciudad_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sucursal',
+            name='logo',
+            field=models.ImageField(blank=True, help_text='Se imprime en el encabezado de los tickets', null=True, upload_to='sucursales/'),
+        ),
+    ]
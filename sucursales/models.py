@@ -29,6 +29,12 @@ class Sucursal(models.Model):
     ciudad = models.CharField(max_length=100, blank=True)
     estado = models.CharField(max_length=100, blank=True)
     pais = models.CharField(max_length=100, default='México')
+    logo = models.ImageField(
+        upload_to='sucursales/',
+        null=True,
+        blank=True,
+        help_text="Se imprime en el encabezado de los tickets"
+    )
     
     # Metadatos
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -219,6 +225,10 @@ class TransferenciaInventario(models.Model):
     def total_cantidad(self):
         return sum(detalle.cantidad for detalle in self.detalles.all())
 
+    @property
+    def total(self):
+        return sum(detalle.subtotal for detalle in self.detalles.select_related('producto'))
+
 
 class DetalleTransferencia(models.Model):
     transferencia = models.ForeignKey(
@@ -249,4 +259,12 @@ class DetalleTransferencia(models.Model):
         unique_together = ('transferencia', 'producto')
     
     def __str__(self):
-        return f"{self.producto} - {self.cantidad}"
\ No newline at end of file
+        return f"{self.producto} - {self.cantidad}"
+    
+    @property
+    def costo_unitario(self):
+        return self.producto.costo_promedio
+    
+    @property
+    def subtotal(self):
+        return self.cantidad * self.costo_unitario
\ No newline at end of file
@@ -0,0 +1,280 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from decimal import Decimal
+from uuid import uuid4
+
+from .models import TransferenciaInventario, DetalleTransferencia
+from catalogos import escaneo
+from catalogos.models import ProductoSucursal, MovimientoInventario
+from ventas.services import actualizar_stock
+from dashboard import metricas
+
+
+class ErrorTransferencia(Exception):
+    """Error de validación en el ciclo de vida de una transferencia"""
+
+    def __init__(self, mensaje, conflictos=None):
+        super().__init__(mensaje)
+        self.conflictos = conflictos or []
+
+
+# =========== HELPERS ===========
+def _bloquear_transferencia(pk, estados):
+    """Bloquea la transferencia y valida que esté en uno de `estados`"""
+    transferencia = TransferenciaInventario.objects.select_for_update(of=('self',)).select_related(
+        'sucursal_origen', 'sucursal_destino'
+    ).get(pk=pk)
+
+    if transferencia.estado not in estados:
+        raise ErrorTransferencia(
+            f'La transferencia está {transferencia.get_estado_display().lower()}'
+        )
+    return transferencia
+
+
+def _bloquear_inventario(sucursal, producto_ids):
+    """
+    Bloquea los ProductoSucursal de `producto_ids` en la sucursal, en orden de
+    id para que dos transferencias simultáneas no se bloqueen mutuamente.
+    Regresa {producto_id: ProductoSucursal}.
+    """
+    productos = ProductoSucursal.objects.select_for_update(of=('self',)).filter(
+        sucursal=sucursal,
+        producto_id__in=producto_ids
+    ).select_related('producto').order_by('id')
+    return {ps.producto_id: ps for ps in productos}
+
+
+def _aplicar_movimientos(inventario, cantidades, signo, usuario, motivo, referencia):
+    """
+    Aplica `cantidades` {producto_id: cantidad} con un solo UPDATE y registra
+    los movimientos con un solo INSERT.
+    """
+    cambios = {}
+    movimientos = []
+    for producto_id, cantidad in cantidades.items():
+        ps = inventario[producto_id]
+        cambios[ps.id] = signo * cantidad
+        movimientos.append(MovimientoInventario(
+            producto_sucursal=ps,
+            tipo='transferencia',
+            cantidad=cantidad,
+            cantidad_anterior=ps.stock,
+            cantidad_nueva=ps.stock + signo * cantidad,
+            motivo=motivo,
+            usuario=usuario,
+            referencia=referencia,
+        ))
+
+    actualizar_stock(cambios)
+    MovimientoInventario.objects.bulk_create(movimientos)
+    for sucursal_id in {ps.sucursal_id for ps in inventario.values()}:
+        metricas.invalidar(sucursal_id)
+
+
+def _cantidades(transferencia, campo='cantidad'):
+    return dict(transferencia.detalles.values_list('producto_id', campo))
+
+
+# =========== CICLO DE VIDA ===========
+def crear_transferencia(sucursal_origen, sucursal_destino, usuario, items, motivo, observaciones=''):
+    """
+    Crea una transferencia pendiente.
+
+    `items` es una lista de {'producto': id de Producto, 'cantidad'}. El stock
+    sólo se valida aquí como aviso; se descuenta al procesar.
+    """
+    if sucursal_origen.pk == sucursal_destino.pk:
+        raise ErrorTransferencia('La sucursal destino debe ser distinta a la de origen')
+
+    cantidades = {}
+    conflictos = []
+    for item in items:
+        try:
+            producto_id = int(item['producto'])
+            cantidad = Decimal(str(item['cantidad']))
+            if not (0 < producto_id < 2 ** 63 and cantidad.is_finite()):
+                raise ValueError
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            conflictos.append({
+                'producto_id': item.get('producto') if isinstance(item, dict) else None,
+                'mensaje': 'Producto o cantidad inválidos'
+            })
+            continue
+        cantidades[producto_id] = cantidades.get(producto_id, Decimal('0')) + cantidad
+
+    if conflictos:
+        raise ErrorTransferencia(conflictos[0]['mensaje'], conflictos)
+    if not cantidades:
+        raise ErrorTransferencia('La transferencia no tiene productos')
+
+    disponibles = dict(ProductoSucursal.objects.filter(
+        sucursal=sucursal_origen,
+        producto_id__in=cantidades.keys(),
+        activo=True
+    ).values_list('producto_id', 'stock'))
+
+    for producto_id, cantidad in cantidades.items():
+        if cantidad <= 0:
+            conflictos.append({'producto_id': producto_id, 'mensaje': 'La cantidad debe ser mayor a 0'})
+        elif producto_id not in disponibles:
+            conflictos.append({'producto_id': producto_id, 'mensaje': 'Producto no disponible en la sucursal origen'})
+        elif cantidad > disponibles[producto_id]:
+            conflictos.append({
+                'producto_id': producto_id,
+                'mensaje': f'Stock insuficiente. Disponible: {disponibles[producto_id]}'
+            })
+
+    if conflictos:
+        raise ErrorTransferencia(conflictos[0]['mensaje'], conflictos)
+
+    with transaction.atomic():
+        transferencia = TransferenciaInventario.objects.create(
+            codigo=f'TMP-{uuid4().hex[:16]}',
+            sucursal_origen=sucursal_origen,
+            sucursal_destino=sucursal_destino,
+            motivo=motivo,
+            observaciones=observaciones,
+            usuario_solicita=usuario,
+        )
+        transferencia.codigo = f'TR-{transferencia.pk:06d}'
+        transferencia.save(update_fields=['codigo'])
+
+        DetalleTransferencia.objects.bulk_create([
+            DetalleTransferencia(
+                transferencia=transferencia,
+                producto_id=producto_id,
+                cantidad=cantidad
+            )
+            for producto_id, cantidad in cantidades.items()
+        ])
+
+    return transferencia
+
+
+def procesar_transferencia(pk, usuario):
+    """Envía la transferencia: descuenta el stock de la sucursal origen"""
+    with transaction.atomic():
+        transferencia = _bloquear_transferencia(pk, ['pendiente'])
+        cantidades = _cantidades(transferencia)
+        inventario = _bloquear_inventario(transferencia.sucursal_origen, cantidades.keys())
+
+        conflictos = []
+        for producto_id, cantidad in cantidades.items():
+            ps = inventario.get(producto_id)
+            if ps is None:
+                conflictos.append({'producto_id': producto_id, 'mensaje': 'Producto no disponible en la sucursal origen'})
+            elif cantidad > ps.stock:
+                conflictos.append({
+                    'producto_id': producto_id,
+                    'producto': ps.producto.nombre,
+                    'mensaje': f'Stock insuficiente de {ps.producto.nombre}. Disponible: {ps.stock}'
+                })
+        if conflictos:
+            raise ErrorTransferencia(conflictos[0]['mensaje'], conflictos)
+
+        _aplicar_movimientos(
+            inventario, cantidades, -1, usuario,
+            motivo=f'Transferencia #{transferencia.codigo} a {transferencia.sucursal_destino.nombre}',
+            referencia=transferencia.codigo
+        )
+        transferencia.detalles.update(cantidad_enviada=F('cantidad'))
+
+        ahora = timezone.now()
+        transferencia.estado = 'en_proceso'
+        transferencia.usuario_autoriza = usuario
+        transferencia.fecha_autorizacion = ahora
+        transferencia.fecha_envio = ahora
+        transferencia.save(update_fields=['estado', 'usuario_autoriza', 'fecha_autorizacion', 'fecha_envio'])
+
+    return transferencia
+
+
+def completar_transferencia(pk, usuario):
+    """
+    Recibe la transferencia: suma el stock enviado en la sucursal destino.
+    Los productos que no existían en el destino se dan de alta con el precio
+    de la sucursal origen.
+    """
+    with transaction.atomic():
+        transferencia = _bloquear_transferencia(pk, ['en_proceso'])
+        cantidades = _cantidades(transferencia, 'cantidad_enviada')
+        destino = transferencia.sucursal_destino
+
+        faltantes = set(cantidades) - set(
+            ProductoSucursal.objects.filter(
+                sucursal=destino,
+                producto_id__in=cantidades.keys()
+            ).values_list('producto_id', flat=True)
+        )
+        if faltantes:
+            origen = ProductoSucursal.objects.filter(
+                sucursal=transferencia.sucursal_origen,
+                producto_id__in=faltantes
+            ).values_list('producto_id', 'precio_venta', 'stock_minimo', 'stock_maximo')
+            ProductoSucursal.objects.bulk_create([
+                ProductoSucursal(
+                    producto_id=producto_id,
+                    sucursal=destino,
+                    precio_venta=precio_venta,
+                    stock_minimo=stock_minimo,
+                    stock_maximo=stock_maximo,
+                )
+                for producto_id, precio_venta, stock_minimo, stock_maximo in origen
+            ], ignore_conflicts=True)
+            # bulk_create no manda señales
+            escaneo.invalidar(destino.id)
+
+        inventario = _bloquear_inventario(destino, cantidades.keys())
+        # Sin ProductoSucursal en el origen (se borró después del envío) no hay de dónde copiar el alta
+        conflictos = [
+            {'producto_id': producto_id, 'mensaje': 'Producto no disponible en la sucursal origen ni en la destino'}
+            for producto_id in cantidades if producto_id not in inventario
+        ]
+        if conflictos:
+            raise ErrorTransferencia(conflictos[0]['mensaje'], conflictos)
+
+        _aplicar_movimientos(
+            inventario, cantidades, 1, usuario,
+            motivo=f'Transferencia #{transferencia.codigo} desde {transferencia.sucursal_origen.nombre}',
+            referencia=transferencia.codigo
+        )
+        transferencia.detalles.update(cantidad_recibida=F('cantidad_enviada'))
+
+        ahora = timezone.now()
+        transferencia.estado = 'completada'
+        transferencia.usuario_recibe = usuario
+        transferencia.fecha_recepcion = ahora
+        transferencia.fecha_completada = ahora
+        transferencia.save(update_fields=['estado', 'usuario_recibe', 'fecha_recepcion', 'fecha_completada'])
+
+    return transferencia
+
+
+def cancelar_transferencia(pk, usuario, motivo=''):
+    """
+    Cancela la transferencia. Si ya se había enviado, el stock regresa a la
+    sucursal origen.
+    """
+    with transaction.atomic():
+        transferencia = _bloquear_transferencia(pk, ['pendiente', 'en_proceso'])
+
+        if transferencia.estado == 'en_proceso':
+            cantidades = _cantidades(transferencia, 'cantidad_enviada')
+            inventario = _bloquear_inventario(transferencia.sucursal_origen, cantidades.keys())
+            _aplicar_movimientos(
+                inventario, cantidades, 1, usuario,
+                motivo=f'Cancelación de transferencia #{transferencia.codigo}',
+                referencia=transferencia.codigo
+            )
+
+        transferencia.estado = 'cancelada'
+        if motivo:
+            nota = f'Cancelada: {motivo}'
+            transferencia.observaciones = (
+                f'{transferencia.observaciones}\n{nota}' if transferencia.observaciones else nota
+            )
+        transferencia.save(update_fields=['estado', 'observaciones'])
+
+    return transferencia
@@ -1,3 +1,70 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from catalogos import escaneo
+from catalogos.models import Producto, ProductoSucursal
+from usuarios.models import Usuario
+from .models import Sucursal
+from .services import ErrorTransferencia, completar_transferencia, crear_transferencia, procesar_transferencia
+
+
+# =========== TRANSFERENCIAS ===========
+class DatosTransferencia:
+    """Dos sucursales, un superadmin y un producto con stock 10 sólo en la de origen"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.origen = Sucursal.objects.create(codigo='S1', nombre='Centro', direccion='Centro')
+        cls.destino = Sucursal.objects.create(codigo='S2', nombre='Norte', direccion='Norte')
+        cls.admin = Usuario.objects.create_user('admin', 'admin@x.com', 'x', rol='superadmin')
+        cls.producto = Producto.objects.create(codigo='P0', nombre='Producto 0')
+        cls.en_origen = ProductoSucursal.objects.create(
+            producto=cls.producto, sucursal=cls.origen, precio_venta=Decimal('20.00'), stock=Decimal('10')
+        )
+
+
+class CrearTransferenciaTests(DatosTransferencia, TestCase):
+    def test_producto_o_cantidad_invalidos_son_error_de_transferencia(self):
+        for item in (
+            {'producto': 'abc', 'cantidad': 1},
+            {'producto': self.producto.id, 'cantidad': 'muchos'},
+            {'producto': self.producto.id, 'cantidad': 'NaN'},
+            {'producto': self.producto.id, 'cantidad': float('inf')},
+            {'cantidad': 1},
+        ):
+            with self.subTest(item=item), self.assertRaises(ErrorTransferencia) as error:
+                crear_transferencia(self.origen, self.destino, self.admin, [item], 'Surtido')
+            self.assertEqual(error.exception.conflictos[0]['mensaje'], 'Producto o cantidad inválidos')
+
+
+class CompletarTransferenciaTests(DatosTransferencia, TestCase):
+    def enviar(self, cantidad=3):
+        transferencia = crear_transferencia(
+            self.origen, self.destino, self.admin, [{'producto': self.producto.id, 'cantidad': cantidad}], 'Surtido'
+        )
+        return procesar_transferencia(transferencia.pk, self.admin)
+
+    def test_da_de_alta_el_producto_y_lo_agrega_al_indice_del_destino(self):
+        transferencia = self.enviar()
+        self.assertIsNone(escaneo.buscar(self.destino.id, 'P0'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            completar_transferencia(transferencia.pk, self.admin)
+
+        en_destino = ProductoSucursal.objects.get(sucursal=self.destino, producto=self.producto)
+        self.assertEqual(en_destino.stock, Decimal('3'))
+        self.assertEqual(en_destino.precio_venta, Decimal('20.00'))
+        self.assertEqual(escaneo.buscar(self.destino.id, 'P0').id, en_destino.id)
+
+    def test_sin_producto_en_origen_ni_destino_es_error_de_transferencia(self):
+        transferencia = self.enviar()
+        ProductoSucursal.objects.filter(pk=self.en_origen.pk).delete()
+
+        with self.assertRaises(ErrorTransferencia) as error:
+            completar_transferencia(transferencia.pk, self.admin)
+
+        self.assertEqual(error.exception.conflictos[0]['producto_id'], self.producto.id)
+        transferencia.refresh_from_db()
+        self.assertEqual(transferencia.estado, 'en_proceso')
+        self.assertFalse(ProductoSucursal.objects.filter(sucursal=self.destino).exists())
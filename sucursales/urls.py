@@ -16,7 +16,11 @@ urlpatterns = [
     # =========== TRANSFERENCIAS ===========
     path('transferencias/', views.sucursales_transferencias_lista, name='sucursales_transferencias_lista'),
     path('transferencias/crear/', views.sucursales_transferencias_crear, name='sucursales_transferencias_crear'),
+    path('transferencias/productos/', views.sucursales_transferencias_productos, name='sucursales_transferencias_productos'),
     path('transferencias/<int:pk>/', views.sucursales_transferencias_detalle, name='sucursales_transferencias_detalle'),
+    path('transferencias/<int:pk>/procesar/', views.sucursales_transferencias_procesar, name='sucursales_transferencias_procesar'),
+    path('transferencias/<int:pk>/completar/', views.sucursales_transferencias_completar, name='sucursales_transferencias_completar'),
+    path('transferencias/<int:pk>/cancelar/', views.sucursales_transferencias_cancelar, name='sucursales_transferencias_cancelar'),
     
     # =========== API ===========
     path('api/estadisticas/', views.sucursales_estadisticas_api, name='sucursales_estadisticas_api'),
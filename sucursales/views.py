@@ -6,13 +6,21 @@ from django.db import transaction
 from django.db.models import Q, Count, Sum
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 
-from catalogos import models
 from .models import Sucursal, ConfiguracionSucursal, TransferenciaInventario, DetalleTransferencia
 from usuarios.decorators import puede_gestionar_sucursales, puede_transferir_productos, superadmin_required
+from agrofeed_pv.routers import usa_base_reportes
+from agrofeed_pv.cargas import clase_carga, REPORTE
 from .forms import SucursalForm, ConfiguracionSucursalForm, TransferenciaForm
+from .services import (
+    ErrorTransferencia, crear_transferencia, procesar_transferencia,
+    completar_transferencia, cancelar_transferencia
+)
 from catalogos.models import ProductoSucursal
-from ventas.models import Venta, CorteCaja
+from catalogos import alertas
+from catalogos.categorias import ventas_por_categoria
+from ventas.models import Venta, DetalleVenta, CorteCaja
 from usuarios.models import Usuario
 import json
 from datetime import datetime, timedelta
@@ -20,6 +28,7 @@ from datetime import datetime, timedelta
 # =========== LISTA DE SUCURSALES ===========
 @login_required
 @puede_gestionar_sucursales
+@usa_base_reportes
 def sucursales_lista(request):
     query = request.GET.get('q', '')
     estado = request.GET.get('estado', 'todas')
@@ -88,7 +97,7 @@ def sucursales_lista(request):
 @puede_gestionar_sucursales
 def sucursales_crear(request):
     if request.method == 'POST':
-        form = SucursalForm(request.POST)
+        form = SucursalForm(request.POST, request.FILES)
         if form.is_valid():
             try:
                 with transaction.atomic():
@@ -121,7 +130,7 @@ def sucursales_editar(request, pk):
     sucursal = get_object_or_404(Sucursal, pk=pk)
     
     if request.method == 'POST':
-        form = SucursalForm(request.POST, instance=sucursal)
+        form = SucursalForm(request.POST, request.FILES, instance=sucursal)
         if form.is_valid():
             sucursal = form.save()
             messages.success(request, 'Sucursal actualizada exitosamente')
@@ -205,7 +214,7 @@ def sucursales_detalle(request, pk):
     
     # Productos con bajo stock
     productos_bajo_stock = productos_sucursal.filter(
-        stock__lte=models.F('stock_minimo')
+        stock_bajo=True
     ).select_related('producto')[:10]
     
     context = {
@@ -270,6 +279,7 @@ def sucursales_configuracion(request, pk):
 # =========== TRANSFERENCIAS ===========
 @login_required
 @puede_transferir_productos
+@usa_base_reportes
 def sucursales_transferencias_lista(request):
     estado = request.GET.get('estado', 'todas')
     sucursal_id = request.GET.get('sucursal', '')
@@ -315,26 +325,85 @@ def sucursales_transferencias_lista(request):
 @login_required
 @superadmin_required
 def sucursales_transferencias_crear(request):
+    sucursal_actual = request.user.sucursal
+    if not sucursal_actual:
+        messages.error(request, 'No tienes una sucursal asignada')
+        return redirect('sucursales_transferencias_lista')
+
     if request.method == 'POST':
         form = TransferenciaForm(request.POST)
         if form.is_valid():
-            # Lógica para crear transferencia
-            pass
-    
-    sucursal_actual = request.user.sucursal
-    form = TransferenciaForm()
-    
+            items = []
+            for key, valor in request.POST.items():
+                if key.startswith('productos['):
+                    try:
+                        producto = json.loads(valor)
+                        items.append({'producto': producto['id'], 'cantidad': producto['cantidad']})
+                    except (ValueError, KeyError, TypeError):
+                        messages.error(request, 'Datos de productos inválidos')
+                        break
+            else:
+                try:
+                    transferencia = crear_transferencia(
+                        sucursal_actual,
+                        form.cleaned_data['sucursal_destino'],
+                        request.user,
+                        items,
+                        motivo=form.cleaned_data['motivo'],
+                        observaciones=form.cleaned_data['observaciones']
+                    )
+                    messages.success(request, f'Transferencia {transferencia.codigo} creada exitosamente')
+                    return redirect('sucursales_transferencias_detalle', pk=transferencia.pk)
+                except ErrorTransferencia as e:
+                    messages.error(request, str(e))
+    else:
+        form = TransferenciaForm()
+
     return render(request, 'sucursales/transferencias/crear.html', {
         'form': form,
         'sucursal_actual': sucursal_actual,
     })
 
 
+@login_required
+@superadmin_required
+def sucursales_transferencias_productos(request):
+    """Búsqueda AJAX de productos con stock en la sucursal origen"""
+    query = request.GET.get('q', '').strip()
+    sucursal = request.user.sucursal
+    if not sucursal or len(query) < 2:
+        return JsonResponse({'productos': []})
+
+    productos = ProductoSucursal.objects.filter(
+        sucursal=sucursal,
+        activo=True,
+        producto__activo=True,
+        stock__gt=0
+    ).filter(
+        Q(producto__codigo__icontains=query) |
+        Q(producto__nombre__icontains=query) |
+        Q(producto__categoria__nombre__icontains=query)
+    ).select_related('producto')[:20]
+
+    return JsonResponse({'productos': [{
+        'id': ps.producto_id,
+        'codigo': ps.producto.codigo,
+        'nombre': ps.producto.nombre,
+        'stock_disponible': float(ps.stock),
+        'precio_unitario': float(ps.producto.costo_promedio),
+    } for ps in productos]})
+
+
 @login_required
 @superadmin_required
 def sucursales_transferencias_detalle(request, pk):
-    transferencia = get_object_or_404(TransferenciaInventario, pk=pk)
-    detalles = transferencia.detalles.all().select_related('producto')
+    transferencia = get_object_or_404(
+        TransferenciaInventario.objects.select_related(
+            'sucursal_origen', 'sucursal_destino', 'usuario_solicita'
+        ),
+        pk=pk
+    )
+    detalles = transferencia.detalles.all().select_related('producto', 'producto__categoria')
     
     return render(request, 'sucursales/transferencias/detalle.html', {
         'transferencia': transferencia,
@@ -342,9 +411,73 @@ def sucursales_transferencias_detalle(request, pk):
     })
 
 
+@login_required
+@puede_transferir_productos
+@require_POST
+def sucursales_transferencias_procesar(request, pk):
+    get_object_or_404(TransferenciaInventario, pk=pk)
+    try:
+        transferencia = procesar_transferencia(pk, request.user)
+    except ErrorTransferencia as e:
+        return JsonResponse({'success': False, 'message': str(e), 'conflictos': e.conflictos})
+
+    return JsonResponse({
+        'success': True,
+        'message': f'Transferencia {transferencia.codigo} enviada',
+        'estado': transferencia.estado,
+    })
+
+
+@login_required
+@require_POST
+def sucursales_transferencias_completar(request, pk):
+    transferencia = get_object_or_404(TransferenciaInventario, pk=pk)
+
+    # Recibe el superadmin o un administrador de la sucursal destino
+    if not (request.user.es_superadmin or (
+        request.user.es_admin and request.user.sucursal_id == transferencia.sucursal_destino_id
+    )):
+        return JsonResponse({'success': False, 'message': 'No tienes permiso para recibir esta transferencia'}, status=403)
+
+    try:
+        transferencia = completar_transferencia(pk, request.user)
+    except ErrorTransferencia as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({
+        'success': True,
+        'message': f'Transferencia {transferencia.codigo} recibida',
+        'estado': transferencia.estado,
+    })
+
+
+@login_required
+@puede_transferir_productos
+@require_POST
+def sucursales_transferencias_cancelar(request, pk):
+    get_object_or_404(TransferenciaInventario, pk=pk)
+    try:
+        data = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        data = {}
+
+    try:
+        transferencia = cancelar_transferencia(pk, request.user, motivo=data.get('motivo', ''))
+    except ErrorTransferencia as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+    return JsonResponse({
+        'success': True,
+        'message': f'Transferencia {transferencia.codigo} cancelada',
+        'estado': transferencia.estado,
+    })
+
+
 # =========== REPORTES SUCURSAL ===========
 @login_required
 @superadmin_required
+@usa_base_reportes
+@clase_carga(REPORTE)
 def sucursales_reportes(request, pk):
     sucursal = get_object_or_404(Sucursal, pk=pk)
     
@@ -365,6 +498,11 @@ def sucursales_reportes(request, pk):
         count=Count('id')
     ).order_by('-fecha__date')[:30]
     
+    # Ventas acumuladas por rama del árbol de categorías
+    ventas_categorias = ventas_por_categoria(
+        DetalleVenta.objects.filter(venta__in=ventas.filter(estado='completada'))
+    )
+    
     # Inventario
     productos_sucursal = ProductoSucursal.objects.filter(
         sucursal=sucursal
@@ -374,9 +512,7 @@ def sucursales_reportes(request, pk):
         ps.stock * ps.producto.costo_promedio 
         for ps in productos_sucursal
     )
-    productos_bajo_stock = productos_sucursal.filter(
-        stock__lte=models.F('stock_minimo')
-    ).count()
+    productos_bajo_stock = alertas.productos_bajo_stock(sucursal.id)
     
     # Usuarios
     usuarios = Usuario.objects.filter(sucursal=sucursal)
@@ -389,6 +525,7 @@ def sucursales_reportes(request, pk):
         'total_ventas': total_ventas,
         'ventas_count': ventas.count(),
         'ventas_diarias': ventas_diarias,
+        'ventas_por_categoria': ventas_categorias,
         'valor_inventario': valor_inventario,
         'productos_count': productos_sucursal.count(),
         'productos_bajo_stock': productos_bajo_stock,
@@ -402,6 +539,7 @@ def sucursales_reportes(request, pk):
 @login_required
 def sucursales_estadisticas_api(request):
     sucursales = Sucursal.objects.filter(activa=True)
+    bajo_stock = alertas.contadores()
     
     data = []
     for sucursal in sucursales:
@@ -417,19 +555,13 @@ def sucursales_estadisticas_api(request):
             fecha_fin__isnull=True
         ).exists()
         
-        # Productos con bajo stock
-        productos_bajo_stock = ProductoSucursal.objects.filter(
-            sucursal=sucursal,
-            stock__lte=models.F('stock_minimo')
-        ).count()
-        
         data.append({
             'id': sucursal.id,
             'nombre': sucursal.nombre,
             'codigo': sucursal.codigo,
             'ventas_hoy': ventas_hoy,
             'caja_abierta': caja_abierta,
-            'productos_bajo_stock': productos_bajo_stock,
+            'productos_bajo_stock': bajo_stock.get(sucursal.id, 0),
             'estado_operativo': sucursal.estado_operativo,
         })
     
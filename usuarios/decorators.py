@@ -1,4 +1,5 @@
 # usuarios/decorators.py (ACTUALIZAR con esta versión)
+from asgiref.sync import iscoroutinefunction
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from functools import wraps
@@ -28,6 +29,20 @@ def admin_required(view_func):
     return _wrapped_view
 
 def cajero_required(view_func):
+    if iscoroutinefunction(view_func):
+        # Vistas async (autocompletado de caja): el usuario se carga con auser()
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return redirect('login')
+            if not getattr(user, 'es_cajero', False):
+                from django.contrib import messages
+                messages.error(request, 'No tienes permisos de cajero')
+                return redirect('dashboard')
+            return await view_func(request, *args, **kwargs)
+        return _wrapped_async_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         if not request.user.is_authenticated:
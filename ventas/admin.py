@@ -1,3 +1,51 @@
 from django.contrib import admin
+from agrofeed_pv.admin_utils import AdminVolumen
+from .models import Venta, DetalleVenta, CorteCaja, ResumenCorte
 
-# Register your models here.
+
+class DetalleVentaInline(admin.TabularInline):
+    model = DetalleVenta
+    extra = 0
+    fields = ('producto', 'cantidad', 'precio_unitario', 'precio_final', 'descuento_unitario', 'subtotal', 'tiene_iva')
+    readonly_fields = ('subtotal',)
+    autocomplete_fields = ('producto',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto__producto', 'producto__sucursal')
+
+
+@admin.register(Venta)
+class VentaAdmin(AdminVolumen):
+    list_display = ('folio', 'fecha', 'sucursal', 'cliente', 'usuario', 'forma_pago', 'total', 'estado')
+    list_filter = ('estado', 'forma_pago', 'sucursal')
+    list_select_related = ('sucursal', 'cliente', 'usuario')
+    search_fields = ('folio', 'uuid_offline')
+    autocomplete_fields = ('sucursal', 'cliente', 'usuario', 'corte', 'creado_por', 'actualizado_por')
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha', 'fecha_actualizacion')
+    inlines = [DetalleVentaInline]
+
+
+class ResumenCorteInline(admin.StackedInline):
+    model = ResumenCorte
+    can_delete = False
+    readonly_fields = (
+        'ventas_completadas', 'ventas_canceladas', 'total_ventas', 'total_descuentos',
+        'por_forma_pago', 'por_hora', 'productos_top', 'fecha_generacion',
+    )
+
+    def has_add_permission(self, request, obj=None):
+        # Sólo lo genera cerrar_corte
+        return False
+
+
+@admin.register(CorteCaja)
+class CorteCajaAdmin(AdminVolumen):
+    list_display = ('folio', 'sucursal', 'usuario', 'fecha_inicio', 'fecha_fin', 'total_ventas', 'diferencia', 'estado')
+    list_filter = ('estado', 'sucursal')
+    list_select_related = ('sucursal', 'usuario')
+    search_fields = ('folio',)
+    autocomplete_fields = ('sucursal', 'usuario', 'cerrado_por', 'verificado_por')
+    date_hierarchy = 'fecha_inicio'
+    readonly_fields = ('fecha_cierre',)
+    inlines = [ResumenCorteInline]
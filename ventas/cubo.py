@@ -0,0 +1,207 @@
+"""
+Cubo de ventas por sucursal, día y hora (VentaHora) para el mapa de calor
+día de la semana × hora y la planeación de cajeros.
+
+- `acumular` suma (o resta, al cancelar) un lote de ventas dentro de la
+  transacción del cobro: un INSERT que ignora las celdas existentes y un
+  UPDATE con F() por celda. Un lote normal cae en una sola celda.
+- `recalcular` reconstruye el cubo desde las ventas por meses, en varios
+  hilos (cada uno con su conexión). Los ejercicios archivados se omiten: sus
+  ventas ya no están en Venta y sus celdas se conservan.
+- `mapa_calor` lee un rango de fechas con una sola consulta agrupada.
+
+La hora es la local de la captura (fecha_captura de las ventas offline,
+si no la de registro).
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.utils import timezone
+
+from agrofeed_pv.particiones import filtro_poda, inicio_mes, rango_fechas, sumar_meses
+from .models import DetalleVenta, Venta, VentaHora
+
+# Ventas por hora que atiende un cajero (valor por omisión del mapa de calor)
+VENTAS_POR_CAJERO = 20
+
+
+# =========== MANTENIMIENTO INCREMENTAL ===========
+def _celda(venta):
+    momento = timezone.localtime(venta.fecha_captura or venta.fecha)
+    return venta.sucursal_id, momento.date(), momento.hour
+
+
+def acumular(ventas, articulos, signo=1):
+    """
+    Suma las ventas al cubo (signo=-1 para restarlas). `articulos` es
+    {venta_id: renglones de detalle}. Debe llamarse dentro de la
+    transacción que registra o cancela las ventas.
+    """
+    celdas = {}
+    for venta in ventas:
+        celda = celdas.setdefault(_celda(venta), [0, Decimal('0'), 0])
+        celda[0] += signo
+        celda[1] += signo * venta.total
+        celda[2] += signo * articulos.get(venta.id, 0)
+    if not celdas:
+        return
+
+    VentaHora.objects.bulk_create([
+        VentaHora(sucursal_id=sucursal_id, fecha=fecha, hora=hora, dia_semana=fecha.weekday())
+        for sucursal_id, fecha, hora in celdas
+    ], ignore_conflicts=True)
+    # En orden, para que dos cobros concurrentes bloqueen las celdas igual
+    for (sucursal_id, fecha, hora), (n, total, renglones) in sorted(celdas.items()):
+        VentaHora.objects.filter(sucursal_id=sucursal_id, fecha=fecha, hora=hora).update(
+            ventas=F('ventas') + n,
+            total=F('total') + total,
+            articulos=F('articulos') + renglones,
+        )
+
+
+# =========== RECÁLCULO ===========
+def _recalcular_mes(mes, desde, hasta, sucursal_id):
+    """Reconstruye las celdas del mes (recortado a [desde, hasta]); regresa cuántas guardó"""
+    inicio = max(mes, desde)
+    fin = min(sumar_meses(mes, 1) - timedelta(days=1), hasta)
+    momento_inicio, momento_fin = rango_fechas(inicio, fin)
+
+    # Una venta se sincroniza después de capturarse: fecha >= momento
+    ventas = Venta.objects.filter(estado='completada', fecha__gte=momento_inicio).annotate(
+        momento=Coalesce('fecha_captura', 'fecha')
+    ).filter(momento__gte=momento_inicio, momento__lt=momento_fin)
+    detalles = DetalleVenta.objects.filter(
+        venta__estado='completada',
+        venta__fecha__gte=momento_inicio,
+        **filtro_poda('fecha_creacion', momento_inicio)
+    ).annotate(
+        momento=Coalesce('venta__fecha_captura', 'venta__fecha')
+    ).filter(momento__gte=momento_inicio, momento__lt=momento_fin)
+    celdas = VentaHora.objects.filter(fecha__gte=inicio, fecha__lte=fin)
+    if sucursal_id:
+        ventas = ventas.filter(sucursal_id=sucursal_id)
+        detalles = detalles.filter(venta__sucursal_id=sucursal_id)
+        celdas = celdas.filter(sucursal_id=sucursal_id)
+
+    try:
+        filas = ventas.values(
+            'sucursal_id', dia=TruncDate('momento'), h=ExtractHour('momento')
+        ).annotate(n=Count('id'), suma=Sum('total')).order_by()
+        renglones = {
+            (fila['venta__sucursal_id'], fila['dia'], fila['h']): fila['n']
+            for fila in detalles.values(
+                'venta__sucursal_id', dia=TruncDate('momento'), h=ExtractHour('momento')
+            ).annotate(n=Count('id')).order_by()
+        }
+        nuevas = [
+            VentaHora(
+                sucursal_id=fila['sucursal_id'],
+                fecha=fila['dia'],
+                hora=fila['h'],
+                dia_semana=fila['dia'].weekday(),
+                ventas=fila['n'],
+                total=fila['suma'] or 0,
+                articulos=renglones.get((fila['sucursal_id'], fila['dia'], fila['h']), 0),
+            )
+            for fila in filas
+        ]
+        # Las lecturas quedan fuera: la transacción sólo reemplaza las celdas
+        with transaction.atomic():
+            celdas.delete()
+            VentaHora.objects.bulk_create(nuevas, batch_size=2000)
+        return len(nuevas)
+    finally:
+        # Cada hilo abre su propia conexión
+        connection.close()
+
+
+def recalcular(desde, hasta, sucursal=None, hilos=4):
+    """
+    Reconstruye el cubo para las fechas [desde, hasta] en bloques mensuales
+    paralelos. Regresa el número de celdas guardadas.
+
+    Un cobro que se registre en un mes mientras éste se recalcula puede
+    quedar fuera; conviene recalcular el día en curso fuera de horario.
+    """
+    from archivo.consultas import anios_archivados
+
+    archivados = anios_archivados()
+    meses = []
+    mes = inicio_mes(desde)
+    while mes <= hasta:
+        if mes.year not in archivados:
+            meses.append(mes)
+        mes = sumar_meses(mes, 1)
+
+    sucursal_id = sucursal.pk if sucursal else None
+    with ThreadPoolExecutor(max_workers=max(hilos, 1)) as ejecutor:
+        guardadas = ejecutor.map(lambda m: _recalcular_mes(m, desde, hasta, sucursal_id), meses)
+        return sum(guardadas)
+
+
+# =========== MAPA DE CALOR ===========
+def mapa_calor(sucursal, desde, hasta, ventas_por_cajero=VENTAS_POR_CAJERO):
+    """
+    Ventas por día de la semana y hora entre `desde` y `hasta` (dates):
+    conteo, total, ticket promedio, artículos por venta, ventas promedio por
+    día y cajeros sugeridos. Una consulta sobre el cubo.
+    """
+    filas = VentaHora.objects.filter(
+        sucursal=sucursal, fecha__gte=desde, fecha__lte=hasta
+    ).values('dia_semana', 'hora').annotate(
+        n=Sum('ventas'), suma=Sum('total'), renglones=Sum('articulos')
+    ).order_by()
+
+    # Cuántas veces aparece cada día de la semana en el rango
+    dias = (hasta - desde).days + 1
+    apariciones = [
+        dias // 7 + (1 if (dia - desde.weekday()) % 7 < dias % 7 else 0)
+        for dia in range(7)
+    ]
+
+    celdas = {}
+    for fila in filas:
+        if fila['n'] <= 0:
+            continue
+        promedio = fila['n'] / apariciones[fila['dia_semana']]
+        celdas[fila['dia_semana'], fila['hora']] = {
+            'ventas': fila['n'],
+            'total': fila['suma'],
+            'ticket_promedio': fila['suma'] / fila['n'],
+            'articulos_por_venta': fila['renglones'] / fila['n'],
+            'ventas_por_dia': promedio,
+            'cajeros': math.ceil(promedio / ventas_por_cajero),
+        }
+
+    maximo = max((celda['ventas_por_dia'] for celda in celdas.values()), default=0)
+    horas = sorted({hora for _, hora in celdas})
+    if horas:
+        horas = list(range(horas[0], horas[-1] + 1))
+    for celda in celdas.values():
+        celda['intensidad'] = celda['ventas_por_dia'] / maximo
+
+    total_ventas = sum(celda['ventas'] for celda in celdas.values())
+    total = sum((celda['total'] for celda in celdas.values()), Decimal('0'))
+    return {
+        'horas': horas,
+        'dias': [
+            {
+                'nombre': nombre,
+                'celdas': [celdas.get((dia, hora)) for hora in horas],
+            }
+            for dia, nombre in enumerate(VentaHora.DIAS_SEMANA)
+        ],
+        'total_ventas': total_ventas,
+        'total': total,
+        'ticket_promedio': total / total_ventas if total_ventas else Decimal('0'),
+        'articulos_por_venta': (
+            sum(fila['renglones'] for fila in filas if fila['n'] > 0) / total_ventas
+            if total_ventas else 0
+        ),
+        'max_cajeros': max((celda['cajeros'] for celda in celdas.values()), default=0),
+    }
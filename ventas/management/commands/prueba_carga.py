@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.prueba_carga import ejecutar
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula N cajeros cobrando al mismo tiempo contra un servidor en marcha '
+        '(sucursal sintética CARGA) y reporta latencias, ventas por segundo, '
+        'deadlocks, fallas de serialización y sobreventa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Servidor bajo prueba (default: http://127.0.0.1:8000)')
+        parser.add_argument('--cajeros', type=int, default=4,
+                            help='Cajeros simultáneos (default: 4)')
+        parser.add_argument('--duracion', type=int, default=60,
+                            help='Segundos de venta por cajero (default: 60)')
+        parser.add_argument('--productos', type=int, default=500,
+                            help='Productos de la sucursal de carga (default: 500)')
+        parser.add_argument('--stock', type=int, default=1000,
+                            help='Stock inicial de cada producto (default: 1000)')
+        parser.add_argument('--clientes', type=int, default=200,
+                            help='Clientes sintéticos (default: 200)')
+        parser.add_argument('--sesgo', type=float, default=1.1,
+                            help='Exponente Zipf de la elección de productos; 0 = uniforme (default: 1.1)')
+        parser.add_argument('--articulos', type=int, default=5,
+                            help='Máximo de renglones por venta (default: 5)')
+        parser.add_argument('--cantidad', type=int, default=3,
+                            help='Máximo de piezas por renglón (default: 3)')
+        parser.add_argument('--con-cliente', type=float, default=0.3,
+                            help='Proporción de ventas con cliente (default: 0.3)')
+        parser.add_argument('--pausa', type=float, default=0.0,
+                            help='Pausa máxima en segundos entre ventas de un cajero (default: 0)')
+        parser.add_argument('--semilla', type=int,
+                            help='Semilla para repetir la misma secuencia de ventas')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Permite correr con DEBUG=False (escribe ventas reales en la base)')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError(
+                'La prueba crea ventas en la base configurada; con DEBUG=False usa --forzar'
+            )
+        if options['cajeros'] < 1 or options['duracion'] < 1 or options['productos'] < 1:
+            raise CommandError('--cajeros, --duracion y --productos deben ser mayores a 0')
+        if options['articulos'] < 1 or options['cantidad'] < 1:
+            raise CommandError('--articulos y --cantidad deben ser mayores a 0')
+
+        self.stdout.write(
+            f"{options['cajeros']} cajeros contra {options['url']} durante {options['duracion']} s..."
+        )
+        resultado = ejecutar(
+            options['url'],
+            cajeros=options['cajeros'],
+            duracion=options['duracion'],
+            productos=options['productos'],
+            stock=options['stock'],
+            clientes=options['clientes'],
+            sesgo=options['sesgo'],
+            articulos=options['articulos'],
+            cantidad=options['cantidad'],
+            con_cliente=options['con_cliente'],
+            pausa=options['pausa'],
+            semilla=options['semilla'],
+        )
+
+        self.stdout.write(f"\nSemilla: {resultado['semilla']}")
+        self.stdout.write(f"{'Paso':<10}{'Peticiones':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+        for paso, datos in resultado['pasos'].items():
+            self.stdout.write(
+                f"{paso:<10}{datos['peticiones']:>12}"
+                + ''.join(f"{datos[campo] * 1000:>10.1f}" for campo in ('p50', 'p95', 'p99', 'max'))
+            )
+
+        desenlaces = resultado['desenlaces']
+        self.stdout.write(
+            f"\nVentas: {desenlaces.get('venta', 0)} "
+            f"({resultado['ventas_por_segundo']:.1f}/s, {resultado['peticiones_por_segundo']:.1f} peticiones/s)"
+        )
+        for desenlace in ('sin_stock', 'deadlock', 'serializacion', 'tiempo_agotado', 'ocupado', 'error'):
+            if desenlaces.get(desenlace):
+                self.stdout.write(f"  {desenlace}: {desenlaces[desenlace]}")
+        if resultado['deadlocks_postgres'] is not None:
+            self.stdout.write(f"Deadlocks registrados por PostgreSQL: {resultado['deadlocks_postgres']}")
+        for mensaje, veces in resultado['errores']:
+            self.stdout.write(f"  {veces} × {mensaje}")
+
+        if resultado['cortes_abiertos']:
+            self.stdout.write(self.style.WARNING(
+                f"{resultado['cortes_abiertos']} cortes quedaron abiertos (falló el cierre de caja)"
+            ))
+
+        stock = resultado['stock']
+        if stock['negativos'] or stock['descuadrados']:
+            self.stdout.write(self.style.ERROR(
+                f"Sobreventa: {stock['negativos']} productos con stock negativo, "
+                f"{stock['descuadrados']} que no cuadran con lo vendido"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock consistente con lo vendido'))
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sucursales.models import Sucursal
+from ventas.cubo import recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el cubo de ventas por sucursal, día y hora (mapa de calor) '
+        'desde las ventas, por meses en paralelo. Los ejercicios archivados se omiten.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial AAAA-MM-DD (default: hace 365 días)')
+        parser.add_argument('--hasta', help='Fecha final AAAA-MM-DD (default: hoy)')
+        parser.add_argument('--sucursal', help='Código de la sucursal (default: todas)')
+        parser.add_argument('--hilos', type=int, default=4,
+                            help='Meses que se recalculan a la vez (default: 4)')
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        fechas = {}
+        for opcion, omision in (('desde', hoy - timedelta(days=365)), ('hasta', hoy)):
+            valor = options[opcion]
+            try:
+                fechas[opcion] = parse_date(valor) if valor else omision
+            except ValueError:
+                fechas[opcion] = None
+            if fechas[opcion] is None:
+                raise CommandError(f'--{opcion} debe tener el formato AAAA-MM-DD')
+        if fechas['desde'] > fechas['hasta']:
+            raise CommandError('--desde debe ser anterior a --hasta')
+        if options['hilos'] < 1:
+            raise CommandError('--hilos debe ser al menos 1')
+
+        sucursal = None
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}")
+
+        celdas = recalcular(fechas['desde'], fechas['hasta'], sucursal=sucursal, hilos=options['hilos'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{celdas} celdas de ventas por hora guardadas ({fechas['desde']} a {fechas['hasta']})"
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_alter_cortecaja_options_alter_detalleventa_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='fecha_captura',
+            field=models.DateTimeField(blank=True, help_text='Fecha en que la caja registró la venta sin conexión', null=True),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='uuid_offline',
+            field=models.CharField(blank=True, max_length=36, null=True, unique=True, verbose_name='UUID de captura offline'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+from agrofeed_pv.particiones import particionar_tabla, desparticionar_tabla, soporta_particiones
+
+TABLA = 'ventas_detalleventa'
+
+
+def particionar(apps, schema_editor):
+    particionar_tabla(schema_editor, TABLA)
+
+    # Venta no se puede particionar (tiene llaves foráneas entrantes);
+    # un índice BRIN acota los rangos por fecha con un costo mínimo
+    if soporta_particiones(schema_editor.connection):
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS "ventas_venta_fecha_brin" ON "ventas_venta" USING brin ("fecha")'
+        )
+
+
+def desparticionar(apps, schema_editor):
+    if soporta_particiones(schema_editor.connection):
+        schema_editor.execute('DROP INDEX IF EXISTS "ventas_venta_fecha_brin"')
+    desparticionar_tabla(schema_editor, TABLA)
+
+
+class Migration(migrations.Migration):
+    """Particionamiento mensual de DetalleVenta por fecha_creacion (sólo PostgreSQL)"""
+
+    dependencies = [
+        ('ventas', '0004_venta_uuid_offline_venta_fecha_captura'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
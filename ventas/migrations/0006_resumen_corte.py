@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:31
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0005_particionar_detalleventa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCorte',
+            fields=[
+                ('corte', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='ventas.cortecaja')),
+                ('ventas_completadas', models.PositiveIntegerField(default=0)),
+                ('ventas_canceladas', models.PositiveIntegerField(default=0)),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_descuentos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('por_forma_pago', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('por_hora', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('productos_top', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fecha_generacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Corte',
+                'verbose_name_plural': 'Resúmenes de Corte',
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_de_m2m(apps, schema_editor):
+    """Venta.corte desde la tabla intermedia de ventas_incluidas (un solo UPDATE)"""
+    Venta = apps.get_model('ventas', 'Venta')
+    CorteCaja = apps.get_model('ventas', 'CorteCaja')
+    Intermedia = CorteCaja._meta.get_field('ventas_incluidas').remote_field.through
+
+    # Si una venta quedó en varios cortes, gana el más reciente
+    Venta.objects.filter(
+        models.Exists(Intermedia.objects.filter(venta_id=models.OuterRef('pk')))
+    ).update(corte_id=models.Subquery(
+        Intermedia.objects.filter(venta_id=models.OuterRef('pk')).order_by('-cortecaja_id').values('cortecaja_id')[:1]
+    ))
+
+
+def copiar_a_m2m(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    CorteCaja = apps.get_model('ventas', 'CorteCaja')
+    Intermedia = CorteCaja._meta.get_field('ventas_incluidas').remote_field.through
+
+    ventas = Venta.objects.filter(corte__isnull=False).values_list('id', 'corte_id')
+    lote = []
+    for venta_id, corte_id in ventas.iterator(chunk_size=5000):
+        lote.append(Intermedia(venta_id=venta_id, cortecaja_id=corte_id))
+        if len(lote) == 5000:
+            Intermedia.objects.bulk_create(lote)
+            lote = []
+    Intermedia.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+    """
+    Venta.corte reemplaza a la relación M2M CorteCaja.ventas_incluidas.
+    La llave se agrega con un related_name provisional para que convivan
+    durante la copia; al final toma el nombre ventas_incluidas.
+    """
+
+    dependencies = [
+        ('ventas', '0006_resumen_corte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='corte',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ventas.cortecaja', verbose_name='Corte de Caja'),
+        ),
+        migrations.RunPython(copiar_de_m2m, copiar_a_m2m),
+        migrations.RemoveField(
+            model_name='cortecaja',
+            name='ventas_incluidas',
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='corte',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_incluidas', to='ventas.cortecaja', verbose_name='Corte de Caja'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['corte', 'estado'], name='ventas_vent_corte_i_8f6e52_idx'),
+        ),
+    ]
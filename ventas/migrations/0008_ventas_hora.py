@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:39
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sucursales', '0003_sucursal_logo'),
+        ('ventas', '0007_venta_corte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(23)])),
+                ('dia_semana', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(6)])),
+                ('ventas', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('articulos', models.IntegerField(default=0, help_text='Renglones de detalle de las ventas')),
+                ('sucursal', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_hora', to='sucursales.sucursal')),
+            ],
+            options={
+                'verbose_name': 'Ventas por Hora',
+                'verbose_name_plural': 'Ventas por Hora',
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'fecha', 'hora'), name='venta_hora_unica')],
+            },
+        ),
+    ]
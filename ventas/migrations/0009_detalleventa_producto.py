@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:51
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copiar_productos(apps, schema_editor):
+    """Código, nombre y unidad actuales del producto en los detalles existentes"""
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    ProductoSucursal = apps.get_model('catalogos', 'ProductoSucursal')
+
+    def del_producto(campo):
+        return Subquery(ProductoSucursal.objects.filter(pk=OuterRef('producto_id')).values(campo)[:1])
+
+    # Una sola sentencia; la unidad puede faltar
+    DetalleVenta.objects.filter(producto_codigo='').update(
+        producto_codigo=del_producto('producto__codigo'),
+        producto_nombre=del_producto('producto__nombre'),
+        producto_unidad=Coalesce(del_producto('producto__unidad_medida__abreviatura'), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_ventas_hora'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleventa',
+            name='producto_codigo',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='detalleventa',
+            name='producto_nombre',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='detalleventa',
+            name='producto_unidad',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.RunPython(copiar_productos, migrations.RunPython.noop),
+    ]
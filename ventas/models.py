@@ -1,10 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
 from decimal import Decimal
 
 User = settings.AUTH_USER_MODEL
 
+def _centavos(valor):
+    """Decimal a dos decimales (las sumas pueden traer más)"""
+    return (valor or Decimal('0')).quantize(Decimal('0.01'))
+
+
 class Venta(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -29,6 +37,17 @@ class Venta(models.Model):
         blank=True,
         related_name='ventas'
     )
+    # Corte de caja en el que se cobró (se asigna al registrar la venta).
+    # CorteCaja.ventas_incluidas conserva el nombre de la antigua relación M2M.
+    corte = models.ForeignKey(
+        'CorteCaja',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ventas_incluidas',
+        db_index=False,  # cubierto por el índice (corte, estado)
+        verbose_name="Corte de Caja"
+    )
     
     # Información de la venta
     folio = models.CharField(
@@ -69,6 +88,20 @@ class Venta(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)
     cerrada = models.BooleanField(default=True)
     observaciones = models.TextField(blank=True)
+
+    # Ventas capturadas sin conexión
+    uuid_offline = models.CharField(
+        max_length=36,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="UUID de captura offline"
+    )
+    fecha_captura = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Fecha en que la caja registró la venta sin conexión"
+    )
     forma_pago = models.CharField(
         max_length=50,
         default='efectivo',
@@ -118,6 +151,8 @@ class Venta(models.Model):
             models.Index(fields=['cliente']),
             models.Index(fields=['estado']),
             models.Index(fields=['sucursal', 'fecha']),
+            # Totales del corte: un rango del índice por corte y estado
+            models.Index(fields=['corte', 'estado']),
         ]
         permissions = [
             ('puede_cancelar_venta', 'Puede cancelar ventas'),
@@ -125,6 +160,9 @@ class Venta(models.Model):
             ('puede_ver_reportes', 'Puede ver reportes de ventas'),
         ]
 
+    # Las ventas de ejercicios archivados (archivo.VentaArchivada) la tienen en True
+    archivada = False
+
     def __str__(self):
         return f"Venta {self.folio} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
 
@@ -205,44 +243,16 @@ class Venta(models.Model):
             self.save()
     
     def cancelar(self, usuario, motivo=""):
-        """Cancelar venta y devolver stock"""
+        """Cancelar venta y devolver stock (ver ventas.services.cancelar_ventas)"""
         if self.estado == 'cancelada':
             return False
         
-        from catalogos.models import MovimientoInventario
+        from .services import cancelar_ventas
         
-        try:
-            # Restaurar stock de cada producto
-            for detalle in self.detalles.all():
-                producto_sucursal = detalle.producto
-                
-                # Registrar movimiento de inventario
-                MovimientoInventario.objects.create(
-                    producto_sucursal=producto_sucursal,
-                    tipo='entrada',
-                    cantidad=detalle.cantidad,
-                    cantidad_anterior=producto_sucursal.stock,
-                    cantidad_nueva=producto_sucursal.stock + detalle.cantidad,
-                    motivo=f'Cancelación venta {self.folio}. {motivo}',
-                    usuario=usuario,
-                    referencia=f'CANCELACION-{self.folio}'
-                )
-                
-                # Actualizar stock
-                producto_sucursal.stock += detalle.cantidad
-                producto_sucursal.save()
-            
-            # Actualizar estado de la venta
-            self.estado = 'cancelada'
-            self.observaciones = f"Cancelada por {usuario.username}. {motivo}"
-            self.actualizado_por = usuario
-            self.save()
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error al cancelar venta: {e}")
+        if not cancelar_ventas([self.pk], usuario, motivo):
             return False
+        self.refresh_from_db(fields=['estado', 'observaciones', 'actualizado_por', 'fecha_actualizacion'])
+        return True
 
 
 class DetalleVenta(models.Model):
@@ -257,6 +267,11 @@ class DetalleVenta(models.Model):
         on_delete=models.PROTECT,
         related_name='ventas_detalle'
     )
+    # Copia del producto al cobrar: tickets y reportes no unen con el
+    # catálogo y conservan lo que vio el cliente si el producto cambia
+    producto_codigo = models.CharField(max_length=50, blank=True, default='')
+    producto_nombre = models.CharField(max_length=150, blank=True, default='')
+    producto_unidad = models.CharField(max_length=10, blank=True, default='')
     
     # Información de la venta
     cantidad = models.DecimalField(
@@ -310,9 +325,24 @@ class DetalleVenta(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.producto.producto.nombre} - {self.cantidad} x ${self.precio_final}"
+        return f"{self.producto_nombre} - {self.cantidad} x ${self.precio_final}"
+
+    @staticmethod
+    def datos_producto(producto_sucursal):
+        """Código, nombre y unidad que se copian al detalle (producto con select_related)"""
+        producto = producto_sucursal.producto
+        return {
+            'producto_codigo': producto.codigo,
+            'producto_nombre': producto.nombre,
+            'producto_unidad': producto.unidad_medida.abreviatura if producto.unidad_medida_id else '',
+        }
 
     def save(self, *args, **kwargs):
+        # Detalles creados fuera del cobro (admin)
+        if not self.producto_codigo:
+            for campo, valor in self.datos_producto(self.producto).items():
+                setattr(self, campo, valor)
+
         # Calcular descuento unitario si no está definido
         if self.descuento_unitario == 0 and self.precio_unitario > self.precio_final:
             self.descuento_unitario = self.precio_unitario - self.precio_final
@@ -328,11 +358,11 @@ class DetalleVenta(models.Model):
 
     @property
     def nombre_producto(self):
-        return self.producto.producto.nombre
+        return self.producto_nombre
 
     @property
     def codigo_producto(self):
-        return self.producto.producto.codigo
+        return self.producto_codigo
 
     @property
     def descuento_aplicado(self):
@@ -435,11 +465,6 @@ class CorteCaja(models.Model):
     
     # Información adicional
     observaciones = models.TextField(blank=True)
-    ventas_incluidas = models.ManyToManyField(
-        Venta,
-        related_name='cortes_caja',
-        blank=True
-    )
     
     # Auditoría
     cerrado_por = models.ForeignKey(
@@ -478,7 +503,6 @@ class CorteCaja(models.Model):
     def save(self, *args, **kwargs):
         # Generar folio automático si no existe
         if not self.folio:
-            from django.utils import timezone
             year = timezone.now().year
             last_corte = CorteCaja.objects.filter(
                 sucursal=self.sucursal,
@@ -529,45 +553,198 @@ class CorteCaja(models.Model):
         return 0
 
     def calcular_totales(self):
-        """Calcular totales a partir de las ventas incluidas"""
-        ventas = self.ventas_incluidas.filter(estado='completada')
-        
-        if ventas.exists():
-            self.total_ventas = sum(venta.total for venta in ventas)
-            self.total_descuentos = sum(venta.descuento_total for venta in ventas)
-            
-            # Calcular por forma de pago
-            self.total_efectivo_esperado = sum(
-                venta.total for venta in ventas.filter(forma_pago='efectivo')
-            )
-            self.total_tarjeta = sum(
-                venta.total for venta in ventas.filter(forma_pago='tarjeta')
-            )
-            self.total_transferencia = sum(
-                venta.total for venta in ventas.filter(forma_pago='transferencia')
-            )
-            
+        """Calcular totales a partir de las ventas incluidas (una sola consulta)"""
+        totales = self.ventas_incluidas.filter(estado='completada').aggregate(
+            total_ventas=models.Sum('total'),
+            total_descuentos=models.Sum('descuento_total'),
             # Para pagos mixtos, asumimos que el total está en efectivo
-            self.total_efectivo_esperado += sum(
-                venta.total for venta in ventas.filter(forma_pago='mixto')
-            )
-            
-            self.save()
+            total_efectivo_esperado=models.Sum('total', filter=models.Q(forma_pago__in=['efectivo', 'mixto'])),
+            total_tarjeta=models.Sum('total', filter=models.Q(forma_pago='tarjeta')),
+            total_transferencia=models.Sum('total', filter=models.Q(forma_pago='transferencia')),
+        )
+        for campo, valor in totales.items():
+            setattr(self, campo, valor or Decimal('0'))
+        self.save()
     
+    def generar_resumen(self, ventas=None):
+        """
+        ResumenCorte (sin guardar) de las ventas del corte. `ventas` permite
+        indicar otro queryset (p. ej. las del período); por default son las
+        ventas incluidas.
+        """
+        if ventas is None:
+            ventas = self.ventas_incluidas.all()
+        completadas = ventas.filter(estado='completada')
+        es_completada = models.Q(estado='completada')
+
+        totales = ventas.aggregate(
+            ventas_completadas=models.Count('id', filter=es_completada),
+            ventas_canceladas=models.Count('id', filter=models.Q(estado='cancelada')),
+            total_ventas=models.Sum('total', filter=es_completada),
+            total_descuentos=models.Sum('descuento_total', filter=es_completada),
+        )
+
+        etiquetas = dict(Venta._meta.get_field('forma_pago').choices)
+        por_forma_pago = [
+            {
+                'forma_pago': fila['forma_pago'],
+                'etiqueta': etiquetas.get(fila['forma_pago'], fila['forma_pago']),
+                'ventas': fila['ventas'],
+                'total': _centavos(fila['total']),
+            }
+            for fila in completadas.values('forma_pago').annotate(
+                ventas=models.Count('id'),
+                total=models.Sum('total')
+            ).order_by('forma_pago')
+        ]
+
+        # La hora se extrae en la zona horaria local
+        por_hora = [
+            {'hora': fila['hora'], 'ventas': fila['ventas'], 'total': _centavos(fila['total'])}
+            for fila in completadas.annotate(
+                hora=ExtractHour('fecha')
+            ).values('hora').annotate(
+                ventas=models.Count('id'),
+                total=models.Sum('total')
+            ).order_by('hora')
+        ]
+
+        productos_top = [
+            {
+                'producto_id': fila['producto_id'],
+                'codigo': fila['codigo'],
+                'nombre': fila['nombre'],
+                'cantidad': _centavos(fila['cantidad']),
+                'total': _centavos(fila['total']),
+            }
+            for fila in DetalleVenta.objects.filter(venta__in=completadas).values(
+                'producto_id'
+            ).annotate(
+                # Un producto renombrado durante el turno queda en un solo renglón
+                codigo=models.Max('producto_codigo'),
+                nombre=models.Max('producto_nombre'),
+                cantidad=models.Sum('cantidad'),
+                total=models.Sum('subtotal')
+            ).order_by('-total')[:ResumenCorte.PRODUCTOS_TOP]
+        ]
+
+        return ResumenCorte(
+            corte=self,
+            ventas_completadas=totales['ventas_completadas'],
+            ventas_canceladas=totales['ventas_canceladas'],
+            total_ventas=_centavos(totales['total_ventas']),
+            total_descuentos=_centavos(totales['total_descuentos']),
+            por_forma_pago=por_forma_pago,
+            por_hora=por_hora,
+            productos_top=productos_top,
+        )
+
+    def resumen_vigente(self, ventas=None):
+        """El resumen guardado al cerrar o, si no hay, uno calculado en el momento"""
+        try:
+            return self.resumen
+        except ResumenCorte.DoesNotExist:
+            return self.generar_resumen(ventas)
+
     def cerrar_corte(self, usuario, efectivo_real, observaciones=""):
-        """Cerrar el corte de caja"""
+        """Cerrar el corte de caja y congelar su resumen"""
         if self.estado != 'abierto':
             return False
         
         try:
-            self.estado = 'cerrado'
-            self.total_efectivo_real = efectivo_real
-            self.observaciones = observaciones
-            self.cerrado_por = usuario
-            self.calcular_totales()
-            self.save()
+            with transaction.atomic():
+                self.estado = 'cerrado'
+                self.total_efectivo_real = efectivo_real
+                self.observaciones = observaciones
+                self.cerrado_por = usuario
+                self.calcular_totales()
+                self.save()
+                self.generar_resumen().save()
             return True
             
         except Exception as e:
+            self.estado = 'abierto'
             print(f"Error al cerrar corte: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class ResumenCorte(models.Model):
+    """
+    Resumen de un corte congelado al cerrarlo: conteos y totales por forma
+    de pago, ventas por hora y productos más vendidos. Las vistas de cortes
+    cerrados lo leen en lugar de volver a agregar las ventas. No se
+    modifica después de creado (una cancelación posterior no lo altera).
+    """
+    PRODUCTOS_TOP = 10
+
+    corte = models.OneToOneField(
+        CorteCaja,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='resumen'
+    )
+    ventas_completadas = models.PositiveIntegerField(default=0)
+    ventas_canceladas = models.PositiveIntegerField(default=0)
+    total_ventas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_descuentos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # [{'forma_pago', 'etiqueta', 'ventas', 'total'}]
+    por_forma_pago = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # [{'hora', 'ventas', 'total'}], hora local 0-23
+    por_hora = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # [{'producto_id', 'codigo', 'nombre', 'cantidad', 'total'}]
+    productos_top = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    fecha_generacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Resumen de Corte"
+        verbose_name_plural = "Resúmenes de Corte"
+
+    def __str__(self):
+        return f"Resumen {self.corte_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("El resumen de un corte cerrado no se modifica")
+        kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+    @property
+    def ticket_promedio(self):
+        if not self.ventas_completadas:
+            return Decimal('0')
+        return self.total_ventas / self.ventas_completadas
+
+
+class VentaHora(models.Model):
+    """
+    Cubo de ventas completadas por sucursal, día y hora (hora local de la
+    captura). Lo mantienen el cobro y las cancelaciones (ventas/cubo.py);
+    el comando `recalcular_ventas_hora` lo reconstruye desde las ventas.
+    """
+    DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+    sucursal = models.ForeignKey(
+        'sucursales.Sucursal',
+        on_delete=models.CASCADE,
+        related_name='ventas_hora',
+        db_index=False  # cubierto por la restricción (sucursal, fecha, hora)
+    )
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField(validators=[MaxValueValidator(23)])
+    # 0 = lunes (date.weekday())
+    dia_semana = models.PositiveSmallIntegerField(validators=[MaxValueValidator(6)])
+
+    # Con signo: una cancelación antes del primer recálculo puede dejarlos en negativo
+    ventas = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    articulos = models.IntegerField(default=0, help_text="Renglones de detalle de las ventas")
+
+    class Meta:
+        verbose_name = "Ventas por Hora"
+        verbose_name_plural = "Ventas por Hora"
+        constraints = [
+            models.UniqueConstraint(fields=['sucursal', 'fecha', 'hora'], name='venta_hora_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.sucursal_id} {self.fecha} {self.hora:02d}h"
@@ -0,0 +1,369 @@
+"""
+Prueba de carga de la caja.
+
+N cajeros simulados recorren por HTTP el flujo real de cobro contra una
+sucursal sintética (CARGA): abrir caja, agregar productos al carrito,
+seleccionar cliente, cobrar y, al final, cerrar caja. Sirve para saber
+cuántas cajas aguanta una sucursal antes de que el cobro se degrade por los
+bloqueos de fila en ProductoSucursal.
+
+Los productos de cada venta siguen una distribución Zipf (`sesgo`): con 0
+todos son igual de probables; con 1 o más unos pocos concentran las ventas,
+que es donde chocan los bloqueos.
+
+El comando corre con la misma configuración (y base de datos) que el
+servidor bajo prueba: prepara ahí los datos y abre las sesiones de los
+cajeros directamente en el almacén de sesiones, sin pasar por el login.
+Al terminar revisa el stock: negativo o que no cuadra con lo vendido
+cuenta como sobreventa.
+"""
+import bisect
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from catalogos import alertas, escaneo
+from catalogos.models import Cliente, Producto, ProductoSucursal
+from sucursales.models import Sucursal
+from .models import CorteCaja, DetalleVenta
+
+SUCURSAL_CARGA = 'CARGA'
+PREFIJO_PRODUCTO = 'CARGA-'
+PREFIJO_CAJERO = 'carga_cajero_'
+NOMBRE_CLIENTE = 'Cliente de carga'
+
+PASOS = ('apertura', 'agregar', 'cliente', 'cobro', 'cierre')
+
+
+# =========== DATOS SINTÉTICOS ===========
+def preparar_datos(cajeros, productos, stock, clientes):
+    """
+    Crea (o completa) la sucursal CARGA con sus productos, cajeros y
+    clientes, y deja el stock de todos sus productos en `stock`. Cierra los
+    cortes que hayan quedado abiertos de una corrida anterior.
+    """
+    sucursal, _ = Sucursal.objects.get_or_create(
+        codigo=SUCURSAL_CARGA,
+        defaults={'nombre': 'Prueba de carga', 'direccion': 'Sucursal sintética'}
+    )
+
+    codigos = [f'{PREFIJO_PRODUCTO}{i:05d}' for i in range(1, productos + 1)]
+    existentes = set(Producto.objects.filter(codigo__in=codigos).values_list('codigo', flat=True))
+    Producto.objects.bulk_create([
+        Producto(codigo=codigo, nombre=f'Producto de carga {codigo[len(PREFIJO_PRODUCTO):]}')
+        for codigo in codigos if codigo not in existentes
+    ], batch_size=1000)
+
+    en_sucursal = set(ProductoSucursal.objects.filter(sucursal=sucursal).values_list('producto_id', flat=True))
+    ProductoSucursal.objects.bulk_create([
+        ProductoSucursal(producto_id=producto_id, sucursal=sucursal, precio_venta=Decimal('10.00') + indice % 90)
+        for indice, producto_id in enumerate(Producto.objects.filter(codigo__in=codigos).order_by('codigo').values_list('id', flat=True))
+        if producto_id not in en_sucursal
+    ], batch_size=1000)
+    ProductoSucursal.objects.filter(sucursal=sucursal).update(stock=stock, activo=True)
+    escaneo.invalidar()
+    alertas.sincronizar(sucursal=sucursal)
+
+    Usuario = get_user_model()
+    usuarios = []
+    for i in range(1, cajeros + 1):
+        usuario, creado = Usuario.objects.get_or_create(
+            username=f'{PREFIJO_CAJERO}{i:03d}',
+            defaults={'rol': 'cajero', 'sucursal': sucursal, 'first_name': 'Cajero', 'last_name': f'de carga {i}'}
+        )
+        if creado:
+            usuario.set_unusable_password()
+            usuario.save(update_fields=['password'])
+        usuarios.append(usuario)
+
+    CorteCaja.objects.filter(sucursal=sucursal, estado='abierto').update(estado='cerrado')
+
+    faltantes = clientes - Cliente.objects.filter(nombre=NOMBRE_CLIENTE).count()
+    if faltantes > 0:
+        Cliente.objects.bulk_create([
+            Cliente(codigo=codigo, nombre=NOMBRE_CLIENTE, apellido=str(i), sucursal_registro=sucursal)
+            for i, codigo in enumerate(Cliente.reservar_codigos(faltantes))
+        ])
+
+    ids_productos = list(ProductoSucursal.objects.filter(
+        sucursal=sucursal, producto__codigo__in=codigos
+    ).order_by('id').values_list('id', flat=True))
+    ids_clientes = list(Cliente.objects.filter(nombre=NOMBRE_CLIENTE).values_list('id', flat=True)[:clientes])
+    return sucursal, usuarios, ids_productos, ids_clientes
+
+
+def abrir_sesion(usuario):
+    """Sesión autenticada del usuario (como la que deja el login) y su llave"""
+    sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+    sesion[SESSION_KEY] = str(usuario.pk)
+    sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+    sesion.save()
+    return sesion.session_key
+
+
+# =========== MUESTREO ===========
+def muestreador_zipf(ids, sesgo, aleatorio):
+    """Función que elige un id con probabilidad proporcional a 1 / rango^sesgo"""
+    acumulados = list(itertools.accumulate(1 / rango ** sesgo for rango in range(1, len(ids) + 1)))
+    total = acumulados[-1]
+
+    def elegir():
+        return ids[min(bisect.bisect(acumulados, aleatorio.random() * total), len(ids) - 1)]
+    return elegir
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) de una lista ya ordenada, por rango más cercano"""
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))]
+
+
+# =========== RESULTADOS ===========
+class Resultados:
+    """Latencias por paso y conteo de desenlaces, compartido entre hilos"""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.desenlaces = Counter()
+        self.errores = Counter()
+        self._candado = threading.Lock()
+
+    def medir(self, paso, segundos):
+        with self._candado:
+            self.latencias[paso].append(segundos)
+
+    def contar(self, desenlace, mensaje=None):
+        with self._candado:
+            self.desenlaces[desenlace] += 1
+            if mensaje:
+                self.errores[mensaje[:120]] += 1
+
+    def resumen(self, paso):
+        valores = sorted(self.latencias.get(paso, []))
+        return {
+            'peticiones': len(valores),
+            'p50': percentil(valores, 50),
+            'p95': percentil(valores, 95),
+            'p99': percentil(valores, 99),
+            'max': valores[-1] if valores else None,
+        }
+
+
+def clasificar(estado, cuerpo):
+    """Desenlace de una respuesta de cobro: (desenlace, mensaje de error)"""
+    if estado == 503:
+        return 'ocupado', None
+    if estado >= 400:
+        return 'error', f'HTTP {estado}'
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        return 'error', 'Respuesta no JSON'
+    if datos.get('success'):
+        return 'venta', None
+
+    error = datos.get('error', '')
+    texto = error.lower()
+    if 'deadlock' in texto:
+        return 'deadlock', None
+    if 'could not serialize' in texto or 'serializ' in texto:
+        return 'serializacion', None
+    if 'statement timeout' in texto or 'lock timeout' in texto:
+        return 'tiempo_agotado', None
+    if any(conflicto.get('tipo') == 'stock' for conflicto in datos.get('conflictos', [])):
+        return 'sin_stock', None
+    return 'error', error or 'Error sin mensaje'
+
+
+# =========== CAJERO SIMULADO ===========
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Cajero(threading.Thread):
+    """Un cajero que vende hasta `fin` (time.monotonic) y luego cierra caja"""
+
+    def __init__(self, base, llave_sesion, resultados, elegir_producto, clientes, opciones, aleatorio, fin):
+        super().__init__(daemon=True)
+        self.base = base.rstrip('/')
+        self.csrf = get_random_string(32)
+        self.cookies = f'{settings.SESSION_COOKIE_NAME}={llave_sesion}; {settings.CSRF_COOKIE_NAME}={self.csrf}'
+        self.abridor = urllib.request.build_opener(_SinRedirecciones)
+        self.resultados = resultados
+        self.elegir_producto = elegir_producto
+        self.clientes = clientes
+        self.opciones = opciones
+        self.aleatorio = aleatorio
+        self.fin = fin
+        self.urls = {
+            nombre: reverse(nombre) for nombre in (
+                'cajero_apertura_caja', 'ajax_agregar_carrito', 'ajax_seleccionar_cliente',
+                'cajero_procesar_venta', 'cajero_limpiar_carrito', 'cajero_cierre_caja',
+            )
+        }
+
+    def pedir(self, nombre, paso=None, json_datos=None, formulario=None, metodo='POST'):
+        encabezados = {'Cookie': self.cookies, 'X-CSRFToken': self.csrf, 'X-Requested-With': 'XMLHttpRequest'}
+        cuerpo = None
+        if json_datos is not None:
+            cuerpo = json.dumps(json_datos).encode()
+            encabezados['Content-Type'] = 'application/json'
+        elif formulario is not None:
+            cuerpo = urllib.parse.urlencode(formulario).encode()
+            encabezados['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        peticion = urllib.request.Request(self.base + self.urls[nombre], data=cuerpo, headers=encabezados, method=metodo)
+        inicio = time.perf_counter()
+        try:
+            with self.abridor.open(peticion, timeout=self.opciones['timeout']) as respuesta:
+                estado, contenido = respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            estado, contenido = e.code, e.read()
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            self.resultados.contar('error', f'{paso or nombre}: {getattr(e, "reason", e)}')
+            return None, b''
+        if paso:
+            self.resultados.medir(paso, time.perf_counter() - inicio)
+        return estado, contenido
+
+    def run(self):
+        estado, _ = self.pedir('cajero_apertura_caja', paso='apertura', formulario={})
+        if estado != 302:
+            self.resultados.contar('error', f'apertura: HTTP {estado}')
+            return
+
+        while time.monotonic() < self.fin:
+            self.vender()
+            if self.opciones['pausa']:
+                time.sleep(self.aleatorio.uniform(0, self.opciones['pausa']))
+
+        estado, _ = self.pedir('cajero_cierre_caja', paso='cierre', formulario={'efectivo_real': '0'})
+        if estado != 302:
+            self.resultados.contar('error', f'cierre: HTTP {estado}')
+
+    def vender(self):
+        for _ in range(self.aleatorio.randint(1, self.opciones['articulos'])):
+            self.pedir('ajax_agregar_carrito', paso='agregar', json_datos={
+                'producto_id': self.elegir_producto(),
+                'cantidad': self.aleatorio.randint(1, self.opciones['cantidad']),
+            })
+
+        if self.clientes and self.aleatorio.random() < self.opciones['con_cliente']:
+            self.pedir('ajax_seleccionar_cliente', paso='cliente', json_datos={
+                'cliente_id': self.aleatorio.choice(self.clientes)
+            })
+
+        estado, contenido = self.pedir('cajero_procesar_venta', paso='cobro', json_datos={
+            'forma_pago': 'efectivo',
+            'efectivo_recibido': 0,
+        })
+        if estado is None:
+            return
+        desenlace, mensaje = clasificar(estado, contenido)
+        self.resultados.contar(desenlace, mensaje)
+        if desenlace != 'venta':
+            # El carrito sigue en la sesión: la siguiente venta empieza de cero
+            self.pedir('cajero_limpiar_carrito', metodo='GET')
+
+
+# =========== CORRIDA ===========
+def contadores_postgres():
+    """Deadlocks detectados por PostgreSQL en la base (None en otros motores)"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+
+def verificar_stock(sucursal, stock_inicial, desde):
+    """Productos con stock negativo o que no cuadra con lo vendido desde `desde`"""
+    vendidos = dict(DetalleVenta.objects.filter(
+        venta__sucursal=sucursal,
+        venta__estado='completada',
+        venta__fecha__gte=desde
+    ).values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total').order_by())
+
+    negativos = descuadrados = 0
+    for ps_id, stock in ProductoSucursal.objects.filter(id__in=stock_inicial.keys()).values_list('id', 'stock'):
+        if stock < 0:
+            negativos += 1
+        if stock != stock_inicial[ps_id] - (vendidos.get(ps_id) or 0):
+            descuadrados += 1
+    return {'negativos': negativos, 'descuadrados': descuadrados}
+
+
+def ejecutar(base, cajeros=4, duracion=60, productos=500, stock=1000, clientes=200, sesgo=1.1,
+             articulos=5, cantidad=3, con_cliente=0.3, pausa=0.0, timeout=30, semilla=None):
+    """
+    Corre la prueba y regresa un dict con el resumen por paso, los
+    desenlaces de los cobros, los errores más frecuentes y la revisión de stock.
+    """
+    sucursal, usuarios, ids_productos, ids_clientes = preparar_datos(cajeros, productos, stock, clientes)
+    stock_inicial = dict(ProductoSucursal.objects.filter(id__in=ids_productos).values_list('id', 'stock'))
+    llaves = [abrir_sesion(usuario) for usuario in usuarios]
+
+    opciones = {
+        'articulos': articulos,
+        'cantidad': cantidad,
+        'con_cliente': con_cliente,
+        'pausa': pausa,
+        'timeout': timeout,
+    }
+    semilla = semilla if semilla is not None else random.randrange(2 ** 32)
+    resultados = Resultados()
+    deadlocks_antes = contadores_postgres()
+    desde = timezone.now()
+
+    inicio = time.monotonic()
+    hilos = []
+    for i, llave in enumerate(llaves):
+        aleatorio = random.Random(semilla + i)
+        hilos.append(Cajero(
+            base, llave, resultados,
+            muestreador_zipf(ids_productos, sesgo, aleatorio),
+            ids_clientes, opciones, aleatorio,
+            fin=inicio + duracion
+        ))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.monotonic() - inicio
+
+    deadlocks_despues = contadores_postgres()
+    ventas = resultados.desenlaces['venta']
+    return {
+        'semilla': semilla,
+        'segundos': segundos,
+        'pasos': {paso: resultados.resumen(paso) for paso in PASOS if resultados.latencias.get(paso)},
+        'desenlaces': dict(resultados.desenlaces),
+        'errores': resultados.errores.most_common(10),
+        'ventas_por_segundo': ventas / segundos if segundos else 0,
+        'peticiones_por_segundo': sum(len(v) for v in resultados.latencias.values()) / segundos if segundos else 0,
+        'deadlocks_postgres': (
+            deadlocks_despues - deadlocks_antes if deadlocks_antes is not None else None
+        ),
+        'stock': verificar_stock(sucursal, stock_inicial, desde),
+        # El cierre redirige aunque falle: se revisa en la base
+        'cortes_abiertos': CorteCaja.objects.filter(sucursal=sucursal, estado='abierto').count(),
+    }
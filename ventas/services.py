@@ -0,0 +1,360 @@
+from django.db import transaction
+from django.db.models import Case, When, F, DecimalField
+from django.utils import timezone
+from decimal import Decimal
+
+from .models import Venta, DetalleVenta, CorteCaja
+from . import cubo
+from catalogos.models import ProductoSucursal, MovimientoInventario
+from catalogos import alertas
+from dashboard import metricas
+
+
+class ErrorVenta(Exception):
+    """Error de validación al registrar una venta"""
+
+    def __init__(self, mensaje, conflictos=None):
+        super().__init__(mensaje)
+        self.conflictos = conflictos or []
+
+
+# =========== HELPERS ===========
+def corte_abierto(sucursal, usuario):
+    """Corte de caja abierto del usuario en la sucursal (o None)"""
+    return CorteCaja.objects.filter(
+        sucursal=sucursal,
+        estado='abierto',
+        usuario=usuario
+    ).first()
+
+
+def siguientes_folios(sucursal, cantidad):
+    """Reserva `cantidad` folios consecutivos con una sola consulta"""
+    year = timezone.now().year
+    last_venta = Venta.objects.filter(
+        sucursal=sucursal,
+        fecha__year=year
+    ).order_by('-id').only('folio').first()
+
+    last_num = 0
+    if last_venta and last_venta.folio:
+        try:
+            last_num = int(last_venta.folio.split('-')[-1])
+        except ValueError:
+            last_num = 0
+
+    return [
+        f"V-{sucursal.codigo}-{year}-{str(last_num + i).zfill(6)}"
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def actualizar_stock(cambios):
+    """
+    Aplica cambios de stock {producto_sucursal_id: delta} en una sola sentencia.
+    Las filas deben estar bloqueadas previamente con select_for_update.
+    """
+    if not cambios:
+        return 0
+    actualizados = ProductoSucursal.objects.filter(id__in=cambios.keys()).update(
+        stock=Case(
+            *[When(id=ps_id, then=F('stock') + delta) for ps_id, delta in cambios.items()],
+            default=F('stock'),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ),
+        ultima_actualizacion=timezone.now()
+    )
+    # update() no manda señales
+    alertas.sincronizar(cambios.keys())
+    return actualizados
+
+
+def _bloquear_productos(sucursal, ids):
+    """
+    Bloquea las filas de ProductoSucursal en orden de id (evita deadlocks).
+    Con sucursal=None no se restringe la sucursal.
+    """
+    productos = ProductoSucursal.objects.select_for_update(of=('self',)).filter(id__in=ids)
+    if sucursal is not None:
+        productos = productos.filter(sucursal=sucursal)
+    productos = productos.select_related('producto__unidad_medida').order_by('id')
+    return {ps.id: ps for ps in productos}
+
+
+def _cantidades_por_producto(items):
+    """Agrupa las cantidades del carrito por producto (conserva el orden)"""
+    cantidades = {}
+    for item in items:
+        ps_id = int(item['id'])
+        cantidades[ps_id] = cantidades.get(ps_id, Decimal('0')) + Decimal(str(item['cantidad']))
+    return cantidades
+
+
+# =========== CHECKOUT ===========
+def registrar_ventas(sucursal, usuario, ventas, corte=None, validar_precios=False):
+    """
+    Registra un lote de ventas con un número fijo de sentencias SQL.
+
+    Cada venta es un dict con: items (lista de {'id', 'cantidad', 'precio'}),
+    cliente, forma_pago, efectivo_recibido, observaciones y opcionalmente
+    uuid_offline y fecha_captura. Las ventas con conflictos (stock, precio,
+    producto inexistente) se omiten y se reportan sin afectar a las demás.
+
+    Regresa una lista con un resultado por venta, en el mismo orden:
+    {'venta': Venta} o {'conflictos': [...]}
+    """
+    resultados = [None] * len(ventas)
+
+    with transaction.atomic():
+        ids = set()
+        for datos in ventas:
+            ids.update(int(item['id']) for item in datos['items'])
+
+        # Un solo bloqueo para todo el lote, en orden determinista
+        productos = _bloquear_productos(sucursal, ids)
+        stock_disponible = {ps_id: ps.stock for ps_id, ps in productos.items()}
+
+        aceptadas = []
+        for indice, datos in enumerate(ventas):
+            conflictos = []
+            cantidades = _cantidades_por_producto(datos['items'])
+            precios = {int(item['id']): item.get('precio') for item in datos['items']}
+
+            if not cantidades:
+                conflictos.append({'tipo': 'vacia', 'mensaje': 'La venta no tiene productos'})
+
+            for ps_id, cantidad in cantidades.items():
+                ps = productos.get(ps_id)
+                if ps is None or not ps.activo:
+                    conflictos.append({
+                        'tipo': 'producto',
+                        'producto_id': ps_id,
+                        'mensaje': 'Producto no disponible en la sucursal'
+                    })
+                    continue
+
+                if cantidad <= 0:
+                    conflictos.append({
+                        'tipo': 'cantidad',
+                        'producto_id': ps_id,
+                        'mensaje': 'La cantidad debe ser mayor a 0'
+                    })
+                elif cantidad > stock_disponible[ps_id]:
+                    conflictos.append({
+                        'tipo': 'stock',
+                        'producto_id': ps_id,
+                        'producto': ps.producto.nombre,
+                        'solicitado': float(cantidad),
+                        'disponible': float(stock_disponible[ps_id]),
+                        'mensaje': f'Stock insuficiente. Disponible: {stock_disponible[ps_id]}'
+                    })
+
+                precio = precios.get(ps_id)
+                if validar_precios and precio is not None and Decimal(str(precio)) != ps.precio_venta:
+                    conflictos.append({
+                        'tipo': 'precio',
+                        'producto_id': ps_id,
+                        'producto': ps.producto.nombre,
+                        'precio_capturado': float(precio),
+                        'precio_actual': float(ps.precio_venta),
+                        'mensaje': 'El precio cambió desde que se capturó la venta'
+                    })
+
+            if conflictos:
+                resultados[indice] = {'conflictos': conflictos}
+                continue
+
+            # Reservar stock en memoria para las siguientes ventas del lote
+            for ps_id, cantidad in cantidades.items():
+                stock_disponible[ps_id] -= cantidad
+            aceptadas.append((indice, datos, cantidades, precios))
+
+        if not aceptadas:
+            return resultados
+
+        folios = siguientes_folios(sucursal, len(aceptadas))
+        ahora = timezone.now()
+
+        nuevas_ventas = []
+        lineas = []
+        for (indice, datos, cantidades, precios), folio in zip(aceptadas, folios):
+            cliente = datos.get('cliente')
+            descuento_porcentaje = Decimal('0')
+            if cliente and cliente.porcentaje_descuento > 0:
+                descuento_porcentaje = cliente.porcentaje_descuento
+
+            detalles = []
+            subtotal = Decimal('0')
+            for ps_id, cantidad in cantidades.items():
+                ps = productos[ps_id]
+                precio = precios.get(ps_id)
+                precio_unitario = Decimal(str(precio)) if precio is not None else ps.precio_venta
+                descuento_unitario = precio_unitario * (descuento_porcentaje / Decimal('100'))
+                precio_final = precio_unitario - descuento_unitario
+                subtotal += precio_unitario * cantidad
+                detalles.append((ps, cantidad, precio_unitario, precio_final, descuento_unitario))
+
+            descuento_total = subtotal * (descuento_porcentaje / Decimal('100'))
+            total = subtotal - descuento_total
+            efectivo_recibido = Decimal(str(datos.get('efectivo_recibido') or 0))
+
+            venta = Venta(
+                sucursal=sucursal,
+                usuario=usuario,
+                cliente=cliente,
+                corte=corte,
+                folio=folio,
+                subtotal=subtotal,
+                descuento_total=descuento_total,
+                descuento_porcentaje=descuento_porcentaje,
+                total=total,
+                forma_pago=datos.get('forma_pago') or 'efectivo',
+                efectivo_recibido=efectivo_recibido,
+                cambio=max(efectivo_recibido - total, Decimal('0')),
+                observaciones=datos.get('observaciones', ''),
+                creado_por=usuario,
+                uuid_offline=datos.get('uuid_offline'),
+                fecha_captura=datos.get('fecha_captura'),
+            )
+            nuevas_ventas.append(venta)
+            lineas.append(detalles)
+            resultados[indice] = {'venta': venta}
+
+        Venta.objects.bulk_create(nuevas_ventas)
+
+        # Detalles, movimientos y stock: una sentencia por tabla
+        stock_actual = {ps_id: ps.stock for ps_id, ps in productos.items()}
+        cambios = {}
+        detalles_venta = []
+        movimientos = []
+        for venta, detalles in zip(nuevas_ventas, lineas):
+            for ps, cantidad, precio_unitario, precio_final, descuento_unitario in detalles:
+                detalles_venta.append(DetalleVenta(
+                    venta=venta,
+                    producto=ps,
+                    **DetalleVenta.datos_producto(ps),
+                    cantidad=cantidad,
+                    precio_unitario=precio_unitario,
+                    precio_final=precio_final,
+                    descuento_unitario=descuento_unitario,
+                    descuento_porcentaje=venta.descuento_porcentaje,
+                    subtotal=precio_final * cantidad,
+                    tiene_iva=ps.producto.tiene_iva,
+                ))
+
+                cantidad_anterior = stock_actual[ps.id]
+                stock_actual[ps.id] = cantidad_anterior - cantidad
+                cambios[ps.id] = cambios.get(ps.id, Decimal('0')) - cantidad
+                movimientos.append(MovimientoInventario(
+                    producto_sucursal=ps,
+                    tipo='salida',
+                    cantidad=cantidad,
+                    cantidad_anterior=cantidad_anterior,
+                    cantidad_nueva=stock_actual[ps.id],
+                    motivo=f'Venta #{venta.folio}',
+                    usuario=usuario,
+                    referencia=f'VENTA-{venta.folio}',
+                ))
+
+        DetalleVenta.objects.bulk_create(detalles_venta)
+        MovimientoInventario.objects.bulk_create(movimientos)
+        actualizar_stock(cambios)
+
+        if corte:
+            corte.calcular_totales()
+
+        cubo.acumular(nuevas_ventas, {venta.id: len(detalles) for venta, detalles in zip(nuevas_ventas, lineas)})
+
+        # bulk_create y update() no mandan señales
+        metricas.invalidar(sucursal.id)
+
+    return resultados
+
+
+def registrar_venta(sucursal, usuario, items, corte=None, validar_precios=False, **datos):
+    """Registra una sola venta; lanza ErrorVenta si hay conflictos"""
+    datos['items'] = items
+    resultado = registrar_ventas(
+        sucursal, usuario, [datos],
+        corte=corte,
+        validar_precios=validar_precios
+    )[0]
+
+    if 'conflictos' in resultado:
+        raise ErrorVenta(resultado['conflictos'][0]['mensaje'], resultado['conflictos'])
+    return resultado['venta']
+
+
+# =========== CANCELACIÓN ===========
+def cancelar_ventas(ids, usuario, motivo='', sucursal=None):
+    """
+    Cancela un lote de ventas y devuelve su stock con un número fijo de
+    sentencias SQL: un UPDATE con CASE para el stock, un bulk_create de
+    movimientos y un UPDATE para las ventas. Los cortes abiertos que
+    incluían las ventas se recalculan. Todo o nada.
+
+    Las ventas ya canceladas (o de otra sucursal, si se indica `sucursal`)
+    se ignoran. Regresa la lista de ventas canceladas.
+    """
+    with transaction.atomic():
+        ventas = Venta.objects.select_for_update().filter(id__in=ids).exclude(estado='cancelada')
+        if sucursal is not None:
+            ventas = ventas.filter(sucursal=sucursal)
+        ventas = list(ventas.order_by('id'))
+        if not ventas:
+            return []
+
+        detalles = list(DetalleVenta.objects.filter(venta__in=ventas).values_list(
+            'venta_id', 'producto_id', 'cantidad'
+        ).order_by('venta_id', 'id'))
+        productos = _bloquear_productos(None, {ps_id for _, ps_id, _ in detalles})
+        folios = {venta.id: venta.folio for venta in ventas}
+
+        stock_actual = {ps_id: ps.stock for ps_id, ps in productos.items()}
+        cambios = {}
+        movimientos = []
+        for venta_id, ps_id, cantidad in detalles:
+            cantidad_anterior = stock_actual[ps_id]
+            stock_actual[ps_id] = cantidad_anterior + cantidad
+            cambios[ps_id] = cambios.get(ps_id, Decimal('0')) + cantidad
+            movimientos.append(MovimientoInventario(
+                producto_sucursal_id=ps_id,
+                tipo='entrada',
+                cantidad=cantidad,
+                cantidad_anterior=cantidad_anterior,
+                cantidad_nueva=stock_actual[ps_id],
+                motivo=f'Cancelación venta {folios[venta_id]}. {motivo}',
+                usuario=usuario,
+                referencia=f'CANCELACION-{folios[venta_id]}',
+            ))
+
+        MovimientoInventario.objects.bulk_create(movimientos)
+        actualizar_stock(cambios)
+
+        observaciones = f"Cancelada por {usuario.username}. {motivo}"
+        Venta.objects.filter(id__in=folios.keys()).update(
+            estado='cancelada',
+            observaciones=observaciones,
+            actualizado_por=usuario,
+            fecha_actualizacion=timezone.now()
+        )
+        for venta in ventas:
+            venta.estado = 'cancelada'
+            venta.observaciones = observaciones
+            venta.actualizado_por = usuario
+
+        # Los cortes cerrados conservan sus totales y su ResumenCorte
+        cortes = {venta.corte_id for venta in ventas if venta.corte_id}
+        for corte in CorteCaja.objects.filter(id__in=cortes, estado='abierto'):
+            corte.calcular_totales()
+
+        # Las ventas salen del cubo de ventas por hora
+        renglones = {}
+        for venta_id, _, _ in detalles:
+            renglones[venta_id] = renglones.get(venta_id, 0) + 1
+        cubo.acumular(ventas, renglones, signo=-1)
+
+        for sucursal_id in {venta.sucursal_id for venta in ventas}:
+            metricas.invalidar(sucursal_id)
+
+    return ventas
@@ -1,3 +1,203 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalogos.models import MovimientoInventario, Producto, ProductoSucursal
+from sucursales.models import Sucursal
+from usuarios.models import Usuario
+from .models import CorteCaja, DetalleVenta, Venta
+from .services import ErrorVenta, cancelar_ventas, registrar_venta, registrar_ventas
+
+
+class DatosVenta:
+    """Sucursal con un cajero y dos productos (stock 10, precio 20.00)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sucursal = Sucursal.objects.create(codigo='S1', nombre='Centro', direccion='Centro')
+        cls.otra_sucursal = Sucursal.objects.create(codigo='S2', nombre='Norte', direccion='Norte')
+        cls.cajero = Usuario.objects.create_user('cajero', 'cajero@x.com', 'x', rol='cajero', sucursal=cls.sucursal)
+        cls.productos = [
+            ProductoSucursal.objects.create(
+                producto=Producto.objects.create(codigo=f'P{i}', nombre=f'Producto {i}'),
+                sucursal=cls.sucursal,
+                precio_venta=Decimal('20.00'),
+                stock=Decimal('10'),
+            )
+            for i in range(2)
+        ]
+
+    def item(self, ps, cantidad, precio=None):
+        return {'id': ps.id, 'cantidad': Decimal(cantidad), 'precio': precio}
+
+    def stock(self, ps):
+        return ProductoSucursal.objects.get(pk=ps.pk).stock
+
+
+# =========== CHECKOUT ===========
+class RegistrarVentasTests(DatosVenta, TestCase):
+    def test_lote_descuenta_stock_y_asigna_folios_consecutivos(self):
+        p0, p1 = self.productos
+        resultados = registrar_ventas(self.sucursal, self.cajero, [
+            {'items': [self.item(p0, 3), self.item(p1, 1)]},
+            {'items': [self.item(p0, 2)]},
+        ])
+
+        ventas = [resultado['venta'] for resultado in resultados]
+        self.assertEqual(
+            [venta.folio[-6:] for venta in ventas], ['000001', '000002']
+        )
+        self.assertEqual(self.stock(p0), Decimal('5'))
+        self.assertEqual(self.stock(p1), Decimal('9'))
+        self.assertEqual(ventas[0].total, Decimal('80.00'))
+        self.assertEqual(DetalleVenta.objects.filter(venta=ventas[0]).count(), 2)
+
+        # Un movimiento por renglón, encadenado sobre el stock anterior
+        movimientos = list(MovimientoInventario.objects.filter(producto_sucursal=p0).order_by('id').values_list(
+            'cantidad_anterior', 'cantidad_nueva'
+        ))
+        self.assertEqual(movimientos, [(Decimal('10'), Decimal('7')), (Decimal('7'), Decimal('5'))])
+
+    def test_sobreventa_dentro_del_lote_se_reporta_sin_afectar_las_demas(self):
+        p0, _ = self.productos
+        resultados = registrar_ventas(self.sucursal, self.cajero, [
+            {'items': [self.item(p0, 8)]},
+            {'items': [self.item(p0, 5)]},
+        ])
+
+        self.assertIn('venta', resultados[0])
+        self.assertEqual(resultados[1]['conflictos'][0]['tipo'], 'stock')
+        self.assertEqual(resultados[1]['conflictos'][0]['disponible'], 2.0)
+        self.assertEqual(self.stock(p0), Decimal('2'))
+        self.assertEqual(Venta.objects.count(), 1)
+
+    def test_producto_inactivo_o_de_otra_sucursal(self):
+        p0, p1 = self.productos
+        ProductoSucursal.objects.filter(pk=p1.pk).update(activo=False)
+        ajeno = ProductoSucursal.objects.create(
+            producto=p0.producto, sucursal=self.otra_sucursal, precio_venta=Decimal('20.00'), stock=Decimal('10')
+        )
+
+        resultados = registrar_ventas(self.sucursal, self.cajero, [
+            {'items': [self.item(p1, 1)]},
+            {'items': [self.item(ajeno, 1)]},
+        ])
+
+        for resultado in resultados:
+            self.assertEqual(resultado['conflictos'][0]['tipo'], 'producto')
+        self.assertEqual(self.stock(p1), Decimal('10'))
+        self.assertEqual(self.stock(ajeno), Decimal('10'))
+        self.assertFalse(Venta.objects.exists())
+
+    def test_cambio_de_precio_es_conflicto_al_validar_precios(self):
+        p0, _ = self.productos
+        datos = {'items': [self.item(p0, 1, precio='18.00')]}
+
+        resultado = registrar_ventas(self.sucursal, self.cajero, [datos], validar_precios=True)[0]
+        self.assertEqual(resultado['conflictos'][0]['tipo'], 'precio')
+        self.assertEqual(self.stock(p0), Decimal('10'))
+
+        # Sin validar, se respeta el precio capturado
+        venta = registrar_ventas(self.sucursal, self.cajero, [datos])[0]['venta']
+        self.assertEqual(venta.total, Decimal('18.00'))
+
+    def test_registrar_venta_lanza_error_con_conflictos(self):
+        p0, _ = self.productos
+        with self.assertRaises(ErrorVenta) as error:
+            registrar_venta(self.sucursal, self.cajero, [self.item(p0, 11)])
+        self.assertEqual(error.exception.conflictos[0]['tipo'], 'stock')
+        self.assertEqual(self.stock(p0), Decimal('10'))
+
+
+# =========== CANCELACIÓN ===========
+class CancelarVentasTests(DatosVenta, TestCase):
+    def abrir_corte(self):
+        return CorteCaja.objects.create(sucursal=self.sucursal, usuario=self.cajero, fecha_inicio=timezone.now())
+
+    def test_devuelve_stock_con_movimientos_de_entrada(self):
+        p0, p1 = self.productos
+        venta = registrar_venta(self.sucursal, self.cajero, [self.item(p0, 3), self.item(p1, 2)])
+
+        canceladas = cancelar_ventas([venta.id], self.cajero, 'Devolución')
+
+        self.assertEqual([v.id for v in canceladas], [venta.id])
+        venta.refresh_from_db()
+        self.assertEqual(venta.estado, 'cancelada')
+        self.assertEqual(self.stock(p0), Decimal('10'))
+        self.assertEqual(self.stock(p1), Decimal('10'))
+        entradas = MovimientoInventario.objects.filter(referencia=f'CANCELACION-{venta.folio}', tipo='entrada')
+        self.assertEqual(
+            sorted(entradas.values_list('producto_sucursal_id', 'cantidad_anterior', 'cantidad_nueva')),
+            sorted([(p0.id, Decimal('7'), Decimal('10')), (p1.id, Decimal('8'), Decimal('10'))])
+        )
+
+        # Cancelar de nuevo no devuelve el stock otra vez
+        self.assertEqual(cancelar_ventas([venta.id], self.cajero), [])
+        self.assertEqual(self.stock(p0), Decimal('10'))
+
+    def test_recalcula_el_corte_abierto(self):
+        p0, _ = self.productos
+        corte = self.abrir_corte()
+        ventas = [
+            registrar_venta(self.sucursal, self.cajero, [self.item(p0, 1)], corte=corte)
+            for _ in range(2)
+        ]
+        corte.refresh_from_db()
+        self.assertEqual(corte.total_ventas, Decimal('40.00'))
+
+        cancelar_ventas([ventas[0].id], self.cajero)
+
+        corte.refresh_from_db()
+        self.assertEqual(corte.total_ventas, Decimal('20.00'))
+
+    def test_corte_cerrado_conserva_sus_totales(self):
+        p0, _ = self.productos
+        corte = self.abrir_corte()
+        venta = registrar_venta(self.sucursal, self.cajero, [self.item(p0, 1)], corte=corte)
+        CorteCaja.objects.filter(pk=corte.pk).update(estado='cerrado')
+
+        cancelar_ventas([venta.id], self.cajero)
+
+        corte.refresh_from_db()
+        self.assertEqual(corte.total_ventas, Decimal('20.00'))
+        self.assertEqual(self.stock(p0), Decimal('10'))
+
+    def test_omite_ventas_de_otra_sucursal(self):
+        p0, _ = self.productos
+        venta = registrar_venta(self.sucursal, self.cajero, [self.item(p0, 4)])
+
+        self.assertEqual(cancelar_ventas([venta.id], self.cajero, sucursal=self.otra_sucursal), [])
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.estado, 'completada')
+        self.assertEqual(self.stock(p0), Decimal('6'))
+        self.assertFalse(MovimientoInventario.objects.filter(tipo='entrada').exists())
+
+
+class CancelarVentasLoteTests(DatosVenta, TestCase):
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin', 'admin@x.com', 'x', rol='admin', sucursal=self.sucursal)
+        self.client.force_login(admin)
+
+    def cancelar_corte(self, corte):
+        return self.client.post(reverse('ventas_cancelar_lote'), {'corte': corte, 'motivo': 'Turno mal cobrado'})
+
+    def test_corte_no_numerico_no_es_error_del_servidor(self):
+        respuesta = self.cancelar_corte('abc')
+        self.assertRedirects(respuesta, reverse('ventas_lista'), fetch_redirect_response=False)
+
+    def test_corte_de_otra_sucursal_no_se_cancela(self):
+        p0, _ = self.productos
+        corte = CorteCaja.objects.create(sucursal=self.otra_sucursal, usuario=self.cajero, fecha_inicio=timezone.now())
+
+        self.assertEqual(self.cancelar_corte(corte.pk).status_code, 404)
 
-# Create your tests here.
+        corte = CorteCaja.objects.create(sucursal=self.sucursal, usuario=self.cajero, fecha_inicio=timezone.now())
+        venta = registrar_venta(self.sucursal, self.cajero, [self.item(p0, 2)], corte=corte)
+        self.assertRedirects(
+            self.cancelar_corte(corte.pk), reverse('corte_caja_detalle', args=[corte.pk]), fetch_redirect_response=False
+        )
+        venta.refresh_from_db()
+        self.assertEqual(venta.estado, 'cancelada')
@@ -0,0 +1,383 @@
+"""
+Tickets de venta: ESC/POS para impresoras térmicas y PDF compacto.
+
+Los dos formatos salen de los mismos renglones de texto (`renglones_venta`):
+
+- El encabezado de cada sucursal (logo y datos) se precompila una sola vez
+  y se guarda en caché. La llave lleva `fecha_actualizacion`, así que
+  editar la sucursal lo regenera.
+- Una venta completada o cancelada ya no cambia: su ticket se guarda en
+  caché y las reimpresiones no vuelven a generarlo.
+- `flujo_escpos` y `flujo_pdf` generan muchos tickets por lotes para la
+  reimpresión masiva sin cargar todas las ventas en memoria.
+
+El PDF se escribe a mano (Courier, sin fuentes incrustadas) para no
+depender de otra librería; el logo usa Pillow, que ya requiere ImageField.
+"""
+import textwrap
+import zlib
+from collections import namedtuple
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils import timezone
+from PIL import Image
+
+ANCHO = 42             # caracteres por renglón (papel de 80 mm)
+LOGO_PUNTOS = 384      # ancho máximo del logo en puntos de la impresora (203 dpi)
+TIEMPO_CACHE = 60 * 60 * 24 * 30
+
+Renglon = namedtuple('Renglon', 'texto alineacion negrita grande', defaults=('i', False, False))
+
+
+# =========== RENGLONES ===========
+def _dinero(valor):
+    return f"${Decimal(valor or 0):,.2f}"
+
+
+def _columnas(izquierda, derecha, ancho=ANCHO):
+    """Texto a la izquierda y a la derecha del mismo renglón"""
+    izquierda = izquierda[:max(ancho - len(derecha) - 1, 0)]
+    return f"{izquierda}{' ' * (ancho - len(izquierda) - len(derecha))}{derecha}"
+
+
+def _partir(texto, alineacion='i', negrita=False, grande=False):
+    ancho = ANCHO // 2 if grande else ANCHO
+    return [
+        Renglon(linea, alineacion, negrita, grande)
+        for linea in (textwrap.wrap(texto, ancho) or [''])
+    ]
+
+
+def _separador():
+    return Renglon('-' * ANCHO)
+
+
+def renglones_encabezado(sucursal):
+    renglones = _partir(sucursal.nombre.upper(), 'c', True, True)
+    if sucursal.direccion_completa:
+        renglones += _partir(sucursal.direccion_completa, 'c')
+    if sucursal.telefono:
+        renglones.append(Renglon(f"Tel: {sucursal.telefono}", 'c'))
+    if sucursal.rfc:
+        renglones.append(Renglon(f"RFC: {sucursal.rfc}", 'c'))
+    return renglones
+
+
+def renglones_venta(venta, detalles=None):
+    """Cuerpo del ticket: datos de la venta, partidas, totales y pie"""
+    detalles = venta.detalles.all() if detalles is None else detalles
+    usuario = venta.usuario
+
+    renglones = [
+        _separador(),
+        Renglon(f"Folio: {venta.folio}", 'i', True),
+        Renglon(f"Fecha: {timezone.localtime(venta.fecha):%d/%m/%Y %H:%M}"),
+        Renglon(f"Cajero: {usuario.get_full_name() or usuario.username}"[:ANCHO]),
+        Renglon(f"Cliente: {venta.nombre_cliente}"[:ANCHO]),
+        _separador(),
+    ]
+
+    for detalle in detalles:
+        renglones += _partir(f"{detalle.producto_codigo} {detalle.producto_nombre}")
+        cantidad = f"{detalle.cantidad.normalize():f} {detalle.producto_unidad}".rstrip()
+        renglones.append(Renglon(_columnas(
+            f"  {cantidad} x {_dinero(detalle.precio_final)}",
+            _dinero(detalle.subtotal)
+        )))
+        if detalle.descuento_unitario > 0:
+            renglones.append(Renglon(_columnas(
+                f"  Desc. {detalle.descuento_porcentaje:.0f}%",
+                f"-{_dinero(detalle.descuento_unitario * detalle.cantidad)}"
+            )))
+
+    renglones.append(_separador())
+    renglones.append(Renglon(_columnas('Subtotal:', _dinero(venta.subtotal))))
+    if venta.descuento_total > 0:
+        renglones.append(Renglon(_columnas('Descuento:', f"-{_dinero(venta.descuento_total)}")))
+    renglones.append(Renglon(_columnas('TOTAL:', _dinero(venta.total), ANCHO // 2), 'i', True, True))
+    renglones.append(Renglon(_columnas('Forma de pago:', venta.get_forma_pago_display())))
+    if venta.forma_pago == 'efectivo' and venta.efectivo_recibido > 0:
+        renglones.append(Renglon(_columnas('Efectivo:', _dinero(venta.efectivo_recibido))))
+        renglones.append(Renglon(_columnas('Cambio:', _dinero(venta.cambio))))
+
+    if venta.estado == 'cancelada':
+        renglones.append(_separador())
+        renglones.append(Renglon('*** VENTA CANCELADA ***', 'c', True))
+
+    renglones.append(_separador())
+    renglones.append(Renglon('¡Gracias por su compra!', 'c'))
+    return renglones
+
+
+# =========== LOGO ===========
+def _cargar_logo(sucursal):
+    """Logo en escala de grises, ancho múltiplo de 8 y a lo más LOGO_PUNTOS"""
+    if not sucursal.logo:
+        return None
+    try:
+        with sucursal.logo.open('rb') as archivo:
+            imagen = Image.open(archivo)
+            imagen.load()
+    except (OSError, ValueError):
+        return None
+
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        fondo = Image.new('RGBA', imagen.size, 'white')
+        imagen = Image.alpha_composite(fondo, imagen.convert('RGBA'))
+    imagen = imagen.convert('L')
+
+    ancho = min(imagen.width, LOGO_PUNTOS) // 8 * 8
+    if ancho == 0:
+        return None
+    alto = max(round(imagen.height * ancho / imagen.width), 1)
+    return imagen.resize((ancho, alto))
+
+
+def _logo_escpos(imagen):
+    """Comando de imagen raster (GS v 0), 1 = punto negro"""
+    if imagen is None:
+        return b''
+    bits = bytes(b ^ 0xFF for b in imagen.convert('1').tobytes())
+    ancho_bytes = imagen.width // 8
+    return (
+        b'\x1ba\x01'
+        + b'\x1dv0\x00'
+        + bytes([ancho_bytes % 256, ancho_bytes // 256, imagen.height % 256, imagen.height // 256])
+        + bits
+        + b'\n'
+    )
+
+
+def _logo_pdf(imagen):
+    """(ancho, alto, datos comprimidos) para un XObject DeviceGray"""
+    if imagen is None:
+        return None
+    return imagen.width, imagen.height, zlib.compress(imagen.tobytes())
+
+
+def encabezado(sucursal):
+    """Encabezado precompilado de la sucursal (ESC/POS, renglones y logo para PDF)"""
+    clave = f'ticket:encabezado:{sucursal.pk}:{sucursal.fecha_actualizacion.timestamp()}'
+    datos = cache.get(clave)
+    if datos is None:
+        renglones = renglones_encabezado(sucursal)
+        logo = _cargar_logo(sucursal)
+        datos = {
+            'escpos': _logo_escpos(logo) + _escpos(renglones),
+            'renglones': renglones,
+            'logo': _logo_pdf(logo),
+        }
+        cache.set(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+# =========== ESC/POS ===========
+INICIO = b'\x1b@' + b'\x1bt\x10'     # reiniciar + página de códigos WPC1252
+CORTE = b'\x1bd\x04' + b'\x1dVB\x00'  # avanzar y corte parcial
+ALINEACION = {'i': 0, 'c': 1, 'd': 2}
+
+
+def _escpos(renglones):
+    salida = bytearray()
+    for renglon in renglones:
+        salida += b'\x1ba' + bytes([ALINEACION[renglon.alineacion]])
+        salida += b'\x1bE' + (b'\x01' if renglon.negrita else b'\x00')
+        salida += b'\x1d!' + (b'\x11' if renglon.grande else b'\x00')
+        salida += renglon.texto.encode('cp1252', errors='replace') + b'\n'
+    salida += b'\x1ba\x00\x1bE\x00\x1d!\x00'
+    return bytes(salida)
+
+
+def _generar_escpos(venta, detalles=None):
+    return INICIO + encabezado(venta.sucursal)['escpos'] + _escpos(renglones_venta(venta, detalles)) + CORTE
+
+
+# =========== PDF ===========
+PUNTOS_MM = 72 / 25.4
+ANCHO_PAGINA = 80 * PUNTOS_MM
+MARGEN = 8
+TAMANO = 8          # Courier: cada carácter mide 0.6 del tamaño
+TAMANO_GRANDE = 14
+INTERLINEADO = 1.25
+
+
+def _texto_pdf(texto):
+    datos = texto.encode('cp1252', errors='replace')
+    return datos.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+class DocumentoPdf:
+    """
+    Escritor PDF mínimo de páginas del ancho del ticket. Cada método regresa
+    los bytes a escribir, así que se puede mandar por partes.
+    """
+    CATALOGO, PAGINAS, FUENTE, FUENTE_NEGRITA = 1, 2, 3, 4
+
+    def __init__(self):
+        self.posicion = 0
+        self.desplazamientos = {}
+        self.siguiente = 5
+        self.paginas = []
+        self.logos = {}
+
+    def _objeto(self, numero, contenido):
+        self.desplazamientos[numero] = self.posicion
+        datos = b'%d 0 obj\n' % numero + contenido + b'\nendobj\n'
+        self.posicion += len(datos)
+        return datos
+
+    def _nuevo(self):
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    def _flujo(self, numero, diccionario, datos):
+        return self._objeto(
+            numero,
+            b'<< ' + diccionario + b' /Length %d >>\nstream\n' % len(datos) + datos + b'\nendstream'
+        )
+
+    def inicio(self):
+        cabecera = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.posicion = len(cabecera)
+        return cabecera + b''.join(
+            self._objeto(numero, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % fuente)
+            for numero, fuente in ((self.FUENTE, b'Courier'), (self.FUENTE_NEGRITA, b'Courier-Bold'))
+        )
+
+    def pagina(self, clave_logo, logo, renglones):
+        """Agrega una página con el logo (compartido entre páginas) y los renglones"""
+        salida = b''
+        logo_objeto = None
+        if logo is not None:
+            logo_objeto = self.logos.get(clave_logo)
+            if logo_objeto is None:
+                logo_objeto = self.logos[clave_logo] = self._nuevo()
+                ancho, alto, datos = logo
+                salida += self._flujo(logo_objeto, (
+                    b'/Type /XObject /Subtype /Image /Width %d /Height %d '
+                    b'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode' % (ancho, alto)
+                ), datos)
+
+        ancho_logo = alto_logo = 0
+        if logo is not None:
+            ancho_logo = min(logo[0] * 72 / 203, ANCHO_PAGINA - 2 * MARGEN)
+            alto_logo = logo[1] * ancho_logo / logo[0]
+
+        alto_renglones = sum(
+            (TAMANO_GRANDE if renglon.grande else TAMANO) * INTERLINEADO for renglon in renglones
+        )
+        alto = 2 * MARGEN + alto_logo + (4 if alto_logo else 0) + alto_renglones
+
+        contenido = []
+        y = alto - MARGEN
+        if logo_objeto:
+            y -= alto_logo
+            contenido.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /Logo Do Q' % (
+                ancho_logo, alto_logo, (ANCHO_PAGINA - ancho_logo) / 2, y
+            ))
+            y -= 4
+
+        for renglon in renglones:
+            tamano = TAMANO_GRANDE if renglon.grande else TAMANO
+            y -= tamano * INTERLINEADO
+            ancho_texto = len(renglon.texto) * tamano * 0.6
+            if renglon.alineacion == 'c':
+                x = (ANCHO_PAGINA - ancho_texto) / 2
+            elif renglon.alineacion == 'd':
+                x = ANCHO_PAGINA - MARGEN - ancho_texto
+            else:
+                x = MARGEN
+            contenido.append(b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (
+                b'F2' if renglon.negrita else b'F1', tamano, x, y + tamano * 0.2, _texto_pdf(renglon.texto)
+            ))
+
+        contenido_objeto = self._nuevo()
+        salida += self._flujo(contenido_objeto, b'/Filter /FlateDecode', zlib.compress(b'\n'.join(contenido)))
+
+        recursos = b'/Font << /F1 %d 0 R /F2 %d 0 R >>' % (self.FUENTE, self.FUENTE_NEGRITA)
+        if logo_objeto:
+            recursos += b' /XObject << /Logo %d 0 R >>' % logo_objeto
+
+        pagina = self._nuevo()
+        self.paginas.append(pagina)
+        salida += self._objeto(pagina, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources << %s >> /Contents %d 0 R >>'
+            % (self.PAGINAS, ANCHO_PAGINA, alto, recursos, contenido_objeto)
+        ))
+        return salida
+
+    def fin(self):
+        salida = self._objeto(self.PAGINAS, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % pagina for pagina in self.paginas), len(self.paginas)
+        ))
+        salida += self._objeto(self.CATALOGO, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGINAS)
+
+        inicio_xref = self.posicion
+        total = self.siguiente
+        salida += b'xref\n0 %d\n0000000000 65535 f \n' % total
+        salida += b''.join(b'%010d 00000 n \n' % self.desplazamientos[numero] for numero in range(1, total))
+        salida += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            total, self.CATALOGO, inicio_xref
+        )
+        return salida
+
+
+def _pagina_venta(documento, venta, detalles=None):
+    datos = encabezado(venta.sucursal)
+    return documento.pagina(
+        venta.sucursal_id, datos['logo'], datos['renglones'] + renglones_venta(venta, detalles)
+    )
+
+
+def _generar_pdf(venta, detalles=None):
+    documento = DocumentoPdf()
+    return documento.inicio() + _pagina_venta(documento, venta, detalles) + documento.fin()
+
+
+# =========== API ===========
+def _con_cache(formato, generar, venta, detalles=None):
+    """Las ventas cerradas (completadas o canceladas) no cambian: se cachean"""
+    if venta.estado == 'pendiente':
+        return generar(venta, detalles)
+
+    clave = (
+        f'ticket:{formato}:{venta.pk}:{venta.estado}:'
+        f'{venta.sucursal.fecha_actualizacion.timestamp()}'
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        datos = generar(venta, detalles)
+        cache.set(clave, datos, TIEMPO_CACHE)
+    return datos
+
+
+def ticket_escpos(venta, detalles=None):
+    return _con_cache('escpos', _generar_escpos, venta, detalles)
+
+
+def ticket_pdf(venta, detalles=None):
+    return _con_cache('pdf', _generar_pdf, venta, detalles)
+
+
+def ventas_para_ticket(ventas):
+    """Agrega lo que necesitan los renglones del ticket sin consultas por venta"""
+    return ventas.select_related('sucursal', 'usuario', 'cliente').prefetch_related(
+        'detalles'
+    )
+
+
+def flujo_escpos(ventas, lote=100):
+    """Tickets ESC/POS de `ventas` uno tras otro (con corte entre ellos)"""
+    for venta in ventas_para_ticket(ventas).iterator(chunk_size=lote):
+        yield ticket_escpos(venta)
+
+
+def flujo_pdf(ventas, lote=100):
+    """Un PDF con un ticket por página, escrito conforme se leen las ventas"""
+    documento = DocumentoPdf()
+    yield documento.inicio()
+    for venta in ventas_para_ticket(ventas).iterator(chunk_size=lote):
+        yield _pagina_venta(documento, venta)
+    yield documento.fin()
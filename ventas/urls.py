@@ -14,7 +14,9 @@ urlpatterns = [
     path('limpiar/', views.limpiar_carrito, name='venta_limpiar'),
     path('<int:pk>/', views.detalle_venta, name='venta_detalle'),
     path('<int:pk>/cancelar/', views.cancelar_venta, name='venta_cancelar'),
+    path('cancelar-lote/', views.cancelar_ventas_lote, name='ventas_cancelar_lote'),
     path('<int:pk>/ticket/', views.generar_ticket, name='venta_ticket'),
+    path('tickets/reimprimir/', views.reimprimir_tickets, name='ventas_reimprimir_tickets'),
     
     # =========== CORTES DE CAJA ===========
     path('cortes/', views.cortes_caja_lista, name='cortes_caja_lista'),
@@ -25,6 +27,7 @@ urlpatterns = [
     
     # =========== REPORTES ===========
     path('reportes/', views.reporte_ventas, name='reporte_ventas'),
+    path('reportes/mapa-calor/', views.reporte_mapa_calor, name='reporte_mapa_calor'),
     
     # =========== AJAX ===========
     path('ajax/producto-info/', views.get_producto_info, name='ajax_producto_info'),
@@ -1,8 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.db import transaction
 from django.db.models import Q, Sum, Count, Avg
 from django.core.paginator import Paginator
@@ -14,9 +15,16 @@ from datetime import datetime, timedelta
 from usuarios.decorators import puede_eliminar_ventas
 
 from .models import Venta, DetalleVenta, CorteCaja
+from .services import cancelar_ventas, corte_abierto
 from catalogos.models import ProductoSucursal, Cliente, MovimientoInventario
+from catalogos.categorias import ventas_por_categoria
 from sucursales.models import Sucursal
+from agrofeed_pv.particiones import rango_fechas, filtro_poda
+from agrofeed_pv.routers import usa_base_reportes, alias_lectura
+from agrofeed_pv.cargas import clase_carga, COBRO, REPORTE, EXPORTACION
+from archivo.consultas import periodo_archivado, reporte_archivado, combinar_reporte, resumen_clientes
 from .decorators import admin_required, superadmin_required
+from . import cubo, tickets
 
 # =========== FUNCIONES HELPER ===========
 def usuario_puede_editar_descuento(user):
@@ -113,6 +121,7 @@ def nueva_venta(request):
 @login_required
 @admin_required
 @csrf_exempt
+@clase_carga(COBRO)
 def agregar_item(request):
     """Agregar producto al carrito"""
     if request.method == 'POST':
@@ -196,6 +205,7 @@ def agregar_item(request):
 @login_required
 @admin_required
 @csrf_exempt
+@clase_carga(COBRO)
 def remover_item(request):
     """Remover producto del carrito"""
     if request.method == 'POST':
@@ -242,6 +252,7 @@ def remover_item(request):
 @login_required
 @admin_required
 @csrf_exempt
+@clase_carga(COBRO)
 def actualizar_cantidad(request):
     """Actualizar cantidad de producto en carrito"""
     if request.method == 'POST':
@@ -376,12 +387,12 @@ def seleccionar_cliente(request):
 
 @login_required
 @csrf_exempt
-def buscar_cliente(request):
-    """Búsqueda rápida de clientes"""
+async def buscar_cliente(request):
+    """Búsqueda rápida de clientes (async: se llama mientras se escribe)"""
     if request.method == 'GET':
         query = request.GET.get('q', '')
         
-        clientes = Cliente.objects.filter(
+        clientes = [cliente async for cliente in Cliente.objects.filter(
             Q(codigo__icontains=query) |
             Q(nombre__icontains=query) |
             Q(apellido__icontains=query) |
@@ -389,10 +400,25 @@ def buscar_cliente(request):
             Q(email__icontains=query) |
             Q(rfc__icontains=query),
             activo=True
-        ).order_by('nombre', 'apellido')[:10]
+        ).order_by('nombre', 'apellido')[:10]]
+        
+        # Compras de los 10 clientes en dos consultas agrupadas (activas y
+        # archivadas) en lugar de las propiedades total_compras y
+        # monto_total_compras, que consultan por cliente
+        ids = [cliente.id for cliente in clientes]
+        compras = {
+            fila['cliente_id']: fila
+            async for fila in Venta.objects.filter(cliente_id__in=ids).values('cliente_id').annotate(
+                conteo=Count('id'),
+                total=Sum('total')
+            ).order_by()
+        }
+        archivadas = {fila['cliente_id']: fila async for fila in resumen_clientes(ids)}
         
         results = []
         for cliente in clientes:
+            activas = compras.get(cliente.id, {})
+            anteriores = archivadas.get(cliente.id, {})
             results.append({
                 'id': cliente.id,
                 'codigo': cliente.codigo,
@@ -405,8 +431,8 @@ def buscar_cliente(request):
                 'descuento': float(cliente.porcentaje_descuento),
                 'direccion': cliente.direccion_facturacion,
                 'fecha_registro': cliente.fecha_registro.strftime('%d/%m/%Y'),
-                'total_compras': cliente.total_compras,
-                'monto_total_compras': float(cliente.monto_total_compras)
+                'total_compras': activas.get('conteo', 0) + anteriores.get('conteo', 0),
+                'monto_total_compras': float((activas.get('total') or 0) + (anteriores.get('total') or 0))
             })
         
         return JsonResponse({'clientes': results})
@@ -415,6 +441,7 @@ def buscar_cliente(request):
 
 @login_required
 @admin_required
+@clase_carga(COBRO)
 def finalizar_venta(request):
     """Procesar y finalizar la venta"""
     if request.method == 'POST':
@@ -453,11 +480,15 @@ def finalizar_venta(request):
                 efectivo_recibido = Decimal(request.POST.get('efectivo_recibido', 0))
                 observaciones = request.POST.get('observaciones', '')
                 
+                # Corte de caja actual (si existe)
+                corte_actual = corte_abierto(sucursal, request.user)
+                
                 # Crear venta
                 venta = Venta.objects.create(
                     sucursal=sucursal,
                     usuario=request.user,
                     cliente=cliente,
+                    corte=corte_actual,
                     subtotal=subtotal,
                     descuento_total=descuento_total,
                     descuento_porcentaje=descuento_porcentaje,
@@ -471,7 +502,7 @@ def finalizar_venta(request):
                 # Crear detalles de venta y actualizar stock
                 for item in carrito:
                     producto_sucursal = get_object_or_404(
-                        ProductoSucursal,
+                        ProductoSucursal.objects.select_related('producto__unidad_medida'),
                         id=item['id'],
                         sucursal=sucursal
                     )
@@ -493,7 +524,7 @@ def finalizar_venta(request):
                     # Registrar movimiento de inventario
                     cantidad_anterior = producto_sucursal.stock
                     producto_sucursal.stock -= cantidad
-                    producto_sucursal.save()
+                    producto_sucursal.save(update_fields=['stock', 'ultima_actualizacion'])
                     
                     MovimientoInventario.objects.create(
                         producto_sucursal=producto_sucursal,
@@ -510,6 +541,7 @@ def finalizar_venta(request):
                     detalle_data = {
                         'venta': venta,
                         'producto': producto_sucursal,
+                        **DetalleVenta.datos_producto(producto_sucursal),
                         'cantidad': cantidad,
                         'precio_unitario': precio_unitario,
                         'precio_final': precio_final,
@@ -524,17 +556,12 @@ def finalizar_venta(request):
                     
                     DetalleVenta.objects.create(**detalle_data)
                 
-                # Actualizar corte de caja actual si existe
-                corte_actual = CorteCaja.objects.filter(
-                    sucursal=sucursal,
-                    estado='abierto',
-                    usuario=request.user
-                ).first()
-                
-                if corte_actual and hasattr(corte_actual, 'ventas_incluidas'):
-                    corte_actual.ventas_incluidas.add(venta)
-                    if hasattr(corte_actual, 'calcular_totales'):
-                        corte_actual.calcular_totales()
+                # Actualizar totales del corte
+                if corte_actual:
+                    corte_actual.calcular_totales()
+
+                # Cubo de ventas por hora (mapa de calor)
+                cubo.acumular([venta], {venta.id: len(carrito)})
                 
                 # Limpiar sesión
                 if 'carrito' in request.session:
@@ -570,6 +597,7 @@ def limpiar_carrito(request):
     return redirect('venta_nueva')
 
 @login_required
+@usa_base_reportes
 def lista_ventas(request):
     """Lista de todas las ventas"""
     sucursal = request.user.sucursal
@@ -602,11 +630,12 @@ def lista_ventas(request):
     if cliente_id:
         ventas = ventas.filter(cliente_id=cliente_id)
     
-    if fecha_inicio:
-        ventas = ventas.filter(fecha__date__gte=fecha_inicio)
+    desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
+    if desde:
+        ventas = ventas.filter(fecha__gte=desde)
     
-    if fecha_fin:
-        ventas = ventas.filter(fecha__date__lte=fecha_fin)
+    if hasta:
+        ventas = ventas.filter(fecha__lt=hasta)
     
     # Ordenar
     ventas = ventas.order_by('-fecha')
@@ -616,16 +645,19 @@ def lista_ventas(request):
     ventas_completadas = ventas.filter(estado='completada').count()
     ventas_canceladas = ventas.filter(estado='cancelada').count()
     
+    hoy = timezone.localdate()
+    inicio_hoy, fin_hoy = rango_fechas(hoy, hoy)
     total_hoy = ventas.filter(
-        fecha__date=timezone.now().date(),
+        fecha__gte=inicio_hoy,
+        fecha__lt=fin_hoy,
         estado='completada'
     ).aggregate(
         total=Sum('total')
     )['total'] or 0
     
+    inicio_mes, _ = rango_fechas(hoy.replace(day=1))
     total_mes = ventas.filter(
-        fecha__month=timezone.now().month,
-        fecha__year=timezone.now().year,
+        fecha__gte=inicio_mes,
         estado='completada'
     ).aggregate(
         total=Sum('total')
@@ -674,7 +706,7 @@ def detalle_venta(request, pk):
         messages.error(request, "Esta venta no pertenece a tu sucursal")
         return redirect('ventas_lista')
     
-    detalles = venta.detalles.all().select_related('producto__producto')
+    detalles = venta.detalles.all()
     
     # Calcular IVA
     iva_total = Decimal('0')
@@ -707,47 +739,72 @@ def cancelar_venta(request, pk):
     
     if request.method == 'POST':
         motivo = request.POST.get('motivo', '')
-        
-        # Usar el método cancelar del modelo si existe
-        if hasattr(venta, 'cancelar'):
-            if venta.cancelar(request.user, motivo):
-                messages.success(request, f'Venta cancelada exitosamente')
-            else:
-                messages.error(request, 'Error al cancelar la venta')
-        else:
-            # Implementación básica si no existe el método
-            try:
-                with transaction.atomic():
-                    # Restaurar stock
-                    for detalle in venta.detalles.all():
-                        producto_sucursal = detalle.producto
-                        producto_sucursal.stock += detalle.cantidad
-                        producto_sucursal.save()
-                    
-                    # Marcar como cancelada
-                    venta.estado = 'cancelada'
-                    venta.save()
-                    
-                    messages.success(request, f'Venta cancelada exitosamente')
-            except Exception as e:
-                messages.error(request, f'Error al cancelar: {str(e)}')
+        try:
+            cancelar_ventas([venta.pk], request.user, motivo)
+            messages.success(request, 'Venta cancelada exitosamente')
+        except Exception as e:
+            messages.error(request, f'Error al cancelar: {str(e)}')
         
         return redirect('venta_detalle', pk=venta.pk)
     
     return render(request, 'ventas/cancelar.html', {'venta': venta})
 
+@login_required
+@puede_eliminar_ventas
+@require_POST
+def cancelar_ventas_lote(request):
+    """
+    Cancela de una vez las ventas marcadas en el historial o todas las de un
+    corte (p. ej. un turno mal cobrado). Un admin sólo cancela ventas de su
+    sucursal.
+    """
+    motivo = request.POST.get('motivo', '').strip()
+    ids = [int(pk) for pk in request.POST.getlist('ventas') if pk.isdigit()]
+    destino = redirect('ventas_lista')
+    corte_id = request.POST.get('corte', '')
+    if corte_id:
+        if not corte_id.isdigit():
+            messages.error(request, 'Corte inválido')
+            return destino
+        cortes = CorteCaja.objects.all()
+        if request.user.sucursal:
+            cortes = cortes.filter(sucursal=request.user.sucursal)
+        corte = get_object_or_404(cortes, pk=int(corte_id))
+        ids = list(corte.ventas_incluidas.values_list('id', flat=True))
+        destino = redirect('corte_caja_detalle', pk=corte.pk)
+
+    if not ids:
+        messages.warning(request, 'No se seleccionaron ventas')
+        return destino
+    if not motivo:
+        messages.error(request, 'Indica el motivo de la cancelación')
+        return destino
+
+    try:
+        canceladas = cancelar_ventas(ids, request.user, motivo, sucursal=request.user.sucursal)
+    except Exception as e:
+        messages.error(request, f'Error al cancelar: {str(e)}')
+        return destino
+
+    omitidas = len(ids) - len(canceladas)
+    mensaje = f'{len(canceladas)} ventas canceladas'
+    if omitidas:
+        mensaje += f' ({omitidas} ya estaban canceladas o no son de tu sucursal)'
+    messages.success(request, mensaje)
+    return destino
+
 @login_required
 @admin_required
 def generar_ticket(request, pk):
     """Generar ticket de venta"""
-    venta = get_object_or_404(Venta, pk=pk)
+    venta = get_object_or_404(Venta.objects.select_related('sucursal', 'usuario', 'cliente'), pk=pk)
     
     # Verificar permisos
     if request.user.sucursal and request.user.sucursal != venta.sucursal:
         messages.error(request, "Esta venta no pertenece a tu sucursal")
         return redirect('ventas_lista')
     
-    detalles = venta.detalles.all().select_related('producto__producto')
+    detalles = venta.detalles.all()
     
     # Calcular IVA
     iva_total = Decimal('0')
@@ -762,15 +819,58 @@ def generar_ticket(request, pk):
     }
     
     # Para impresión directa
-    if request.GET.get('print') == '1':
-        response = HttpResponse(content_type='application/pdf')
-        folio_text = venta.folio if hasattr(venta, "folio") else venta.id
-        response['Content-Disposition'] = f'attachment; filename="ticket-{folio_text}.pdf"'
-        # Aquí puedes agregar generación de PDF si tienes una librería
+    if request.GET.get('print') == '1' or request.GET.get('formato') == 'pdf':
+        response = HttpResponse(tickets.ticket_pdf(venta, detalles), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="ticket-{venta.folio}.pdf"'
+        return response
+
+    if request.GET.get('formato') == 'escpos':
+        response = HttpResponse(tickets.ticket_escpos(venta, detalles), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="ticket-{venta.folio}.bin"'
         return response
     
     return render(request, 'ventas/ticket.html', context)
 
+@login_required
+@admin_required
+@usa_base_reportes
+@clase_carga(EXPORTACION)
+def reimprimir_tickets(request):
+    """Reimpresión de los tickets de un rango de fechas (PDF o ESC/POS) en streaming"""
+    sucursal = request.user.sucursal
+    if not sucursal:
+        messages.error(request, "No tienes una sucursal asignada")
+        return redirect('dashboard')
+
+    hoy = timezone.localdate()
+    inicio, fin = rango_fechas(
+        request.GET.get('fecha_inicio') or hoy,
+        request.GET.get('fecha_fin') or hoy
+    )
+    if not inicio or not fin:
+        messages.error(request, "Rango de fechas inválido")
+        return redirect('ventas_lista')
+
+    # El contenido se genera después de salir de la vista: fijar la base de lectura
+    ventas = Venta.objects.using(alias_lectura()).filter(
+        sucursal=sucursal,
+        fecha__gte=inicio,
+        fecha__lt=fin
+    ).exclude(estado='pendiente').order_by('fecha', 'id')
+
+    estado = request.GET.get('estado')
+    if estado in ('completada', 'cancelada'):
+        ventas = ventas.filter(estado=estado)
+
+    nombre = f"tickets-{sucursal.codigo}-{inicio:%Y%m%d}-{(fin - timedelta(days=1)):%Y%m%d}"
+    if request.GET.get('formato') == 'escpos':
+        response = StreamingHttpResponse(tickets.flujo_escpos(ventas), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{nombre}.bin"'
+    else:
+        response = StreamingHttpResponse(tickets.flujo_pdf(ventas), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="{nombre}.pdf"'
+    return response
+
 # =========== CORTES DE CAJA ===========
 @login_required
 @admin_required
@@ -803,12 +903,18 @@ def cortes_caja_lista(request):
     if fecha_fin:
         cortes = cortes.filter(fecha_inicio__date__lte=fecha_fin)
     
-    cortes = cortes.order_by('-fecha_inicio')
+    # Los cerrados muestran su resumen congelado (sin agregar sus ventas)
+    cortes = cortes.select_related('usuario', 'resumen').order_by('-fecha_inicio')
     
     # Estadísticas
-    cortes_abiertos = cortes.filter(estado='abierto').count()
-    cortes_cerrados = cortes.filter(estado='cerrado').count()
-    cortes_verificados = cortes.filter(estado='verificado').count()
+    conteos = cortes.aggregate(
+        abiertos=Count('id', filter=Q(estado='abierto')),
+        cerrados=Count('id', filter=Q(estado='cerrado')),
+        verificados=Count('id', filter=Q(estado='verificado')),
+    )
+    cortes_abiertos = conteos['abiertos']
+    cortes_cerrados = conteos['cerrados']
+    cortes_verificados = conteos['verificados']
     
     # Paginación
     paginator = Paginator(cortes, 20)
@@ -871,38 +977,25 @@ def corte_caja_nuevo(request):
 @admin_required
 def corte_caja_detalle(request, pk):
     """Detalle de corte de caja"""
-    corte = get_object_or_404(CorteCaja, pk=pk)
+    corte = get_object_or_404(CorteCaja.objects.select_related('sucursal', 'usuario', 'resumen'), pk=pk)
     
     # Verificar permisos
     if request.user.sucursal and request.user.sucursal != corte.sucursal:
         messages.error(request, "Este corte no pertenece a tu sucursal")
         return redirect('cortes_caja_lista')
     
-    # Obtener ventas del corte
+    # Cerrado: el resumen congelado al cerrar; abierto: calculado al momento
+    resumen = corte.resumen_vigente()
+    
+    # Las ventas en curso sólo se listan mientras el corte está abierto
     ventas = []
-    if hasattr(corte, 'ventas_incluidas'):
-        ventas = corte.ventas_incluidas.all().order_by('-fecha')
-    else:
-        # Alternativa: buscar ventas en el rango del corte
-        ventas = Venta.objects.filter(
-            sucursal=corte.sucursal,
-            usuario=corte.usuario,
-            fecha__gte=corte.fecha_inicio,
-            fecha__lte=corte.fecha_fin if corte.fecha_fin else timezone.now()
-        ).order_by('-fecha')
-    
-    # Calcular estadísticas
-    ventas_por_forma_pago = []
-    if ventas:
-        ventas_por_forma_pago = ventas.values('forma_pago').annotate(
-            total=Sum('total'),
-            count=Count('id')
-        )
+    if corte.estado == 'abierto':
+        ventas = corte.ventas_incluidas.select_related('cliente').order_by('-fecha')
     
     context = {
         'corte': corte,
+        'resumen': resumen,
         'ventas': ventas,
-        'ventas_por_forma_pago': ventas_por_forma_pago,
         'puede_cerrar': corte.estado == 'abierto' and request.user == corte.usuario,
         'puede_verificar': corte.estado == 'cerrado' and usuario_es_admin(request.user),
     }
@@ -950,22 +1043,10 @@ def corte_caja_cerrar(request, pk):
             messages.error(request, f'Error: {str(e)}')
     
     # Calcular total esperado en efectivo
-    ventas_efectivo = []
-    if hasattr(corte, 'ventas_incluidas'):
-        ventas_efectivo = corte.ventas_incluidas.filter(
-            forma_pago='efectivo',
-            estado='completada'
-        )
-    else:
-        ventas_efectivo = Venta.objects.filter(
-            sucursal=corte.sucursal,
-            usuario=corte.usuario,
-            fecha__gte=corte.fecha_inicio,
-            forma_pago='efectivo',
-            estado='completada'
-        )
-    
-    total_efectivo_esperado = sum(venta.total for venta in ventas_efectivo)
+    total_efectivo_esperado = corte.ventas_incluidas.filter(
+        forma_pago='efectivo',
+        estado='completada'
+    ).aggregate(total=Sum('total'))['total'] or Decimal('0')
     
     context = {
         'corte': corte,
@@ -1006,6 +1087,8 @@ def corte_caja_verificar(request, pk):
 
 @login_required
 @admin_required
+@usa_base_reportes
+@clase_carga(REPORTE)
 def reporte_ventas(request):
     """Reporte de ventas"""
     sucursal = request.user.sucursal
@@ -1020,12 +1103,15 @@ def reporte_ventas(request):
     tipo_cliente = request.GET.get('tipo_cliente', '')
     
     # Filtrar ventas
+    desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
     ventas = Venta.objects.filter(
         sucursal=sucursal,
-        fecha__date__gte=fecha_inicio,
-        fecha__date__lte=fecha_fin,
         estado='completada'
     )
+    if desde:
+        ventas = ventas.filter(fecha__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha__lt=hasta)
     
     if tipo_cliente:
         if tipo_cliente == 'sin_cliente':
@@ -1075,10 +1161,10 @@ def reporte_ventas(request):
     
     # Estadísticas generales
     total_general = ventas.aggregate(
+        promedio_venta=Avg('total'),
         total=Sum('total'),
         count=Count('id'),
-        descuentos=Sum('descuento_total'),
-        promedio_venta=Avg('total')
+        descuentos=Sum('descuento_total')
     )
     
     # Ventas por tipo de cliente
@@ -1090,40 +1176,105 @@ def reporte_ventas(request):
     )
     
     # Productos más vendidos
-    productos_mas_vendidos = DetalleVenta.objects.filter(
-        venta__in=ventas
-    ).values(
-        'producto__producto__nombre',
-        'producto__producto__codigo'
+    detalles = DetalleVenta.objects.filter(
+        venta__in=ventas,
+        **filtro_poda('fecha_creacion', desde)
+    )
+    productos_mas_vendidos = detalles.values(
+        'producto_nombre',
+        'producto_codigo'
     ).annotate(
         cantidad_total=Sum('cantidad'),
         total_ventas=Sum('subtotal')
-    ).order_by('-cantidad_total')[:10]
+    ).order_by('-cantidad_total')
     
-    context = {
+    reporte = {
         'datos': datos,
+        'total_general': total_general,
+        'ventas_por_tipo_cliente': ventas_por_tipo_cliente,
+        'productos_mas_vendidos': productos_mas_vendidos[:10],
+    }
+    
+    # Ejercicios archivados dentro del rango
+    categorias_archivadas = None
+    if periodo_archivado(desde, hasta):
+        archivado = reporte_archivado(sucursal, desde, hasta, grupo_por, tipo_cliente)
+        categorias_archivadas = archivado['ventas_por_categoria']
+        reporte['productos_mas_vendidos'] = productos_mas_vendidos
+        reporte = combinar_reporte(reporte, archivado)
+    
+    # Ventas acumuladas por rama del árbol de categorías
+    reporte['ventas_por_categoria'] = ventas_por_categoria(detalles, categorias_archivadas)
+    
+    context = {
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
         'grupo_por': grupo_por,
         'tipo_cliente': tipo_cliente,
-        'total_general': total_general,
-        'ventas_por_tipo_cliente': ventas_por_tipo_cliente,
-        'productos_mas_vendidos': productos_mas_vendidos,
+        **reporte,
     }
     return render(request, 'ventas/reportes/ventas.html', context)
 
+@login_required
+@admin_required
+@usa_base_reportes
+@clase_carga(REPORTE)
+def reporte_mapa_calor(request):
+    """Mapa de calor día de la semana × hora para planear cajeros (ver ventas/cubo.py)"""
+    sucursal = request.user.sucursal
+    sucursales = None
+    if request.user.rol == 'superadmin':
+        sucursales = Sucursal.objects.filter(activa=True).order_by('nombre')
+        sucursal_id = request.GET.get('sucursal')
+        if sucursal_id:
+            sucursal = get_object_or_404(Sucursal, pk=sucursal_id)
+        elif not sucursal:
+            sucursal = sucursales.first()
+    if not sucursal:
+        messages.error(request, "No tienes una sucursal asignada")
+        return redirect('dashboard')
+    
+    hoy = timezone.localdate()
+    fecha_inicio = request.GET.get('fecha_inicio', (hoy - timedelta(days=364)).strftime('%Y-%m-%d'))
+    fecha_fin = request.GET.get('fecha_fin', hoy.strftime('%Y-%m-%d'))
+    try:
+        desde = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        hasta = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, "Fechas inválidas")
+        desde, hasta = hoy - timedelta(days=364), hoy
+        fecha_inicio, fecha_fin = desde.strftime('%Y-%m-%d'), hasta.strftime('%Y-%m-%d')
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    
+    try:
+        ventas_por_cajero = max(int(request.GET.get('ventas_por_cajero', cubo.VENTAS_POR_CAJERO)), 1)
+    except ValueError:
+        ventas_por_cajero = cubo.VENTAS_POR_CAJERO
+    
+    context = {
+        'sucursal': sucursal,
+        'sucursales': sucursales,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'ventas_por_cajero': ventas_por_cajero,
+        'mapa': cubo.mapa_calor(sucursal, desde, hasta, ventas_por_cajero),
+    }
+    return render(request, 'ventas/reportes/mapa_calor.html', context)
+
 # =========== AJAX HELPERS ===========
 @login_required
 @csrf_exempt
-def get_producto_info(request):
+async def get_producto_info(request):
     """Obtener información de producto para AJAX"""
     if request.method == 'GET':
         producto_id = request.GET.get('producto_id')
+        usuario = await request.auser()
         
         try:
-            producto = ProductoSucursal.objects.get(
+            producto = await ProductoSucursal.objects.select_related('producto__categoria').aget(
                 id=producto_id,
-                sucursal=request.user.sucursal,
+                sucursal_id=usuario.sucursal_id,
                 activo=True
             )
             